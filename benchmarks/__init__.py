@@ -0,0 +1 @@
+"""Benchmarks for the lambda language interpreter. Run a benchmark with `python -m benchmarks.<name>`."""
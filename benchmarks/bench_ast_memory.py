@@ -0,0 +1,111 @@
+import gc
+import tracemalloc
+
+from benchmarks.harness import statements, workloads
+from hashcons import NodeTable
+from interpreter import Interpreter
+from my_parser import ASTNode
+
+WORKLOADS = ('flat_arithmetic', 'long_file', 'partbq', 'closures')
+
+
+def dict_class(cls):
+    """
+    Build a class with a per-instance __dict__ and the attributes of a node class, to measure
+    the layout the nodes had before they used __slots__.
+
+    :param cls: The node class.
+    :return: The class, whose constructor takes the values of the node's slots.
+    """
+    fields = cls.__slots__
+
+    def __init__(self, *values):
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+
+    return type(cls.__name__, (), {'__init__': __init__})
+
+
+DICT_CLASSES = {cls: dict_class(cls) for cls in ASTNode.__subclasses__()}  # Maps node classes to dict_class()
+
+
+def with_dicts(value):
+    """
+    Copy an AST into instances of DICT_CLASSES, children first as the parsers build nodes.
+
+    :param value: The AST node or field value.
+    :return: The copy.
+    """
+    if isinstance(value, ASTNode):
+        return DICT_CLASSES[type(value)](*[with_dicts(getattr(value, field)) for field in type(value).__slots__])
+    if isinstance(value, list):
+        return [with_dicts(item) for item in value]
+    return value
+
+
+def count_nodes(asts):
+    """
+    Count the nodes of ASTs, as a tree (shared subtrees counted at each use) and as objects.
+
+    :param asts: The AST nodes.
+    :return: A pair (number of nodes in the trees, number of distinct node objects).
+    """
+    total = 0
+    distinct = set()
+    pending = list(asts)
+    while pending:
+        node = pending.pop()
+        total += 1
+        distinct.add(id(node))
+        pending.extend(NodeTable.children(node))
+    return total, len(distinct)
+
+
+def retained(build):
+    """
+    Measure the memory held by the result of a function.
+
+    :param build: The function, called without arguments.
+    :return: A pair (result, bytes still allocated once it returns).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def share(interpreter, lines):
+    """
+    Parse lines and share the identical subtrees of their ASTs.
+
+    :param interpreter: The Interpreter parsing the lines.
+    :param lines: The statements.
+    :return: The shared ASTs.
+    """
+    table = NodeTable()
+    return [table.share(interpreter.parse(line)) for line in lines]
+
+
+def main():
+    sources = workloads()
+    print(f"{'workload':<18}{'nodes':>9}{'distinct':>10}{'dict B/node':>13}{'slots B/node':>14}"
+          f"{'shared B/node':>15}")
+    for name in WORKLOADS:
+        interpreter = Interpreter()
+        lines = statements(sources[name])
+        nodes, _ = count_nodes([interpreter.parse(line) for line in lines])
+        _, dict_bytes = retained(lambda: [with_dicts(interpreter.parse(line)) for line in lines])
+        _, slots_bytes = retained(lambda: [interpreter.parse(line) for line in lines])
+        # The table is dropped once the program is shared, as Interpreter.execute_file does
+        shared, shared_bytes = retained(lambda: share(interpreter, lines))
+        _, distinct = count_nodes(shared)
+        print(f"{name:<18}{nodes:>9}{distinct:>10}{dict_bytes / nodes:>13.1f}{slots_bytes / nodes:>14.1f}"
+              f"{shared_bytes / nodes:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
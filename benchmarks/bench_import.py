@@ -0,0 +1,46 @@
+import os
+import tempfile
+import time
+
+from benchmarks.bench_prelude import write_prelude
+from interpreter import Interpreter
+
+CALLS = ("p{first}(3, 2)", "p{middle}(2, 3)", "p{last}(5, 1)")  # The three library functions the script uses
+
+
+def script_time(path, size, mode, lazy):
+    """
+    Load a generated library and call three of its functions.
+
+    :param path: The path of the library.
+    :param size: The number of definitions in the library.
+    :param mode: The interpreter mode.
+    :param lazy: Whether the library is imported, rather than run eagerly as a prelude.
+    :return: A pair (seconds until the last result is available, the results).
+    """
+    start = time.perf_counter()
+    if lazy:
+        interpreter = Interpreter(mode=mode)
+        interpreter.run(interpreter.parse(f'import "{path}"'))
+    else:
+        interpreter = Interpreter(mode=mode, prelude=path)
+    results = [interpreter.run(interpreter.parse(call.format(first=0, middle=size // 2, last=size - 1)))
+               for call in CALLS]
+    return time.perf_counter() - start, results
+
+
+def main(repeat=5):
+    print(f"{'definitions':>12}{'mode':>10}{'eager s':>10}{'import s':>10}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (1_000, 10_000):
+            path = os.path.join(directory, f"library{size}.lambda")
+            write_prelude(path, size)
+            for mode in ('compiled', 'vm', 'tree'):
+                eager, expected = min(script_time(path, size, mode, False) for _ in range(repeat))
+                lazy, results = min(script_time(path, size, mode, True) for _ in range(repeat))
+                assert results == expected, (results, expected)
+                print(f"{size:>12}{mode:>10}{eager:>10.3f}{lazy:>10.3f}{eager / lazy:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
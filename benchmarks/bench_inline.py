@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+
+from benchmarks.harness import statements, workloads
+from interpreter import Interpreter
+
+WORKLOADS = ('test', 'helpers', 'closures', 'partbq', 'sequences', 'tail_recursion')
+# Loop calling small helpers, as in test.lambda, and an immediately applied lambda per iteration
+HELPERS = '''
+def add(a, b): a + b
+def multiply(a, b): a * b
+def inc(x): add(x, 1)
+def step(n, acc): add(acc, multiply(inc(n), (lambda y: y % 7)(n)))
+def sum_to(n, acc): if n == 0: acc else: sum_to(n - 1, step(n, acc))
+sum_to(50000, 0)
+'''
+MODES = ('compiled', 'vm', 'cek', 'tree')
+TEST_PROGRAM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test.lambda')
+
+
+def run_program(lines, mode, optimize):
+    """
+    Run the statements of a workload with a fresh Interpreter, counting its calls.
+
+    :param lines: The statements.
+    :param mode: The interpreter mode.
+    :param optimize: Whether the optimizer beta-reduces lambdas and inlines small functions.
+    :return: A pair (seconds spent evaluating, parsing excluded; number of calls made).
+    """
+    interpreter = Interpreter(mode=mode, optimize=optimize, fuel=10 ** 12)  # Fuel high enough to only count calls
+    budget = interpreter.budget
+    asts = [interpreter.parse_statement(line)[1] for line in lines]  # Optimized while parsing, if enabled
+    calls = 0
+    seconds = 0.0
+    for ast in asts:
+        start = time.perf_counter()
+        try:
+            interpreter.run(ast, optimized=True)
+        except Exception:
+            pass  # Workloads too deep for a mode fail the same way with and without the optimizer
+        seconds += time.perf_counter() - start
+        budget.settle()
+        calls += budget.fuel - budget.fuel_left
+    return seconds, calls
+
+
+def main(repeat=5):
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    sources = workloads()
+    with open(TEST_PROGRAM, 'r') as file:
+        sources['test'] = file.read()
+    sources['helpers'] = HELPERS
+    print(f"{'workload':<28}{'calls':>10}{'-O calls':>10}{'s':>10}{'-O s':>10}{'speedup':>9}")
+    for mode in MODES:
+        for name in WORKLOADS:
+            lines = statements(sources[name])
+            plain = optimized = float('inf')
+            # Both configurations are interleaved so that they see the same machine load
+            for _ in range(repeat):
+                seconds, calls = run_program(lines, mode, False)
+                plain = min(plain, seconds)
+                seconds, optimized_calls = run_program(lines, mode, True)
+                optimized = min(optimized, seconds)
+            print(f"{name + '/' + mode:<28}{calls:>10}{optimized_calls:>10}{plain:>10.4f}{optimized:>10.4f}"
+                  f"{plain / optimized:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+
+from lexer import Lexer
+
+SOURCE_LINES = [
+    "def fib{index}(n): if n < 2: n else: fib{index}(n - 1) + fib{index}(n - 2)",
+    "(lambda x, y: (x + y) * {index} > 10 && x != y)(3, 4)  # comment {index}",
+    "if !False: {index} % 7 else: -{index}",
+]
+
+
+def write_source(path, megabytes):
+    """
+    Write a generated program of roughly the given size.
+
+    :param path: The path of the file to write.
+    :param megabytes: The approximate size of the file in megabytes.
+    """
+    size = 0
+    index = 0
+    with open(path, 'w') as file:
+        while size < megabytes * 1024 * 1024:
+            line = SOURCE_LINES[index % len(SOURCE_LINES)].format(index=index) + "\n"
+            file.write(line)
+            size += len(line)
+            index += 1
+
+
+def per_line(path):
+    """
+    Tokenize a file line by line with Lexer.tokenize, as Interpreter.execute_file does.
+
+    :param path: The path of the file.
+    :return: The number of tokens.
+    """
+    with open(path, 'r') as file:
+        return sum(len(Lexer(line.strip()).tokenize()) for line in file.read().splitlines())
+
+
+def whole_text(path):
+    """
+    Tokenize a whole file at once with Lexer.tokenize.
+
+    :param path: The path of the file.
+    :return: The number of tokens.
+    """
+    with open(path, 'r') as file:
+        return len(Lexer(file.read()).tokenize())
+
+
+def compact(path):
+    """
+    Tokenize a whole file into a TokenBuffer.
+
+    :param path: The path of the file.
+    :return: The number of tokens.
+    """
+    with open(path, 'r') as file:
+        return len(Lexer(file.read()).tokenize_compact())
+
+
+def main():
+    lexers = [
+        ('tokenize, per line', per_line),
+        ('tokenize, whole file', whole_text),
+        ('tokenize_compact', compact),
+    ]
+    print(f"{'lexer':<24}{'MiB':>6}{'tokens':>12}{'seconds':>10}{'tokens/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for megabytes in (1, 4):
+            path = os.path.join(directory, f"source{megabytes}.lambda")
+            write_source(path, megabytes)
+            for label, tokenize in lexers:
+                start = time.perf_counter()
+                count = tokenize(path)
+                elapsed = time.perf_counter() - start
+                print(f"{label:<24}{megabytes:>6}{count:>12}{elapsed:>10.3f}{count / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import sys
+import time
+
+from benchmarks.harness import statements, workloads
+from interpreter import Interpreter
+
+WORKLOADS = ('fib', 'ackermann', 'closures', 'tail_recursion')
+MODES = ('compiled', 'vm', 'cek', 'tree')
+# Limits high enough that no workload reaches them, so only the accounting is measured
+CONFIGURATIONS = [
+    ('no limits', {}),
+    ('fuel', dict(fuel=10 ** 12)),
+    ('all limits', dict(fuel=10 ** 12, max_depth=10 ** 6, max_allocations=10 ** 12)),
+]
+
+
+def run_program(lines, mode, limits):
+    """
+    Run the statements of a workload with a fresh Interpreter.
+
+    :param lines: The statements.
+    :param mode: The interpreter mode.
+    :param limits: Keyword arguments setting the Interpreter's limits.
+    :return: The number of seconds spent evaluating (parsing excluded).
+    """
+    interpreter = Interpreter(mode=mode, **limits)
+    asts = [interpreter.parse(line) for line in lines]
+    start = time.perf_counter()
+    for ast in asts:
+        try:
+            interpreter.run(ast)
+        except Exception:
+            pass  # Workloads too deep for a mode fail the same way with and without limits
+    return time.perf_counter() - start
+
+
+def main(repeat=7):
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    sources = workloads()
+    print(f"{'workload':<28}{'no limits s':>12}" + ''.join(f'{label:>12}' for label, _ in CONFIGURATIONS[1:]))
+    for mode in MODES:
+        for name in WORKLOADS:
+            lines = statements(sources[name])
+            best = [float('inf')] * len(CONFIGURATIONS)
+            # Configurations are interleaved so that they see the same machine load
+            for _ in range(repeat):
+                for index, (_, limits) in enumerate(CONFIGURATIONS):
+                    best[index] = min(best[index], run_program(lines, mode, limits))
+            print(f"{name + '/' + mode:<28}{best[0]:>12.4f}"
+                  + ''.join(f'{seconds / best[0] - 1:>+12.1%}' for seconds in best[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from interpreter import Interpreter
+
+PROGRAM = """\
+def fib(n): if n < 2: n else: fib(n - 1) + fib(n - 2)
+def factorial(n): if n == 0: 1 else: n * factorial(n - 1)
+def decrement(x): if x > 0: decrement(x - 1) else: x
+"""
+CALLS = ["fib({n})", "decrement({n}000)", "factorial({n}0)"]
+
+
+def write_program(path, statements):
+    """
+    Write a program of definitions followed by independent expensive calls.
+
+    :param path: The path of the file to write.
+    :param statements: The number of call statements.
+    """
+    with open(path, 'w') as file:
+        file.write(PROGRAM)
+        for index in range(statements):
+            file.write(CALLS[index % len(CALLS)].format(n=20 + index % 3) + "\n")
+
+
+def run(path, jobs):
+    """
+    Execute a program and capture its transcript.
+
+    :param path: The path of the program.
+    :param jobs: The number of processes.
+    :return: A tuple (seconds, transcript).
+    """
+    output = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        Interpreter().execute_file(path, jobs)
+    return time.perf_counter() - start, output.getvalue()
+
+
+def main():
+    jobs = max(2, os.cpu_count() or 1)
+    print(f"{os.cpu_count()} CPUs, {jobs} jobs")
+    print(f"{'statements':>11}{'sequential s':>14}{'parallel s':>12}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for statements in (6, 24):
+            path = os.path.join(directory, f"program{statements}.lambda")
+            write_program(path, statements)
+            sequential, expected = run(path, 1)
+            parallel, transcript = run(path, jobs)
+            assert transcript == expected
+            print(f"{statements:>11}{sequential:>14.3f}{parallel:>12.3f}{sequential / parallel:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import random
+import time
+
+from lexer import Lexer
+from my_parser import ASTNode, Parser
+from pratt import PrattParser
+
+OPERATORS = ['+', '-', '*', '/', '%', '==', '!=', '<', '>=', '&&', '||']
+OPERANDS = ['x', '42', 'True', 'f(x, 1)', '(y - 3)', '!z', '-7']
+
+
+def chained_expression(length, seed=0):
+    """
+    Generate an expression with a long chain of binary operators.
+
+    :param length: The number of operators.
+    :param seed: The random seed.
+    :return: The source code of the expression.
+    """
+    rng = random.Random(seed)
+    parts = [rng.choice(OPERANDS)]
+    for _ in range(length):
+        parts.append(rng.choice(OPERATORS))
+        parts.append(rng.choice(OPERANDS))
+    return ' '.join(parts)
+
+
+def same_tree(left, right):
+    """
+    Compare two ASTs without recursion (long operator chains are too deep for repr).
+
+    :param left: The first AST.
+    :param right: The second AST.
+    :return: True if both trees have the same node classes and attributes.
+    """
+    stack = [(left, right)]
+    while stack:
+        a, b = stack.pop()
+        if type(a) is not type(b):
+            return False
+        if isinstance(a, list):
+            if len(a) != len(b):
+                return False
+            stack.extend(zip(a, b))
+        elif isinstance(a, ASTNode):
+            stack.extend((getattr(a, field), getattr(b, field)) for field in type(a).__slots__)
+        elif a != b:
+            return False
+    return True
+
+
+def measure(parser_class, tokens, repeat):
+    """
+    Parse the same tokens several times.
+
+    :param parser_class: Parser or PrattParser.
+    :param tokens: The tokens of the expression.
+    :param repeat: The number of times the tokens are parsed.
+    :return: A tuple (seconds, AST of the last parse).
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        ast = parser_class(tokens).parse()
+    return time.perf_counter() - start, ast
+
+
+def main():
+    print(f"{'operators':>10}{'tokens':>10}{'recursive s':>13}{'pratt s':>10}{'tokens/s (pratt)':>18}{'speedup':>9}")
+    for length, repeat in ((10, 2000), (1_000, 20), (100_000, 1)):
+        source = chained_expression(length)
+        tokens = Lexer(source).tokenize()
+        recursive, expected = measure(Parser, tokens, repeat)
+        pratt, ast = measure(PrattParser, tokens, repeat)
+        assert same_tree(ast, expected)
+        rate = len(tokens) * repeat / pratt
+        print(f"{length:>10}{len(tokens):>10}{recursive:>13.3f}{pratt:>10.3f}{rate:>18.0f}{recursive / pratt:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+
+from interpreter import Interpreter
+
+PRELUDE_DEFINITION = "def p{index}(x, y): if x > y: (x * {index} + y) % 7 else: p{index}(y, x - {index} + 1)"
+FIRST_REQUEST = "p{index}(3, 2)"
+
+
+def write_prelude(path, size):
+    """
+    Write a generated prelude of function definitions.
+
+    :param path: The path of the file to write.
+    :param size: The number of definitions.
+    """
+    with open(path, 'w') as file:
+        for index in range(size):
+            file.write(PRELUDE_DEFINITION.format(index=index) + "\n")
+
+
+def first_result(path, cache_dir, mode):
+    """
+    Start an Interpreter with a prelude and evaluate a call of its last definition.
+
+    :param path: The path of the prelude.
+    :param cache_dir: The cache directory holding snapshots, or None for a cold load.
+    :param mode: The interpreter mode.
+    :return: The number of seconds until the result is available.
+    """
+    start = time.perf_counter()
+    interpreter = Interpreter(mode=mode, cache=cache_dir is not None, cache_dir=cache_dir, prelude=path)
+    size = sum(1 for _ in open(path))
+    interpreter.run(interpreter.parse(FIRST_REQUEST.format(index=size - 1)))
+    return time.perf_counter() - start
+
+
+def main(repeat=5):
+    print(f"{'definitions':>12}{'mode':>10}{'cold s':>10}{'snapshot s':>12}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (500, 5_000):
+            path = os.path.join(directory, f"prelude{size}.lambda")
+            write_prelude(path, size)
+            for mode in ('compiled', 'vm', 'tree'):
+                cold = min(first_result(path, None, mode) for _ in range(repeat))
+                first_result(path, directory, mode)  # Writes the snapshot
+                snapshot = min(first_result(path, directory, mode) for _ in range(repeat))
+                print(f"{size:>12}{mode:>10}{cold:>10.3f}{snapshot:>12.3f}{cold / snapshot:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
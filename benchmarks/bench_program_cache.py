@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from interpreter import Interpreter
+
+LIBRARY_DEFINITION = "def f{index}(x, y): if x > y: (x * {index} + y) % 7 else: f{index}(y, x - {index} + 1)"
+
+
+def write_library(path, size):
+    """
+    Write a generated library of function definitions followed by a call.
+
+    :param path: The path of the file to write.
+    :param size: The number of definitions.
+    """
+    with open(path, 'w') as file:
+        for index in range(size):
+            file.write(LIBRARY_DEFINITION.format(index=index) + "\n")
+        file.write(f"f{size - 1}(3, 2)\n")
+
+
+def load(path, cache_dir, optimize=False, cache=True):
+    """
+    Load a program the way Interpreter.execute_file does, without running it.
+
+    :param path: The path of the program.
+    :param cache_dir: The cache directory.
+    :param optimize: Whether the statements are optimized.
+    :param cache: Whether the program cache is used.
+    :return: The elapsed time in seconds.
+    """
+    interpreter = Interpreter(optimize=optimize, cache=cache, cache_dir=cache_dir)
+    start = time.perf_counter()
+    if cache:
+        variant = 'optimized' if optimize else 'parsed'
+        interpreter.program_cache.load(path, interpreter.parse_program, variant)
+    else:
+        with open(path, 'r') as file:
+            interpreter.parse_program(file.read())
+    return time.perf_counter() - start
+
+
+def startup(path, cache_dir, optimize=False):
+    """
+    Execute a program with a fresh Interpreter using the program cache.
+
+    :param path: The path of the program.
+    :param cache_dir: The cache directory.
+    :param optimize: Whether the statements are optimized.
+    :return: The elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        Interpreter(optimize=optimize, cache=True, cache_dir=cache_dir).execute_file(path)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'definitions':>12}{'optimize':>10}{'no cache':>10}{'cold':>10}{'warm':>10}{'warm run':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (100, 1_000, 10_000):
+            path = os.path.join(directory, f"library{size}.lambda")
+            write_library(path, size)
+            for optimize in (False, True):
+                uncached = load(path, directory, optimize, cache=False)
+                cold = load(path, directory, optimize)
+                warm = load(path, directory, optimize)
+                run = startup(path, directory, optimize)
+                print(f"{size:>12}{str(optimize):>10}{uncached:>10.3f}{cold:>10.3f}{warm:>10.3f}{run:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PRELUDE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'partbq.lambda')
+REQUESTS = ["is_prime({n})", "fold(lambda x, y: x + y, 1, {n}, 0)", "reverse({n}, 0)", "fib_acc(30, 0, 1)"]
+
+
+async def client(path, index, count, latencies):
+    """
+    Send requests one after another on a connection, recording their latencies.
+
+    :param path: The Unix socket path of the server.
+    :param index: The client number, used as its session name.
+    :param count: The number of requests.
+    :param latencies: The list the latencies in seconds are appended to.
+    """
+    reader, writer = await asyncio.open_unix_connection(path)
+    for number in range(count):
+        source = REQUESTS[number % len(REQUESTS)].format(n=100 + number)
+        request = {'id': number, 'session': f'client{index}', 'source': source}
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        assert response['ok'], response
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load(path, clients, count):
+    """
+    Run concurrent clients against the server.
+
+    :param path: The Unix socket path of the server.
+    :param clients: The number of concurrent connections.
+    :param count: The number of requests per connection.
+    :return: A tuple (seconds, latencies).
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(path, index, count, latencies) for index in range(clients)))
+    return time.perf_counter() - start, latencies
+
+
+def process_per_request(directory, count):
+    """
+    Time running each request with a new `python interpreter.py` process.
+
+    :param directory: A directory for the program files.
+    :param count: The number of requests.
+    :return: The mean seconds per request.
+    """
+    with open(PRELUDE, 'r') as file:
+        prelude = file.read()
+    path = os.path.join(directory, 'request.lambda')
+    start = time.perf_counter()
+    for number in range(count):
+        with open(path, 'w') as file:
+            file.write(prelude + REQUESTS[number % len(REQUESTS)].format(n=100 + number) + '\n')
+        subprocess.run([sys.executable, 'interpreter.py', '--no-cache', path], check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    workers = max(2, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'server.sock')
+        server = subprocess.Popen([sys.executable, 'server.py', '--unix', path, '--workers', str(workers),
+                                   '--prelude', PRELUDE], stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()  # "Serving on ..." once the workers are ready
+            print(f"{'clients':>8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            for clients in (1, 8, 32):
+                count = 200
+                elapsed, latencies = asyncio.run(load(path, clients, count))
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(f"{clients:>8}{len(latencies):>10}{len(latencies) / elapsed:>10.0f}"
+                      f"{statistics.median(latencies) * 1000:>10.2f}{p99 * 1000:>10.2f}")
+        finally:
+            server.terminate()
+            server.wait()
+        per_request = process_per_request(directory, 5)
+        print(f"one interpreter.py process per request: {per_request * 1000:.0f} ms per request")
+
+
+if __name__ == "__main__":
+    main()
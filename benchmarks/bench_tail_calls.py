@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+
+from interpreter import Interpreter
+from lexer import Lexer
+from my_parser import Parser
+
+LOOP_DEFINITION = "def increment(x): if x < {bound}: increment(x + 1) else: x"
+
+
+def parse(line):
+    """
+    Lex and parse a single line of code.
+
+    :param line: The line of code.
+    :return: The root node of the AST.
+    """
+    return Parser(Lexer(line).tokenize()).parse()
+
+
+def run_loop(bound, mode='compiled', tail_calls=True):
+    """
+    Run the tail-recursive increment loop from test.lambda up to a bound.
+
+    :param bound: The number of loop iterations.
+    :param mode: The interpreter mode.
+    :param tail_calls: Whether tail calls are enabled in compiled mode.
+    :return: A tuple (seconds, peak traced memory in bytes) or None if the run failed.
+    """
+    interpreter = Interpreter(mode=mode, tail_calls=tail_calls)
+    interpreter.run(parse(LOOP_DEFINITION.format(bound=bound)))
+    call = parse("increment(0)")
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = interpreter.run(call)
+    except RecursionError:
+        return None
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    assert result == bound
+    return elapsed, peak
+
+
+def main():
+    configurations = [
+        ('tree', 'tree', True),
+        ('compiled, no tail calls', 'compiled', False),
+        ('compiled, tail calls', 'compiled', True),
+    ]
+    print(f"{'configuration':<26}{'iterations':>12}{'seconds':>10}{'peak KiB':>10}")
+    for bound in (100, 200, 10_000, 100_000, 1_000_000):
+        for label, mode, tail_calls in configurations:
+            outcome = run_loop(bound, mode, tail_calls)
+            if outcome is None:
+                print(f"{label:<26}{bound:>12}{'RecursionError':>20}")
+            else:
+                elapsed, peak = outcome
+                print(f"{label:<26}{bound:>12}{elapsed:>10.3f}{peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
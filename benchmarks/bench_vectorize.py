@@ -0,0 +1,29 @@
+import time
+
+import numpy as np
+
+from interpreter import Interpreter
+
+SOURCE = "lambda x, y: ((x + y) * 2 > 10) && (x < y)"
+
+
+def main():
+    interpreter = Interpreter()
+    function = interpreter.vectorize(SOURCE)
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10}{'per row s':>12}{'vectorized s':>14}{'speedup':>9}")
+    for rows in (10_000, 100_000, 1_000_000):
+        x = rng.integers(-100, 100, rows)
+        y = rng.integers(-100, 100, rows)
+        start = time.perf_counter()
+        expected = [function.function(a, b) for a, b in zip(x.tolist(), y.tolist())]
+        per_row = time.perf_counter() - start
+        start = time.perf_counter()
+        result = function(x, y)
+        vectorized = time.perf_counter() - start
+        assert result.tolist() == expected
+        print(f"{rows:>10}{per_row:>12.3f}{vectorized:>14.4f}{per_row / vectorized:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
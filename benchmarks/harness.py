@@ -0,0 +1,267 @@
+"""
+Benchmark harness timing the lexer, parser and evaluator separately on a corpus of workloads.
+
+    python -m benchmarks.harness run [--mode compiled ...] [--output results.json]
+    python -m benchmarks.harness compare old.json new.json [--threshold 0.1]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from interpreter import MODES, Interpreter, __version__
+from lexer import Lexer
+from my_parser import Parser
+
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+PHASES = ('lex', 'parse', 'evaluate')
+
+
+def flat_arithmetic(lines=200, terms=300):
+    """
+    Generate lines holding long flat arithmetic expressions.
+
+    :param lines: The number of lines.
+    :param terms: The number of operands per line.
+    :return: The source code.
+    """
+    operators = ('+', '-', '*', '%')
+    return '\n'.join(
+        ' '.join(f'{(line + term) % 97 + 1} {operators[term % len(operators)]}' for term in range(terms - 1))
+        + f' {line + 1}'
+        for line in range(lines))
+
+
+def long_file(definitions=5000):
+    """
+    Generate a long file of small definitions, each followed by a call.
+
+    :param definitions: The number of definitions.
+    :return: The source code.
+    """
+    return '\n'.join(f'def f{index}(x): if x > {index}: x - {index} else: x + {index}\nf{index}({index % 7})'
+                     for index in range(definitions))
+
+
+def workloads():
+    """
+    Collect the benchmark workloads: the .lambda files of the corpus and generated sources.
+
+    :return: A dictionary mapping workload names to source code.
+    """
+    sources = {}
+    for filename in sorted(os.listdir(CORPUS_DIRECTORY)):
+        if filename.endswith('.lambda'):
+            with open(os.path.join(CORPUS_DIRECTORY, filename), 'r') as file:
+                sources[filename[:-len('.lambda')]] = file.read()
+    sources['flat_arithmetic'] = flat_arithmetic()
+    sources['long_file'] = long_file()
+    return sources
+
+
+def statements(source):
+    """
+    Get the lines of a program that Interpreter.execute_file would run.
+
+    :param source: The source code.
+    :return: The stripped lines, without comments and empty lines.
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def lex(lines):
+    return [Lexer(line).tokenize() for line in lines]
+
+
+def parse(token_lists):
+    return [Parser(tokens).parse() for tokens in token_lists]
+
+
+def evaluate(asts, mode):
+    """
+    Run parsed statements with a fresh Interpreter, without printing the results.
+
+    :param asts: The ASTs of the statements.
+    :param mode: The interpreter mode.
+    :return: The number of statements that raised an error.
+    """
+    interpreter = Interpreter(mode=mode)
+    errors = 0
+    for ast in asts:
+        try:
+            interpreter.run(ast)
+        except Exception:
+            errors += 1
+    return errors
+
+
+def measure(function, warmup, repeat):
+    """
+    Time a function and measure its peak traced memory.
+
+    The timed runs do not trace allocations, since tracemalloc slows the code down; the
+    memory peak comes from one extra traced run.
+
+    :param function: The function to measure, called without arguments.
+    :param warmup: The number of untimed runs first.
+    :param repeat: The number of timed runs.
+    :return: A dictionary with the timings in seconds, the peak memory in bytes and the last result.
+    """
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'peak_bytes': peak,
+        'result': result,
+    }
+
+
+def run_workload(source, mode, warmup, repeat):
+    """
+    Benchmark the three phases of one workload.
+
+    :param source: The source code.
+    :param mode: The interpreter mode.
+    :param warmup: The number of untimed runs of each phase.
+    :param repeat: The number of timed runs of each phase.
+    :return: The result dictionary of the workload.
+    """
+    lines = statements(source)
+    token_lists = lex(lines)
+    asts = parse(token_lists)
+    phases = {
+        'lex': measure(lambda: lex(lines), warmup, repeat),
+        'parse': measure(lambda: parse(token_lists), warmup, repeat),
+        'evaluate': measure(lambda: evaluate(asts, mode), warmup, repeat),
+    }
+    errors = phases['evaluate'].pop('result')
+    for phase in ('lex', 'parse'):
+        del phases[phase]['result']
+    return {
+        'statements': len(lines),
+        'tokens': sum(len(tokens) for tokens in token_lists),
+        'errors': errors,
+        'phases': phases,
+    }
+
+
+def run(args):
+    """
+    Run the benchmarks and write the results as JSON.
+
+    :param args: The parsed command-line arguments.
+    """
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    sources = workloads()
+    names = args.workload or list(sources)
+    results = {}
+    print(f"{'workload':<28}{'lex s':>10}{'parse s':>10}{'evaluate s':>12}{'peak KiB':>10}{'errors':>8}")
+    for mode in args.mode:
+        for name in names:
+            result = run_workload(sources[name], mode, args.warmup, args.repeat)
+            results[f'{name}/{mode}'] = result
+            phases = result['phases']
+            peak = max(phase['peak_bytes'] for phase in phases.values())
+            print(f"{name + '/' + mode:<28}{phases['lex']['median']:>10.4f}{phases['parse']['median']:>10.4f}"
+                  f"{phases['evaluate']['median']:>12.4f}{peak / 1024:>10.1f}{result['errors']:>8}")
+    report = {
+        'meta': {
+            'version': __version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'warmup': args.warmup,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def compare(args):
+    """
+    Compare two result files and flag phases whose median time grew past the threshold.
+
+    :param args: The parsed command-line arguments.
+    :return: 1 if a regression was found, 0 otherwise.
+    """
+    with open(args.old, 'r') as file:
+        old = json.load(file)['results']
+    with open(args.new, 'r') as file:
+        new = json.load(file)['results']
+    regressions = 0
+    print(f"{'workload':<28}{'phase':<10}{'old s':>10}{'new s':>10}{'change':>9}")
+    for name in sorted(old.keys() & new.keys()):
+        for phase in PHASES:
+            before = old[name]['phases'][phase]['median']
+            after = new[name]['phases'][phase]['median']
+            change = after / before - 1 if before else 0.0
+            if max(before, after) < args.min_time:
+                flag = ''  # Too short to measure reliably
+            elif change > args.threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            elif change < -args.threshold:
+                flag = '  improved'
+            else:
+                flag = ''
+            print(f"{name:<28}{phase:<10}{before:>10.4f}{after:>10.4f}{change:>+9.1%}{flag}")
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f"{name:<28}only in {args.old if name in old else args.new}")
+    print(f"{regressions} regression(s) past {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark the lexer, parser and evaluator.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--mode', choices=MODES, action='append',
+                            help='interpreter mode to evaluate with (repeatable, default compiled)')
+    run_parser.add_argument('--workload', action='append', help='workload to run (repeatable, default all)')
+    run_parser.add_argument('--warmup', type=int, default=1, help='untimed runs of each phase')
+    run_parser.add_argument('--repeat', type=int, default=5, help='timed runs of each phase')
+    run_parser.add_argument('--output', help='JSON file to write the results to')
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('old', help='the baseline results')
+    compare_parser.add_argument('new', help='the results to check')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slowdown of a median reported as a regression (default 0.1)')
+    compare_parser.add_argument('--min-time', type=float, default=0.001,
+                                help='phases faster than this many seconds in both runs are never flagged')
+    args = arg_parser.parse_args()
+    if args.command == 'run':
+        args.mode = args.mode or ['compiled']
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+from array import array
+
+from compiler import (ARITHMETIC_OPS, COMPARISON_OPS, LOGICAL_OPS, arithmetic_fallback, call_error, compare_fallback,
+                      logical_error, operand_error, type_name)
+from my_parser import *
+from sequences import Sequence, index_value
+
+# Opcodes. Every instruction is two ints in the code array: the opcode and its operand.
+LOAD_CONST = 0  # Push constants[arg]
+LOAD_FAST = 1  # Push slot arg of the current frame
+LOAD_DEREF = 2  # Push a local from an enclosing frame; addresses[arg] is its (depth, slot)
+LOAD_GLOBAL = 3  # Push the global named names[arg]
+LOAD_UNDEFINED = 4  # Raise the 'not found' error for names[arg]
+ARITHMETIC = 5  # Pop two ints and push the result of OPERATORS[arg]
+COMPARE = 6  # Pop two values of the same type and push the result of OPERATORS[arg]
+LOGICAL = 7  # Raise if the right operand of OPERATORS[arg], on top of the stack, is not a boolean
+NOT = 8  # Pop a boolean and push its negation
+JUMP_IF_FALSE = 9  # Pop a value and jump to arg if it is falsy
+JUMP = 10  # Jump to arg
+MAKE_FUNCTION = 11  # Push a closure over constants[arg] (a CodeObject) and the current frame
+DEFINE = 12  # Bind a closure over constants[arg] to its name and push "Function created!"
+CHECK_CALLABLE = 13  # Raise if the value on top of the stack is not callable
+CALL = 14  # Call the function below arg arguments and push its result
+TAIL_CALL = 15  # Like CALL, but replace the current call frame
+RETURN = 16  # Return the value on top of the stack to the caller
+BUILD_LIST = 17  # Pop arg values and push a sequence holding them
+INDEX = 18  # Pop an index and a sequence and push the item
+JUMP_IF_FALSE_OR_POP = 19  # Left operand of &&: raise if not a boolean; jump to arg if False, else pop it
+JUMP_IF_TRUE_OR_POP = 20  # Left operand of ||: raise if not a boolean; jump to arg if True, else pop it
+ENTER_LET = 21  # Pop arg values into a new frame enclosing the current one
+LEAVE_LET = 22  # Return to the frame enclosing the current one
+GUARD = 23  # Skip the next instruction if the global named constants[arg][0] is still constants[arg][1]
+
+OPCODE_NAMES = ['LOAD_CONST', 'LOAD_FAST', 'LOAD_DEREF', 'LOAD_GLOBAL', 'LOAD_UNDEFINED', 'ARITHMETIC', 'COMPARE',
+                'LOGICAL', 'NOT', 'JUMP_IF_FALSE', 'JUMP', 'MAKE_FUNCTION', 'DEFINE', 'CHECK_CALLABLE', 'CALL',
+                'TAIL_CALL', 'RETURN', 'BUILD_LIST', 'INDEX', 'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP',
+                'ENTER_LET', 'LEAVE_LET', 'GUARD']
+
+# Binary operators by operand index, shared by the ARITHMETIC, COMPARE and LOGICAL opcodes
+OPERATORS = list(ARITHMETIC_OPS) + list(COMPARISON_OPS) + list(LOGICAL_OPS)
+OPERATOR_FUNCTIONS = [{**ARITHMETIC_OPS, **COMPARISON_OPS, **LOGICAL_OPS}[op] for op in OPERATORS]
+DIVIDE = OPERATORS.index('/')
+
+
+# Compiled form of a top-level statement or of a lambda/function body
+class CodeObject:
+    __slots__ = ('name', 'params', 'instructions', 'constants', 'names', 'addresses', 'indexes')
+
+    def __init__(self, name, params):
+        self.name = name  # Function name, None for lambdas, '<statement>' for top-level code
+        self.params = params  # List of parameter names
+        self.instructions = array('i')  # Opcodes and operands, interleaved
+        self.constants = []  # Literal values and nested CodeObjects
+        self.names = []  # Global names
+        self.addresses = []  # (depth, slot) pairs of locals in enclosing frames
+        self.indexes = {}  # Maps (table id, value type, value) to the value's index, while compiling
+
+    def emit(self, opcode, operand=0):
+        """
+        Append an instruction.
+
+        :param opcode: The opcode.
+        :param operand: The operand.
+        :return: The index of the instruction's operand, for patching jumps.
+        """
+        self.instructions.append(opcode)
+        self.instructions.append(operand)
+        return len(self.instructions) - 1
+
+    def add(self, table, value):
+        """
+        Add a value to one of the code object's tables, reusing an existing entry.
+
+        :param table: The constants, names or addresses list.
+        :param value: The value to add.
+        :return: The index of the value in the table.
+        """
+        if isinstance(value, CodeObject):
+            table.append(value)
+            return len(table) - 1
+        key = (id(table), type(value), value)
+        if key not in self.indexes:
+            table.append(value)
+            self.indexes[key] = len(table) - 1
+        return self.indexes[key]
+
+
+# Runtime representation of a lambda or named function in the virtual machine
+class VMFunction:
+    __slots__ = ('code', 'frame', 'machine')
+
+    def __init__(self, code, frame, machine):
+        self.code = code  # The CodeObject of the function body
+        self.frame = frame  # Frame captured at creation time (None at top level)
+        self.machine = machine  # The machine used when the function is called from Python
+
+    def arity_error(self, count):
+        """
+        Build the error raised when the function is called with the wrong number of arguments.
+
+        :param count: The number of arguments that were passed.
+        :return: The Exception to raise.
+        """
+        code = self.code
+        if code.name is None:
+            return Exception(f"Error: Lambda expected {len(code.params)} arguments but got {count}.")
+        return Exception(
+            f"Error: Function '{code.name}' expected {len(code.params)} arguments but got {count}.")
+
+    def __call__(self, *args):
+        if len(args) != len(self.code.params):
+            raise self.arity_error(len(args))
+        return self.machine.execute(self.code, [*args, self.frame])
+
+    def __repr__(self):
+        return f'<function {self.code.name or "lambda"}>'
+
+
+# BytecodeCompiler class turning resolved AST nodes into CodeObjects
+class BytecodeCompiler:
+    def compile(self, node):
+        """
+        Compile a resolved top-level AST node.
+
+        :param node: The AST node to compile, as returned by Resolver.resolve.
+        :return: The CodeObject of the statement.
+        """
+        code = CodeObject('<statement>', [])
+        self.emit(code, node)
+        code.emit(RETURN)
+        code.indexes = None
+        return code
+
+    def compile_function(self, name, params, body):
+        """
+        Compile the body of a lambda or function.
+
+        :param name: The function name, or None for lambdas.
+        :param params: The parameter names.
+        :param body: The resolved body AST node.
+        :return: The CodeObject of the body.
+        """
+        code = CodeObject(name, params)
+        self.emit_tail(code, body)
+        code.indexes = None
+        return code
+
+    def emit(self, code, node):
+        """
+        Emit the instructions computing a given AST node's value onto the stack.
+
+        :param code: The CodeObject being built.
+        :param node: The AST node to compile.
+        :raises Exception: If the node type is not supported.
+        """
+        method_name = f'emit_{type(node).__name__}'
+        method = getattr(self, method_name, None)
+        if method is None:
+            raise Exception(f"No method to compile node type {type(node).__name__}")
+        method(code, node)
+
+    def emit_tail(self, code, node):
+        """
+        Emit the instructions for an AST node in tail position, ending with a return or tail call.
+
+        :param code: The CodeObject being built.
+        :param node: The AST node to compile.
+        """
+        if isinstance(node, FunctionCallNode):
+            self.emit_FunctionCallNode(code, node, TAIL_CALL)
+        elif isinstance(node, IfElseNode):
+            self.emit(code, node.condition)
+            else_jump = code.emit(JUMP_IF_FALSE)
+            self.emit_tail(code, node.if_body)
+            code.instructions[else_jump] = len(code.instructions)
+            self.emit_tail(code, node.else_body)
+        elif isinstance(node, LetNode):
+            for value in node.values:
+                self.emit(code, value)
+            code.emit(ENTER_LET, len(node.values))
+            self.emit_tail(code, node.body)  # Returning leaves the frame of the LetNode as well
+        elif isinstance(node, InlineNode):
+            code.emit(GUARD, code.add(code.constants, (node.name, node.function)))
+            call_jump = code.emit(JUMP)
+            self.emit_tail(code, node.body)
+            code.instructions[call_jump] = len(code.instructions)
+            self.emit_tail(code, node.call)
+        else:
+            self.emit(code, node)
+            code.emit(RETURN)
+
+    def emit_NumberNode(self, code, node):
+        code.emit(LOAD_CONST, code.add(code.constants, node.value))
+
+    def emit_BooleanNode(self, code, node):
+        code.emit(LOAD_CONST, code.add(code.constants, node.value))
+
+    def emit_IdentifierNode(self, code, node):
+        if node.scope == 'local':
+            if node.depth == 0:
+                code.emit(LOAD_FAST, node.slot)
+            else:
+                code.emit(LOAD_DEREF, code.add(code.addresses, (node.depth, node.slot)))
+        elif node.scope == 'global':
+            code.emit(LOAD_GLOBAL, code.add(code.names, node.name))
+        else:
+            code.emit(LOAD_UNDEFINED, code.add(code.names, node.name))
+
+    def emit_BinaryOpNode(self, code, node):
+        self.emit(code, node.left)
+        if node.op in LOGICAL_OPS:
+            # The right operand only runs when the left one does not decide the result
+            end_jump = code.emit(JUMP_IF_FALSE_OR_POP if node.op == '&&' else JUMP_IF_TRUE_OR_POP)
+            self.emit(code, node.right)
+            code.emit(LOGICAL, OPERATORS.index(node.op))
+            code.instructions[end_jump] = len(code.instructions)
+            return
+        self.emit(code, node.right)
+        if node.op in ARITHMETIC_OPS:
+            code.emit(ARITHMETIC, OPERATORS.index(node.op))
+        elif node.op in COMPARISON_OPS:
+            code.emit(COMPARE, OPERATORS.index(node.op))
+        else:
+            raise Exception(f"Error: Unsupported binary operator: '{node.op}'")
+
+    def emit_UnaryOpNode(self, code, node):
+        if node.op != '!':
+            raise Exception(f"Error: Unsupported unary operator: '{node.op}'")
+        self.emit(code, node.operand)
+        code.emit(NOT)
+
+    def emit_LambdaNode(self, code, node):
+        function_code = self.compile_function(None, node.params, node.body)
+        code.emit(MAKE_FUNCTION, code.add(code.constants, function_code))
+
+    def emit_FunctionDefNode(self, code, node):
+        function_code = self.compile_function(node.name, node.params, node.body)
+        code.emit(DEFINE, code.add(code.constants, function_code))
+
+    def emit_FunctionCallNode(self, code, node, opcode=CALL):
+        self.emit(code, node.func)
+        code.emit(CHECK_CALLABLE)
+        for arg in node.args:
+            self.emit(code, arg)
+        code.emit(opcode, len(node.args))
+
+    def emit_ListNode(self, code, node):
+        for element in node.elements:
+            self.emit(code, element)
+        code.emit(BUILD_LIST, len(node.elements))
+
+    def emit_IndexNode(self, code, node):
+        self.emit(code, node.sequence)
+        self.emit(code, node.index)
+        code.emit(INDEX)
+
+    def emit_IfElseNode(self, code, node):
+        self.emit(code, node.condition)
+        else_jump = code.emit(JUMP_IF_FALSE)
+        self.emit(code, node.if_body)
+        end_jump = code.emit(JUMP)
+        code.instructions[else_jump] = len(code.instructions)
+        self.emit(code, node.else_body)
+        code.instructions[end_jump] = len(code.instructions)
+
+    def emit_LetNode(self, code, node):
+        for value in node.values:
+            self.emit(code, value)
+        code.emit(ENTER_LET, len(node.values))
+        self.emit(code, node.body)
+        code.emit(LEAVE_LET)
+
+    def emit_InlineNode(self, code, node):
+        code.emit(GUARD, code.add(code.constants, (node.name, node.function)))
+        call_jump = code.emit(JUMP)
+        self.emit(code, node.body)
+        end_jump = code.emit(JUMP)
+        code.instructions[call_jump] = len(code.instructions)
+        self.emit(code, node.call)
+        code.instructions[end_jump] = len(code.instructions)
+
+
+def disassemble(code, indent=''):
+    """
+    Render a CodeObject and its nested CodeObjects as readable text.
+
+    :param code: The CodeObject to disassemble.
+    :param indent: The prefix of every line, used for nested code.
+    :return: The disassembly.
+    """
+    title = code.name or '<lambda>'
+    lines = [f"{indent}Code {title}({', '.join(code.params)}): "
+             f"{len(code.instructions) // 2} instructions, {code.instructions.itemsize * len(code.instructions)} bytes"]
+    nested = []
+    instructions = code.instructions
+    for ip in range(0, len(instructions), 2):
+        opcode = instructions[ip]
+        operand = instructions[ip + 1]
+        if opcode in (LOAD_CONST, MAKE_FUNCTION, DEFINE):
+            value = code.constants[operand]
+            if isinstance(value, CodeObject):
+                nested.append(value)
+                detail = f'<code {value.name or "<lambda>"}>'
+            else:
+                detail = repr(value)
+        elif opcode in (LOAD_GLOBAL, LOAD_UNDEFINED):
+            detail = code.names[operand]
+        elif opcode == GUARD:
+            detail = code.constants[operand][0]
+        elif opcode == LOAD_DEREF:
+            detail = 'depth {}, slot {}'.format(*code.addresses[operand])
+        elif opcode in (ARITHMETIC, COMPARE, LOGICAL):
+            detail = OPERATORS[operand]
+        elif opcode in (JUMP_IF_FALSE, JUMP, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP):
+            detail = f'to {operand}'
+        elif opcode in (LOAD_FAST, CALL, TAIL_CALL, BUILD_LIST, ENTER_LET):
+            detail = str(operand)
+        else:
+            detail = ''
+        lines.append(f"{indent}  {ip:>4} {OPCODE_NAMES[opcode]:<21}{detail}".rstrip())
+    for nested_code in nested:
+        lines.append(disassemble(nested_code, indent + '    '))
+    return '\n'.join(lines)
+
+
+# Stack-based virtual machine running CodeObjects. Values live on a single value stack and
+# calls push (code, instruction pointer, frame) records on an explicit call stack, so the
+# recursion depth of programs is not limited by the Python stack. Frames are the same
+# list-backed records as in the closure compiler.
+class VirtualMachine:
+    def __init__(self, global_env, define=None, budget=None):
+        """
+        Initialize the VirtualMachine.
+
+        :param global_env: The global environment for storing variables and functions.
+        :param define: Function binding a name to a function created by 'def' (defaults to global_env.set).
+        :param budget: The Budget that calls and closures account to, or None for no limits. The depth
+                       checked against it is the size of the machine's call stack.
+        """
+        self.global_env = global_env  # Global environment for storing variables and functions
+        self.define = define or global_env.set  # Binds functions created by 'def'
+        self.budget = budget  # Limits of each evaluation, or None
+        self.compiler = BytecodeCompiler()  # Compiler from resolved ASTs to CodeObjects
+
+    def run(self, node):
+        """
+        Compile and execute a resolved top-level AST node.
+
+        :param node: The AST node to run, as returned by Resolver.resolve.
+        :return: The result of the execution.
+        """
+        return self.execute(self.compiler.compile(node), None)
+
+    def execute(self, code, frame):
+        """
+        Run a CodeObject in a frame until it returns.
+
+        :param code: The CodeObject to run.
+        :param frame: The frame holding the values of local identifiers.
+        :return: The returned value.
+        """
+        global_env = self.global_env
+        variables = global_env.variables
+        operator_functions = OPERATOR_FUNCTIONS
+        budget = self.budget
+        stack = []  # Value stack
+        calls = []  # Saved (code, instruction pointer, frame) of callers
+        instructions = code.instructions
+        constants = code.constants
+        ip = 0
+        while True:
+            opcode = instructions[ip]
+            operand = instructions[ip + 1]
+            ip += 2
+            if opcode == LOAD_FAST:
+                stack.append(frame[operand])
+            elif opcode == LOAD_CONST:
+                stack.append(constants[operand])
+            elif opcode == ARITHMETIC:
+                right = stack.pop()
+                left = stack[-1]
+                if not isinstance(left, int) or not isinstance(right, int):
+                    stack[-1] = arithmetic_fallback(OPERATORS[operand], left, right)
+                    continue
+                if operand == DIVIDE and right == 0:
+                    raise ZeroDivisionError("division by zero")
+                stack[-1] = operator_functions[operand](left, right)
+            elif opcode == COMPARE:
+                right = stack.pop()
+                left = stack[-1]
+                if type(left) is not type(right):
+                    stack[-1] = compare_fallback(OPERATORS[operand], left, right)
+                    continue
+                try:
+                    stack[-1] = operator_functions[operand](left, right)
+                except TypeError:
+                    stack[-1] = compare_fallback(OPERATORS[operand], left, right)  # Ordering of unordered values
+            elif opcode == JUMP_IF_FALSE:
+                if not stack.pop():
+                    ip = operand
+            elif opcode == LOAD_GLOBAL:
+                name = code.names[operand]
+                stack.append(variables[name] if name in variables else global_env.get(name))
+            elif opcode == CHECK_CALLABLE:
+                if not callable(stack[-1]):
+                    raise call_error(stack[-1])
+            elif opcode == CALL or opcode == TAIL_CALL:
+                if operand:
+                    args = stack[-operand:]
+                    del stack[-operand:]
+                else:
+                    args = []
+                func = stack.pop()
+                # Functions of other machines, such as an imported module's, run there with their own globals
+                if type(func) is VMFunction and func.machine is self:
+                    function_code = func.code
+                    if len(function_code.params) != operand:
+                        raise func.arity_error(operand)
+                    if opcode == CALL:
+                        calls.append((code, ip, frame))
+                    if budget is not None:
+                        budget.ticks -= 1  # Budget.tail_call, inlined
+                        if budget.ticks < 0:
+                            budget.settle()
+                        if budget.depth + len(calls) > budget.depth_limit:
+                            raise budget.depth_error()  # The depth is the size of the call stack
+                    args.append(func.frame)
+                    frame = args
+                    code = function_code
+                    instructions = code.instructions
+                    constants = code.constants
+                    ip = 0
+                else:
+                    if budget is not None:
+                        budget.call()
+                        try:
+                            stack.append(func(*args))
+                        finally:
+                            budget.leave()
+                    else:
+                        stack.append(func(*args))
+                    if opcode == TAIL_CALL:
+                        if not calls:
+                            return stack.pop()
+                        code, ip, frame = calls.pop()
+                        instructions = code.instructions
+                        constants = code.constants
+            elif opcode == GUARD:
+                name, function = constants[operand]
+                if variables.get(name) is function:
+                    ip += 2
+                    if budget is not None:
+                        budget.ticks -= 1  # The inlined call costs the fuel of the call it replaces
+                        if budget.ticks < 0:
+                            budget.settle()
+            elif opcode == ENTER_LET:
+                values = stack[-operand:]
+                del stack[-operand:]
+                values.append(frame)
+                frame = values
+            elif opcode == LEAVE_LET:
+                frame = frame[-1]
+            elif opcode == RETURN:
+                if not calls:
+                    return stack.pop()
+                code, ip, frame = calls.pop()
+                instructions = code.instructions
+                constants = code.constants
+            elif opcode == JUMP:
+                ip = operand
+            elif opcode == LOAD_DEREF:
+                depth, slot = code.addresses[operand]
+                values = frame
+                for _ in range(depth):
+                    values = values[-1]
+                stack.append(values[slot])
+            elif opcode == JUMP_IF_FALSE_OR_POP:
+                value = stack[-1]
+                if value is False:
+                    ip = operand
+                elif value is True:
+                    stack.pop()
+                else:
+                    raise logical_error('&&', value)
+            elif opcode == JUMP_IF_TRUE_OR_POP:
+                value = stack[-1]
+                if value is True:
+                    ip = operand
+                elif value is False:
+                    stack.pop()
+                else:
+                    raise logical_error('||', value)
+            elif opcode == LOGICAL:
+                right = stack[-1]
+                if not isinstance(right, bool):
+                    op = OPERATORS[operand]
+                    raise operand_error(op, op == '&&', right)  # The left operand did not decide the result
+            elif opcode == NOT:
+                value = stack[-1]
+                if not isinstance(value, bool):
+                    raise TypeError(f"Unsupported operand type for !: '{type_name(value)}'")
+                stack[-1] = not value
+            elif opcode == MAKE_FUNCTION:
+                if budget is not None:
+                    budget.allocate()
+                stack.append(VMFunction(constants[operand], frame, self))
+            elif opcode == DEFINE:
+                if budget is not None:
+                    budget.allocate()
+                function_code = constants[operand]
+                self.define(function_code.name, VMFunction(function_code, frame, self))
+                stack.append("Function created!")
+            elif opcode == BUILD_LIST:
+                if operand:
+                    values = stack[-operand:]
+                    del stack[-operand:]
+                else:
+                    values = []
+                stack.append(Sequence.from_values(values))
+            elif opcode == INDEX:
+                index = stack.pop()
+                stack[-1] = index_value(stack[-1], index)
+            elif opcode == LOAD_UNDEFINED:
+                raise Exception(f"Error: Variable '{code.names[operand]}' not found")
+            else:
+                raise Exception(f"Error: Unknown opcode {opcode}")
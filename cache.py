@@ -0,0 +1,213 @@
+import builtins
+import hashlib
+import marshal
+import os
+import sys
+
+from my_parser import *
+
+CACHE_DIRECTORY = 'lambda-interpreter'  # Default cache directory, created in the user's cache directory
+MAGIC = b'LAMBDA-AST 2\n'  # First line of every cache file, bumped when the encoding changes
+MAX_PROGRAM_SIZE = 1 << 20  # Bytes of the largest program cached; larger ones are streamed instead
+
+# AST node classes, indexed by the type code stored in encoded nodes (InlineNodes are only built at run time)
+NODE_TYPES = (NumberNode, BooleanNode, IdentifierNode, BinaryOpNode, UnaryOpNode,
+              LambdaNode, FunctionCallNode, FunctionDefNode, IfElseNode, ListNode, IndexNode, ImportNode, LetNode)
+# Constructor parameter names of each node class, in the order they are encoded
+NODE_FIELDS = tuple(cls.__init__.__code__.co_varnames[1:cls.__init__.__code__.co_argcount] for cls in NODE_TYPES)
+NODE_CODES = {cls: code for code, cls in enumerate(NODE_TYPES)}
+
+
+def encode_node(node):
+    """
+    Encode an AST node as nested tuples and lists that marshal can store.
+
+    A node becomes a tuple (type code, field values...); lists stay lists, so tuples are
+    always nodes.
+
+    :param node: The AST node or field value.
+    :return: The encoded value.
+    """
+    if isinstance(node, ASTNode):
+        code = NODE_CODES[type(node)]
+        return (code,) + tuple(encode_node(getattr(node, field)) for field in NODE_FIELDS[code])
+    if isinstance(node, list):
+        return [encode_node(item) for item in node]
+    return node
+
+
+def decode_node(value):
+    """
+    Rebuild an AST node encoded by encode_node.
+
+    :param value: The encoded value.
+    :return: The AST node or field value.
+    """
+    if type(value) is tuple:
+        return NODE_TYPES[value[0]](*[decode_node(item) for item in value[1:]])
+    if type(value) is list:
+        return [decode_node(item) for item in value]
+    return value
+
+
+def encode_error(error):
+    """
+    Encode the exception raised while parsing a statement as plain data, so that loading a
+    cache file never builds arbitrary objects.
+
+    :param error: The exception.
+    :return: A pair (type name, message).
+    """
+    return type(error).__name__, str(error)
+
+
+def decode_error(value):
+    """
+    Rebuild an exception encoded by encode_error. Only the built-in exception types are
+    rebuilt; any other type becomes an Exception with the same message.
+
+    :param value: The pair (type name, message).
+    :return: The exception.
+    """
+    name, message = value
+    cls = getattr(builtins, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        cls = Exception
+    return cls(message)
+
+
+def encode_program(statements):
+    """
+    Encode the statements returned by Interpreter.parse_program.
+
+    :param statements: A list of (line, AST node, error) tuples.
+    :return: The encoded statements, as bytes.
+    """
+    return marshal.dumps([(line, encode_node(ast), None if error is None else encode_error(error))
+                          for line, ast, error in statements])
+
+
+def decode_program(data):
+    """
+    Decode statements encoded by encode_program.
+
+    :param data: The encoded statements, as bytes.
+    :return: A list of (line, AST node, error) tuples.
+    """
+    return [(line, decode_node(ast), None if error is None else decode_error(error))
+            for line, ast, error in marshal.loads(data)]
+
+
+def default_directory():
+    """
+    Get the default cache directory: a directory of the user's cache directory
+    ($XDG_CACHE_HOME, or ~/.cache), so that cache files are never read from a directory
+    that other users can write to.
+
+    :return: The path of the directory.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, CACHE_DIRECTORY)
+
+
+# On-disk cache of parsed programs, keyed by the hash of their source and the interpreter version
+class ProgramCache:
+    def __init__(self, version, directory=None):
+        """
+        Initialize the ProgramCache.
+
+        :param version: The interpreter version; entries written by another version are rebuilt.
+        :param directory: The directory holding cache files, or None to use the user's cache directory.
+        """
+        self.version = version  # Interpreter version stored in every key
+        self.directory = directory or default_directory()  # Directory holding cache files
+        self.hits = 0  # Number of programs loaded from the cache
+        self.misses = 0  # Number of programs parsed because no valid entry existed
+
+    def key(self, source, variant):
+        """
+        Compute the cache key of a program.
+
+        :param source: The source code, as bytes.
+        :param variant: A string describing how the entry was built (e.g. whether it is optimized).
+        :return: The key, as hex-encoded bytes.
+        """
+        digest = hashlib.sha256()
+        for part in (self.version, sys.implementation.cache_tag, variant):
+            digest.update(part.encode() + b'\0')
+        digest.update(source)
+        return digest.hexdigest().encode()
+
+    def path(self, filename, variant=''):
+        """
+        Get the path of the cache file of a source file. Each variant has its own file, like
+        the .opt-1.pyc files of Python, and the name includes a hash of the absolute path of
+        the source, so that sources with the same name in different directories do not collide.
+
+        :param filename: The path of the source file.
+        :param variant: A string describing how the entry was built (e.g. whether it is optimized).
+        :return: The path of the cache file.
+        """
+        source = os.path.abspath(filename)
+        location = hashlib.sha256(source.encode(errors='surrogateescape')).hexdigest()[:16]
+        suffix = f'.{variant}.cache' if variant else '.cache'
+        return os.path.join(self.directory, f'{os.path.basename(source)}-{location}{suffix}')
+
+    def load(self, filename, parse, variant=''):
+        """
+        Load the parsed form of a source file, parsing and storing it if no valid cache entry exists.
+
+        :param filename: The path of the source file.
+        :param parse: Function turning the source code (a string) into (line, AST node, error) statements.
+        :param variant: A string describing how the entry was built (e.g. whether it is optimized).
+        :return: The cached or freshly parsed statements.
+        """
+        with open(filename, 'rb') as file:
+            source = file.read()
+        key = self.key(source, variant)
+        path = self.path(filename, variant)
+        value = self.read(path, key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = parse(source.decode())
+        self.write(path, key, value)
+        return value
+
+    def read(self, path, key):
+        """
+        Read a cache entry.
+
+        :param path: The path of the cache file.
+        :param key: The expected key.
+        :return: The cached statements, or None if the entry is missing, stale or corrupt.
+        """
+        try:
+            with open(path, 'rb') as file:
+                if file.readline() != MAGIC or file.readline().rstrip(b'\n') != key:
+                    return None
+                return decode_program(file.read())
+        except Exception:
+            return None  # Missing, truncated or corrupt entries are rebuilt
+
+    def write(self, path, key, value):
+        """
+        Write a cache entry atomically. Failures (e.g. a read-only directory) are ignored.
+
+        :param path: The path of the cache file.
+        :param key: The key of the entry.
+        :param value: The statements to cache.
+        """
+        temporary = f'{path}.{os.getpid()}.tmp'
+        try:
+            data = encode_program(value)
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            with open(temporary, 'wb') as file:
+                file.write(MAGIC + key + b'\n' + data)
+            os.replace(temporary, path)
+        except Exception:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
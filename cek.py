@@ -0,0 +1,335 @@
+from compiler import (ARITHMETIC_OPS, COMPARISON_OPS, LOGICAL_OPS, SHORT_CIRCUIT, arithmetic_fallback, call_error,
+                      compare_fallback, logical_error, operand_error, type_name)
+from my_parser import *
+from sequences import Sequence, index_value
+
+# Continuation tags: what to do with the value of the sub-expression just evaluated
+BINARY_LEFT = 0  # (tag, node, frame): evaluate the right operand next, unless a logical operator is decided
+BINARY_RIGHT = 1  # (tag, node, left value): apply the operator
+UNARY = 2  # (tag, node): apply the unary operator
+IF_ELSE = 3  # (tag, node, frame): pick a branch
+CALL_FUNC = 4  # (tag, node, frame): the function was evaluated, evaluate the arguments
+CALL_ARGS = 5  # (tag, node, frame, function, argument list): collect one more argument
+LIST = 6  # (tag, node, frame, element list): collect one more element of a sequence literal
+INDEX_SEQUENCE = 7  # (tag, node, frame): the sequence was evaluated, evaluate the index
+INDEX = 8  # (tag, sequence): index the sequence
+LET = 9  # (tag, node, frame, value list): collect one more value bound by a LetNode
+RETURN = 10  # (tag,): the end of a function body entered by a call that is not in tail position
+
+RETURN_MARK = (RETURN,)  # The only RETURN continuation, pushed when the call depth is limited
+
+
+def apply_binary_op(op, left, right):
+    """
+    Apply a binary operator to two evaluated operands, with the reference type checks. A
+    logical operator whose left operand decides it ignores its right operand, as if it had
+    not been evaluated.
+
+    :param op: The binary operator.
+    :param left: The left operand.
+    :param right: The right operand.
+    :return: The result of the operation.
+    """
+    if op in ARITHMETIC_OPS:
+        if not isinstance(left, int) or not isinstance(right, int):
+            return arithmetic_fallback(op, left, right)
+        if op == '/' and right == 0:
+            raise ZeroDivisionError("division by zero")
+        return ARITHMETIC_OPS[op](left, right)
+    elif op in LOGICAL_OPS:
+        if not isinstance(left, bool):
+            raise logical_error(op, left)
+        if left is SHORT_CIRCUIT[op]:
+            return left
+        if not isinstance(right, bool):
+            raise operand_error(op, left, right)
+        return right
+    elif op in COMPARISON_OPS:
+        if type(left) is not type(right):
+            return compare_fallback(op, left, right)
+        try:
+            return COMPARISON_OPS[op](left, right)
+        except TypeError:
+            return compare_fallback(op, left, right)  # Ordering of unordered values
+    raise Exception(f"Error: Unsupported binary operator: '{op}'")
+
+
+# Runtime representation of a lambda or named function in the CEK machine
+class Closure:
+    __slots__ = ('name', 'params', 'body', 'frame', 'machine')
+
+    def __init__(self, name, params, body, frame, machine):
+        self.name = name  # Function name, or None for lambdas
+        self.params = params  # List of parameter names
+        self.body = body  # Resolved AST of the function body
+        self.frame = frame  # Frame captured at creation time (None at top level)
+        self.machine = machine  # The machine used when the closure is called from Python
+
+    def arity_error(self, count):
+        """
+        Build the error raised when the closure is called with the wrong number of arguments.
+
+        :param count: The number of arguments that were passed.
+        :return: The Exception to raise.
+        """
+        if self.name is None:
+            return Exception(f"Error: Lambda expected {len(self.params)} arguments but got {count}.")
+        return Exception(
+            f"Error: Function '{self.name}' expected {len(self.params)} arguments but got {count}.")
+
+    def __call__(self, *args):
+        if len(args) != len(self.params):
+            raise self.arity_error(len(args))
+        return self.machine.execute(self.body, [*args, self.frame], True)
+
+    def __repr__(self):
+        return f'<function {self.name or "lambda"}>'
+
+
+# CEK-style machine evaluating resolved ASTs with an explicit continuation stack.
+# The machine alternates between evaluating a node (Control) in a frame (Environment)
+# and returning a value to the continuation on top of a heap-allocated list
+# (Kontinuation), so the depth of recursion in the program is bounded only by memory.
+# Frames are the same list-backed records as in the closure compiler. Calls to closures
+# do not push a continuation, so tail calls run in constant space as well; when the call
+# depth is limited, a call that is not in tail position pushes a RETURN continuation,
+# which marks the end of the function body and counts as one call in progress.
+class Machine:
+    def __init__(self, global_env, define=None, budget=None):
+        """
+        Initialize the Machine.
+
+        :param global_env: The global environment for storing variables and functions.
+        :param define: Function binding a name to a function created by 'def' (defaults to global_env.set).
+        :param budget: The Budget that calls and closures account to, or None for no limits. As in the
+                       other backends, the depth checked against it is the number of calls in progress,
+                       not counting calls in tail position.
+        """
+        self.global_env = global_env  # Global environment for storing variables and functions
+        self.define = define or global_env.set  # Binds functions created by 'def'
+        self.budget = budget  # Limits of each evaluation, or None
+
+    def run(self, node):
+        """
+        Execute a resolved top-level AST node.
+
+        :param node: The AST node to run, as returned by Resolver.resolve.
+        :return: The result of the execution.
+        """
+        return self.execute(node, None)
+
+    def execute(self, node, frame, body=False):
+        """
+        Evaluate a resolved AST node in a frame until the continuation stack is empty.
+
+        :param node: The AST node to evaluate.
+        :param frame: The frame holding the values of local identifiers.
+        :param body: Whether the node is the body of a closure called from Python, whose
+                     call was accounted for by the caller.
+        :return: The value of the node.
+        """
+        budget = self.budget
+        if budget is None or budget.max_depth is None:
+            return self.evaluate(node, frame, body, False)
+        depth = budget.depth
+        try:
+            return self.evaluate(node, frame, body, True)
+        finally:
+            budget.depth = depth  # Calls left by an exception are no longer in progress
+
+    def evaluate(self, node, frame, body, counting):
+        """
+        Run the machine for execute().
+
+        :param node: The AST node to evaluate.
+        :param frame: The frame holding the values of local identifiers.
+        :param body: Whether the node is the body of a closure called from Python.
+        :param counting: Whether calls push RETURN continuations counted in the budget's depth.
+        :return: The value of the node.
+        """
+        global_env = self.global_env
+        variables = global_env.variables
+        budget = self.budget
+        stack = [RETURN_MARK] if body and counting else []  # Continuation stack; calls from the body are tail calls
+        while True:
+            # Evaluate the control node until it produces a value
+            while True:
+                node_type = type(node)
+                if node_type is IdentifierNode:
+                    scope = node.scope
+                    if scope == 'local':
+                        values = frame
+                        for _ in range(node.depth):
+                            values = values[-1]
+                        value = values[node.slot]
+                    elif scope == 'global':
+                        name = node.name
+                        value = variables[name] if name in variables else global_env.get(name)
+                    else:
+                        raise Exception(f"Error: Variable '{node.name}' not found")
+                    break
+                elif node_type is NumberNode or node_type is BooleanNode:
+                    value = node.value
+                    break
+                elif node_type is BinaryOpNode:
+                    stack.append((BINARY_LEFT, node, frame))
+                    node = node.left
+                elif node_type is IfElseNode:
+                    stack.append((IF_ELSE, node, frame))
+                    node = node.condition
+                elif node_type is FunctionCallNode:
+                    stack.append((CALL_FUNC, node, frame))
+                    node = node.func
+                elif node_type is UnaryOpNode:
+                    stack.append((UNARY, node))
+                    node = node.operand
+                elif node_type is ListNode:
+                    if not node.elements:
+                        value = Sequence.from_values([])
+                        break
+                    stack.append((LIST, node, frame, []))
+                    node = node.elements[0]
+                elif node_type is IndexNode:
+                    stack.append((INDEX_SEQUENCE, node, frame))
+                    node = node.sequence
+                elif node_type is LetNode:
+                    stack.append((LET, node, frame, []))
+                    node = node.values[0]
+                elif node_type is InlineNode:
+                    if variables.get(node.name) is node.function:
+                        if budget is not None:
+                            budget.ticks -= 1  # The inlined call costs the fuel of the call it replaces
+                            if budget.ticks < 0:
+                                budget.settle()
+                        node = node.body
+                    else:
+                        node = node.call
+                elif node_type is LambdaNode:
+                    if budget is not None:
+                        budget.allocate()
+                    value = Closure(None, node.params, node.body, frame, self)
+                    break
+                elif node_type is FunctionDefNode:
+                    if budget is not None:
+                        budget.allocate()
+                    self.define(node.name, Closure(node.name, node.params, node.body, frame, self))
+                    value = "Function created!"
+                    break
+                else:
+                    raise Exception(f"No method to evaluate node type {node_type.__name__}")
+
+            # Return the value to continuations until one asks for another node to be evaluated
+            while True:
+                if not stack:
+                    return value
+                continuation = stack.pop()
+                tag = continuation[0]
+                if tag == BINARY_RIGHT:
+                    value = apply_binary_op(continuation[1].op, continuation[2], value)
+                    continue
+                elif tag == BINARY_LEFT:
+                    node = continuation[1]
+                    if node.op in SHORT_CIRCUIT:
+                        if not isinstance(value, bool):
+                            raise logical_error(node.op, value)
+                        if value is SHORT_CIRCUIT[node.op]:
+                            continue
+                    frame = continuation[2]
+                    stack.append((BINARY_RIGHT, node, value))
+                    node = node.right
+                    break
+                elif tag == IF_ELSE:
+                    node = continuation[1].if_body if value else continuation[1].else_body
+                    frame = continuation[2]
+                    break
+                elif tag == CALL_FUNC:
+                    node = continuation[1]
+                    frame = continuation[2]
+                    if not callable(value):
+                        raise call_error(value)
+                    if node.args:
+                        stack.append((CALL_ARGS, node, frame, value, []))
+                        node = node.args[0]
+                        break
+                    func = value
+                    args = []
+                elif tag == CALL_ARGS:
+                    node = continuation[1]
+                    frame = continuation[2]
+                    args = continuation[4]
+                    args.append(value)
+                    if len(args) < len(node.args):
+                        stack.append(continuation)
+                        node = node.args[len(args)]
+                        break
+                    func = continuation[3]
+                elif tag == LIST:
+                    elements = continuation[3]
+                    elements.append(value)
+                    node = continuation[1]
+                    if len(elements) < len(node.elements):
+                        stack.append(continuation)
+                        frame = continuation[2]
+                        node = node.elements[len(elements)]
+                        break
+                    value = Sequence.from_values(elements)
+                    continue
+                elif tag == INDEX_SEQUENCE:
+                    stack.append((INDEX, value))
+                    frame = continuation[2]
+                    node = continuation[1].index
+                    break
+                elif tag == INDEX:
+                    value = index_value(continuation[1], value)
+                    continue
+                elif tag == RETURN:
+                    budget.depth -= 1
+                    continue
+                elif tag == LET:
+                    values = continuation[3]
+                    values.append(value)
+                    node = continuation[1]
+                    frame = continuation[2]
+                    if len(values) < len(node.values):
+                        stack.append(continuation)
+                        node = node.values[len(values)]
+                        break
+                    values.append(frame)
+                    frame = values
+                    node = node.body  # In the position of the LetNode, so tail calls stay in constant space
+                    break
+                else:
+                    operand = value
+                    if continuation[1].op != '!':
+                        raise Exception(f"Error: Unsupported unary operator: '{continuation[1].op}'")
+                    if not isinstance(operand, bool):
+                        raise TypeError(f"Unsupported operand type for !: '{type_name(operand)}'")
+                    value = not operand
+                    continue
+
+                # All arguments of a call are evaluated: enter the function
+                # Functions of other machines, such as an imported module's, run there with their own globals
+                if type(func) is Closure and func.machine is self:
+                    if len(func.params) != len(args):
+                        raise func.arity_error(len(args))
+                    if budget is not None:
+                        budget.ticks -= 1  # Budget.tail_call, inlined
+                        if budget.ticks < 0:
+                            budget.settle()
+                        if counting and (not stack or stack[-1] is not RETURN_MARK):
+                            budget.depth += 1
+                            if budget.depth > budget.depth_limit:
+                                raise budget.depth_error()
+                            stack.append(RETURN_MARK)
+                    args.append(func.frame)
+                    frame = args
+                    node = func.body
+                    break
+                if budget is not None:
+                    budget.call()
+                    try:
+                        value = func(*args)
+                    finally:
+                        budget.leave()
+                else:
+                    value = func(*args)
@@ -0,0 +1,702 @@
+import operator
+
+from my_parser import *
+from sequences import Sequence, index_value, type_name
+
+# Operator implementations, resolved once per BinaryOpNode at compile time
+ARITHMETIC_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.floordiv,
+    '%': operator.mod,
+}
+LOGICAL_OPS = {
+    '&&': lambda left, right: left and right,
+    '||': lambda left, right: left or right,
+}
+# Left operand value that decides each logical operator, which then skips its right operand
+SHORT_CIRCUIT = {'&&': False, '||': True}
+COMPARISON_OPS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+
+def operand_error(op, left, right):
+    """
+    Build the TypeError raised for invalid binary operands.
+
+    :param op: The binary operator.
+    :param left: The evaluated left operand.
+    :param right: The evaluated right operand.
+    :return: The TypeError to raise.
+    """
+    return TypeError(
+        f"Unsupported operand type(s) for {op}: '{type_name(left)}' and '{type_name(right)}'")
+
+
+def logical_error(op, left):
+    """
+    Build the TypeError raised when the left operand of a logical operator is not a boolean;
+    the right operand is not evaluated.
+
+    :param op: The logical operator.
+    :param left: The evaluated left operand.
+    :return: The TypeError to raise.
+    """
+    return TypeError(f"Unsupported left operand type for {op}: '{type_name(left)}'")
+
+
+def arithmetic_fallback(op, left, right):
+    """
+    Apply an arithmetic operator to operands that are not both ints: '+' concatenates two
+    sequences, and any other combination is a type error.
+
+    :param op: The arithmetic operator.
+    :param left: The evaluated left operand.
+    :param right: The evaluated right operand.
+    :return: The concatenated Sequence.
+    :raises TypeError: If the operands are not two sequences added together.
+    """
+    if op == '+' and type(left) is Sequence and type(right) is Sequence:
+        return left.concat(right)
+    raise operand_error(op, left, right)
+
+
+def compare_error(left, right):
+    """
+    Build the TypeError raised when comparing values of different types.
+
+    :param left: The evaluated left operand.
+    :param right: The evaluated right operand.
+    :return: The TypeError to raise.
+    """
+    return TypeError(f"Cannot compare different types: '{type_name(left)}' and '{type_name(right)}'")
+
+
+def compare_fallback(op, left, right):
+    """
+    Apply a comparison operator to operands of different Python types, or an ordering
+    operator to values that have no order. Functions are one type of the language whatever
+    implements them, e.g. a memoized function and a lambda, and are only equal to themselves;
+    only numbers and booleans are ordered; any other mix of types is an error.
+
+    :param op: The comparison operator.
+    :param left: The evaluated left operand.
+    :param right: The evaluated right operand.
+    :return: The result of an equality test between two functions.
+    :raises TypeError: If the operands are not two functions tested for equality.
+    """
+    if callable(left) and callable(right):
+        if op == '==':
+            return left is right
+        if op == '!=':
+            return left is not right
+        raise operand_error(op, left, right)
+    if type(left) is type(right):
+        raise operand_error(op, left, right)
+    raise compare_error(left, right)
+
+
+def call_error(func):
+    """
+    Build the error raised when calling a value that is not a function.
+
+    :param func: The value that was called.
+    :return: The Exception to raise.
+    """
+    return Exception(f"Error: Attempt to call a non-function value '{func}'.")
+
+
+# Runtime representation of a compiled lambda or named function
+class Function:
+    __slots__ = ('name', 'params', 'body', 'frame')
+
+    def __init__(self, name, params, body, frame):
+        self.name = name  # Function name, or None for lambdas
+        self.params = params  # List of parameter names
+        self.body = body  # Compiled closure of the function body
+        self.frame = frame  # Frame captured at creation time (None at top level)
+
+    def arity_error(self, count):
+        """
+        Build the error raised when the function is called with the wrong number of arguments.
+
+        :param count: The number of arguments that were passed.
+        :return: The Exception to raise.
+        """
+        if self.name is None:
+            return Exception(f"Error: Lambda expected {len(self.params)} arguments but got {count}.")
+        return Exception(
+            f"Error: Function '{self.name}' expected {len(self.params)} arguments but got {count}.")
+
+    def __call__(self, *args):
+        if len(args) != len(self.params):
+            raise self.arity_error(len(args))
+        result = self.body([*args, self.frame])
+        if type(result) is TailCall:
+            result = trampoline(result)
+        return result
+
+    def __repr__(self):
+        return f'<function {self.name or "lambda"}>'
+
+
+# Pending call returned from a tail position instead of growing the Python stack
+class TailCall:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, args):
+        self.func = func  # The Function to call
+        self.args = args  # The evaluated argument list
+
+
+def trampoline(result):
+    """
+    Run pending tail calls until a function body produces a value.
+
+    :param result: The TailCall returned by a function body.
+    :return: The final result of the call chain.
+    """
+    while type(result) is TailCall:
+        func = result.func
+        args = result.args
+        if len(func.params) != len(args):
+            raise func.arity_error(len(args))
+        args.append(func.frame)
+        result = func.body(args)
+    return result
+
+
+# Compiler class turning resolved AST nodes into trees of pre-bound Python closures.
+# Compiled code runs on frames: plain lists holding the parameter values of one call (or
+# the values bound by a LetNode) by slot, followed by the enclosing frame. Top-level code runs with the frame None.
+# Calls in tail position of a function body return a TailCall, which the caller's
+# trampoline runs, so tail-recursive loops use constant Python stack.
+class Compiler:
+    def __init__(self, global_env, tail_calls=True, define=None, budget=None):
+        """
+        Initialize the Compiler.
+
+        :param global_env: The global environment for storing variables and functions.
+        :param tail_calls: Whether calls in tail position are run through the trampoline.
+        :param define: Function binding a name to a function created by 'def' (defaults to global_env.set).
+        :param budget: The Budget that compiled calls and closures account to, or None for no limits.
+        """
+        self.global_env = global_env  # Global environment for storing variables and functions
+        self.tail_calls = tail_calls  # Whether tail calls are compiled to TailCall results
+        self.define = define or global_env.set  # Binds functions created by 'def'
+        self.budget = budget  # Limits of each evaluation; without one, no accounting code is compiled
+
+    def run(self, node):
+        """
+        Compile a resolved top-level AST node and execute it.
+
+        :param node: The AST node to run, as returned by Resolver.resolve.
+        :return: The result of the execution.
+        """
+        return self.compile(node)(None)
+
+    def compile(self, node):
+        """
+        Compile a given AST node into a closure taking a frame.
+
+        :param node: The AST node to compile.
+        :return: A function of one argument (the frame) returning the node's value.
+        :raises Exception: If the node type is not supported.
+        """
+        method_name = f'compile_{type(node).__name__}'
+        method = getattr(self, method_name, None)
+        if method is None:
+            raise Exception(f"No method to compile node type {type(node).__name__}")
+        return method(node)
+
+    def compile_tail(self, node):
+        """
+        Compile an AST node that is in tail position of a function body.
+
+        :param node: The AST node to compile.
+        :return: The compiled closure, which may return a TailCall.
+        """
+        if not self.tail_calls:
+            return self.compile(node)
+        if isinstance(node, FunctionCallNode):
+            return self.compile_tail_call(node)
+        if isinstance(node, IfElseNode):
+            return self.compile_IfElseNode(node, tail=True)
+        if isinstance(node, LetNode):
+            return self.compile_LetNode(node, tail=True)
+        if isinstance(node, InlineNode):
+            return self.compile_InlineNode(node, tail=True)
+        return self.compile(node)
+
+    def compile_NumberNode(self, node):
+        value = node.value
+        return lambda frame: value
+
+    def compile_BooleanNode(self, node):
+        value = node.value
+        return lambda frame: value
+
+    def compile_IdentifierNode(self, node):
+        """
+        Compile an IdentifierNode into an indexed frame load or a global lookup.
+
+        :param node: The resolved IdentifierNode to compile.
+        :return: The compiled closure.
+        """
+        name = node.name
+        if node.scope == 'local':
+            slot = node.slot
+            depth = node.depth
+            if depth == 0:
+                return lambda frame: frame[slot]
+            if depth == 1:
+                return lambda frame: frame[-1][slot]
+            if depth == 2:
+                return lambda frame: frame[-1][-1][slot]
+
+            def deep_local(frame):
+                for _ in range(depth):
+                    frame = frame[-1]
+                return frame[slot]
+
+            return deep_local
+
+        if node.scope == 'undefined':
+            def undefined(frame):
+                raise Exception(f"Error: Variable '{name}' not found")
+
+            return undefined
+
+        global_env = self.global_env
+        variables = global_env.variables
+
+        def global_identifier(frame):
+            if name in variables:
+                return variables[name]
+            return global_env.get(name)
+
+        return global_identifier
+
+    def compile_BinaryOpNode(self, node):
+        """
+        Compile a BinaryOpNode, choosing the operator implementation at compile time.
+
+        :param node: The BinaryOpNode to compile.
+        :return: The compiled closure.
+        """
+        op = node.op
+        left = self.compile(node.left)
+        if op in ARITHMETIC_OPS and isinstance(node.right, NumberNode) and (op not in ('/', '%') or node.right.value):
+            return self.arithmetic_constant(op, left, node.right.value)
+        if op in COMPARISON_OPS and isinstance(node.right, NumberNode):
+            return self.comparison_constant(op, left, node.right.value)
+        right = self.compile(node.right)
+
+        if op in ARITHMETIC_OPS:
+            func = ARITHMETIC_OPS[op]
+            if op == '/':
+                def divide(frame):
+                    left_value = left(frame)
+                    right_value = right(frame)
+                    if not isinstance(left_value, int) or not isinstance(right_value, int):
+                        raise operand_error(op, left_value, right_value)
+                    if right_value == 0:
+                        raise ZeroDivisionError("division by zero")
+                    return left_value // right_value
+
+                return divide
+
+            def arithmetic(frame):
+                left_value = left(frame)
+                right_value = right(frame)
+                if isinstance(left_value, int) and isinstance(right_value, int):
+                    return func(left_value, right_value)
+                return arithmetic_fallback(op, left_value, right_value)
+
+            return arithmetic
+
+        elif op in LOGICAL_OPS:
+            decisive = SHORT_CIRCUIT[op]
+
+            def logical(frame):
+                left_value = left(frame)
+                if type(left_value) is not bool:
+                    raise logical_error(op, left_value)
+                if left_value is decisive:
+                    return left_value
+                right_value = right(frame)
+                if type(right_value) is bool:
+                    return right_value
+                raise operand_error(op, left_value, right_value)
+
+            return logical
+
+        elif op in COMPARISON_OPS:
+            func = COMPARISON_OPS[op]
+
+            def comparison(frame):
+                left_value = left(frame)
+                right_value = right(frame)
+                if type(left_value) is not type(right_value):
+                    return compare_fallback(op, left_value, right_value)
+                try:
+                    return func(left_value, right_value)
+                except TypeError:
+                    return compare_fallback(op, left_value, right_value)  # Ordering of unordered values
+
+            return comparison
+
+        else:
+            def unsupported(frame):
+                left(frame)
+                right(frame)
+                raise Exception(f"Error: Unsupported binary operator: '{op}'")
+
+            return unsupported
+
+    def arithmetic_constant(self, op, left, constant):
+        """
+        Compile an arithmetic operation whose right operand is a (non-zero divisor) number literal.
+
+        :param op: The arithmetic operator.
+        :param left: The compiled left operand.
+        :param constant: The integer value of the right operand.
+        :return: The compiled closure.
+        """
+        func = ARITHMETIC_OPS[op]
+
+        def arithmetic(frame):
+            left_value = left(frame)
+            if isinstance(left_value, int):
+                return func(left_value, constant)
+            raise operand_error(op, left_value, constant)
+
+        return arithmetic
+
+    def comparison_constant(self, op, left, constant):
+        """
+        Compile a comparison whose right operand is a number literal.
+
+        :param op: The comparison operator.
+        :param left: The compiled left operand.
+        :param constant: The integer value of the right operand.
+        :return: The compiled closure.
+        """
+        func = COMPARISON_OPS[op]
+
+        def comparison(frame):
+            left_value = left(frame)
+            if type(left_value) is not int:
+                raise compare_error(left_value, constant)
+            return func(left_value, constant)
+
+        return comparison
+
+    def compile_UnaryOpNode(self, node):
+        op = node.op
+        operand = self.compile(node.operand)
+        if op == '!':
+            def logical_not(frame):
+                value = operand(frame)
+                if not isinstance(value, bool):
+                    raise TypeError(f"Unsupported operand type for {op}: '{type_name(value)}'")
+                return not value
+
+            return logical_not
+
+        def unsupported(frame):
+            operand(frame)
+            raise Exception(f"Error: Unsupported unary operator: '{op}'")
+
+        return unsupported
+
+    def compile_LambdaNode(self, node):
+        params = node.params
+        body = self.compile_tail(node.body)
+        budget = self.budget
+        if budget is not None:
+            def budgeted_lambda(frame):
+                budget.ticks -= 1
+                budget.closures += 1
+                if budget.ticks < 0:
+                    budget.settle()
+                return Function(None, params, body, frame)
+
+            return budgeted_lambda
+        return lambda frame: Function(None, params, body, frame)
+
+    def compile_FunctionDefNode(self, node):
+        name = node.name
+        params = node.params
+        body = self.compile_tail(node.body)
+        bind = self.define
+        budget = self.budget
+
+        def define(frame):
+            if budget is not None:
+                budget.allocate()
+            bind(name, Function(name, params, body, frame))
+            return "Function created!"
+
+        return define
+
+    def compile_FunctionCallNode(self, node):
+        """
+        Compile a FunctionCallNode. Calls to compiled Functions are performed inline,
+        without going through Function.__call__.
+
+        :param node: The FunctionCallNode to compile.
+        :return: The compiled closure.
+        """
+        func_code = self.compile(node.func)
+        arg_codes = [self.compile(arg) for arg in node.args]
+        if self.budget is not None:
+            return self.budgeted_call(func_code, arg_codes, tail=False)
+        count = len(arg_codes)
+
+        def call(frame):
+            func = func_code(frame)
+            if not callable(func):
+                raise call_error(func)
+            args = [arg(frame) for arg in arg_codes]
+            if type(func) is Function:
+                if len(func.params) != count:
+                    raise func.arity_error(count)
+                args.append(func.frame)
+                result = func.body(args)
+                if type(result) is TailCall:
+                    result = trampoline(result)
+                return result
+            return func(*args)
+
+        if count == 1:
+            arg_code = arg_codes[0]
+
+            def call(frame):
+                func = func_code(frame)
+                if not callable(func):
+                    raise call_error(func)
+                arg = arg_code(frame)
+                if type(func) is Function:
+                    if len(func.params) != 1:
+                        raise func.arity_error(1)
+                    result = func.body([arg, func.frame])
+                    if type(result) is TailCall:
+                        result = trampoline(result)
+                    return result
+                return func(arg)
+
+        return call
+
+    def compile_tail_call(self, node):
+        """
+        Compile a FunctionCallNode in tail position. Calls to compiled Functions are
+        returned as a TailCall for the caller's trampoline to run.
+
+        :param node: The FunctionCallNode to compile.
+        :return: The compiled closure.
+        """
+        func_code = self.compile(node.func)
+        arg_codes = [self.compile(arg) for arg in node.args]
+        if self.budget is not None:
+            return self.budgeted_call(func_code, arg_codes, tail=True)
+
+        def tail_call(frame):
+            func = func_code(frame)
+            if not callable(func):
+                raise call_error(func)
+            args = [arg(frame) for arg in arg_codes]
+            if type(func) is Function:
+                return TailCall(func, args)
+            return func(*args)
+
+        return tail_call
+
+    def budgeted_call(self, func_code, arg_codes, tail):
+        """
+        Build the closure of a call that accounts for itself in the budget. It is only
+        compiled when limits are set, so unlimited programs keep the plain call closures;
+        the counters are updated inline rather than through Budget.call, which costs a
+        method call per call.
+
+        :param func_code: The compiled closure of the called expression.
+        :param arg_codes: The compiled closures of the arguments.
+        :param tail: Whether the call is in tail position.
+        :return: The compiled closure.
+        """
+        budget = self.budget
+        count = len(arg_codes)
+        depth_limit = budget.depth_limit
+        nested = budget.max_depth is not None  # Whether the depth is counted
+
+        if tail:
+            def tail_call(frame):
+                func = func_code(frame)
+                if not callable(func):
+                    raise call_error(func)
+                args = [arg(frame) for arg in arg_codes]
+                if type(func) is Function:
+                    budget.ticks -= 1
+                    if budget.ticks < 0:
+                        budget.settle()
+                    return TailCall(func, args)
+                return call_value(func, args)
+
+            return tail_call
+
+        def call_value(func, args):
+            # Calls of values other than compiled Functions, e.g. memoized functions
+            budget.ticks -= 1
+            if budget.ticks < 0:
+                budget.settle()
+            if budget.depth >= depth_limit:
+                raise budget.depth_error()
+            budget.depth += 1
+            try:
+                return func(*args)
+            finally:
+                budget.depth -= 1  # Also when the call raises, for Python callers that catch the error
+
+        def call_function(func, args):
+            budget.ticks -= 1
+            if budget.ticks < 0:
+                budget.settle()
+            if nested:
+                if budget.depth >= depth_limit:
+                    raise budget.depth_error()
+                budget.depth += 1
+                try:
+                    result = func.body(args)
+                    if type(result) is TailCall:
+                        result = trampoline(result)
+                    return result
+                finally:
+                    budget.depth -= 1
+            result = func.body(args)
+            if type(result) is TailCall:
+                result = trampoline(result)
+            return result
+
+        if count == 1:
+            arg_code = arg_codes[0]
+
+            def call(frame):
+                func = func_code(frame)
+                if not callable(func):
+                    raise call_error(func)
+                arg = arg_code(frame)
+                if type(func) is Function:
+                    if len(func.params) != 1:
+                        raise func.arity_error(1)
+                    budget.ticks -= 1
+                    if budget.ticks < 0:
+                        budget.settle()
+                    if nested:
+                        if budget.depth >= depth_limit:
+                            raise budget.depth_error()
+                        budget.depth += 1
+                        try:
+                            result = func.body([arg, func.frame])
+                            if type(result) is TailCall:
+                                result = trampoline(result)
+                            return result
+                        finally:
+                            budget.depth -= 1
+                    result = func.body([arg, func.frame])
+                    if type(result) is TailCall:
+                        result = trampoline(result)
+                    return result
+                return call_value(func, [arg])
+
+            return call
+
+        def call(frame):
+            func = func_code(frame)
+            if not callable(func):
+                raise call_error(func)
+            args = [arg(frame) for arg in arg_codes]
+            if type(func) is Function:
+                if len(func.params) != count:
+                    raise func.arity_error(count)
+                args.append(func.frame)
+                return call_function(func, args)
+            return call_value(func, args)
+
+        return call
+
+    def compile_ListNode(self, node):
+        element_codes = [self.compile(element) for element in node.elements]
+        from_values = Sequence.from_values
+        return lambda frame: from_values([element(frame) for element in element_codes])
+
+    def compile_IndexNode(self, node):
+        sequence = self.compile(node.sequence)
+        index = self.compile(node.index)
+        return lambda frame: index_value(sequence(frame), index(frame))
+
+    def compile_IfElseNode(self, node, tail=False):
+        condition = self.compile(node.condition)
+        if tail:
+            if_body = self.compile_tail(node.if_body)
+            else_body = self.compile_tail(node.else_body)
+        else:
+            if_body = self.compile(node.if_body)
+            else_body = self.compile(node.else_body)
+
+        def if_else(frame):
+            if condition(frame):
+                return if_body(frame)
+            return else_body(frame)
+
+        return if_else
+
+    def compile_LetNode(self, node, tail=False):
+        value_codes = [self.compile(value) for value in node.values]
+        body = self.compile_tail(node.body) if tail else self.compile(node.body)
+        if len(value_codes) == 1:
+            value_code = value_codes[0]
+            return lambda frame: body([value_code(frame), frame])
+
+        def let(frame):
+            values = [value(frame) for value in value_codes]
+            values.append(frame)
+            return body(values)
+
+        return let
+
+    def compile_InlineNode(self, node, tail=False):
+        name = node.name
+        function = node.function
+        variables = self.global_env.variables
+        if tail:
+            body = self.compile_tail(node.body)
+            call = self.compile_tail(node.call)
+        else:
+            body = self.compile(node.body)
+            call = self.compile(node.call)
+
+        budget = self.budget
+        if budget is None:
+            def inline(frame):
+                if variables.get(name) is function:
+                    return body(frame)
+                return call(frame)
+
+            return inline
+
+        def budgeted_inline(frame):
+            if variables.get(name) is function:
+                budget.ticks -= 1  # The inlined call costs the fuel of the call it replaces
+                if budget.ticks < 0:
+                    budget.settle()
+                return body(frame)
+            return call(frame)
+
+        return budgeted_inline
@@ -0,0 +1,37 @@
+from itertools import count
+
+VERSIONS = count()  # Source of version stamps, unique across all environments
+
+
+# Class representing an environment (variable/function scope)
+class Environment:
+    def __init__(self, parent=None):
+        self.variables = {}  # Dictionary to store variable/function names and their values
+        self.parent = parent  # Parent environment for nested scopes
+        self.version = next(VERSIONS)  # Stamp of the current bindings, replaced when a name is rebound
+
+    def get(self, name):
+        """
+        Retrieve a variable's value from the current or parent environment.
+
+        :param name: The name of the variable to retrieve.
+        :return: The value of the variable.
+        :raises Exception: If the variable is not found.
+        """
+        if name in self.variables:
+            return self.variables[name]
+        elif self.parent:
+            return self.parent.get(name)
+        else:
+            raise Exception(f"Error: Variable '{name}' not found")
+
+    def set(self, name, value):
+        """
+        Set a variable's value in the current environment.
+
+        :param name: The name of the variable.
+        :param value: The value to assign to the variable.
+        """
+        if name in self.variables:
+            self.version = next(VERSIONS)  # Invalidates the call sites that cached the old value
+        self.variables[name] = value
@@ -0,0 +1,105 @@
+import sys
+
+from cache import NODE_CODES, NODE_FIELDS, NODE_TYPES
+from my_parser import *
+
+
+# Table of canonical AST nodes used to hash-cons programs. share() rebuilds a tree bottom-up
+# so that structurally identical subtrees become one object: a node is looked up by its type
+# and field values, in which child nodes are already canonical and so compare by identity.
+# Subtrees holding a FunctionCallNode are rebuilt but never shared, since each call node is
+# a call site with a cache of its own (see Interpreter.resolve_call) that must not be reached
+# through different scopes; the call-free subtrees below them are shared.
+class NodeTable:
+    def __init__(self):
+        self.nodes = {}  # Maps (type code, field keys...) to the canonical node
+
+    def share(self, node):
+        """
+        Rebuild an AST with its identical subtrees shared, through the nodes of this table.
+
+        :param node: The root AST node.
+        :return: The root of the shared tree.
+        """
+        done = {}  # Maps id() of each visited node to (rebuilt node, whether it holds a call site)
+        pending = [(node, False)]
+        while pending:  # Post-order without recursion, since operator chains can be very deep
+            current, expanded = pending.pop()
+            if id(current) in done:
+                continue
+            if not expanded:
+                pending.append((current, True))
+                pending.extend((child, False) for child in self.children(current) if id(child) not in done)
+                continue
+            done[id(current)] = self.rebuild(current, done)
+        return done[id(node)][0]
+
+    @staticmethod
+    def children(node):
+        """
+        Get the child nodes of an AST node.
+
+        :param node: The AST node.
+        :return: A list of AST nodes.
+        """
+        nodes = []
+        for field in NODE_FIELDS[NODE_CODES[type(node)]]:
+            value = getattr(node, field)
+            if isinstance(value, ASTNode):
+                nodes.append(value)
+            elif isinstance(value, list):
+                nodes.extend(item for item in value if isinstance(item, ASTNode))
+        return nodes
+
+    def rebuild(self, node, done):
+        """
+        Build the canonical version of a node whose children were already rebuilt.
+
+        :param node: The AST node.
+        :param done: The rebuilt children, as filled in by share().
+        :return: A pair (rebuilt node, whether the subtree holds a FunctionCallNode).
+        """
+        code = NODE_CODES[type(node)]
+        site = type(node) is FunctionCallNode
+        values = []
+        key = [code]
+        for field in NODE_FIELDS[code]:
+            value = getattr(node, field)
+            if isinstance(value, ASTNode):
+                value, child_site = done[id(value)]
+                site = site or child_site
+                key.append(value)
+            elif isinstance(value, list):
+                items = []
+                for item in value:
+                    if isinstance(item, ASTNode):
+                        item, child_site = done[id(item)]
+                        site = site or child_site
+                    elif type(item) is str:
+                        item = sys.intern(item)
+                    items.append(item)
+                value = items
+                key.append(tuple(items))
+            else:
+                if type(value) is str:
+                    value = sys.intern(value)
+                key.append((type(value), value))  # Keeps 1 and True apart
+            values.append(value)
+        if site:
+            return NODE_TYPES[code](*values), True
+        key = tuple(key)
+        shared = self.nodes.get(key)
+        if shared is None:
+            shared = self.nodes[key] = NODE_TYPES[code](*values)
+        return shared, False
+
+
+def share_program(statements):
+    """
+    Hash-cons the ASTs of a program, sharing identical subtrees across all its statements.
+
+    :param statements: A list of (line, AST node, error) tuples from Interpreter.parse_program.
+    :return: The list with every AST node replaced by its shared version.
+    """
+    table = NodeTable()
+    return [(line, None if ast is None else table.share(ast), error) for line, ast, error in statements]
@@ -1,43 +1,399 @@
+import gc
+import os
+
+from bytecode import VirtualMachine, disassemble
+from cache import MAX_PROGRAM_SIZE, ProgramCache
+from cek import Machine
+from compiler import (SHORT_CIRCUIT, Compiler, arithmetic_fallback, compare_fallback, logical_error, operand_error,
+                      type_name)
+from environment import Environment
+from hashcons import share_program
 from lexer import Lexer
+from limits import Budget, DepthLimitExceeded
+from memo import MemoCache, MemoizedFunction
+from modules import DEFINITION, IMPORT, LazyDefinition, import_cycle
 from my_parser import *
+from optimizer import Inliner, Optimizer
+from parallel import execute_parallel
+from pratt import PrattParser
+from resolver import Resolver
+from runner import (DEFAULT_BUFFER_SIZE, regular_file, run_lines, run_statements, source_lines, split_lines,
+                    write_transcript)
+from sequences import Builtin, Sequence, index_value, make_builtins
+from thunks import Thunk
+from transpiler import Transpiler
+from vectorize import vectorize_lambda
+
+__version__ = '1.5.1'
+
+# Evaluation modes supported by the Interpreter
+MODES = ('compiled', 'tree', 'cek', 'vm', 'python', 'lazy')
+# Parsers supported by the Interpreter: the recursive-descent Parser and the table-driven PrattParser
+PARSERS = ('recursive', 'pratt')
+
+
+# Function value created by a lambda or 'def' in the tree-walking evaluator ('tree' and 'lazy' modes)
+class TreeFunction:
+    __slots__ = ('name', 'params', 'body', 'env', 'interpreter')
+
+    def __init__(self, name, params, body, env, interpreter):
+        self.name = name  # Function name, or None for lambdas
+        self.params = params  # List of parameter names
+        self.body = body  # AST of the function body
+        self.env = env  # Environment captured at creation time
+        self.interpreter = interpreter  # The Interpreter evaluating the body
+
+    def __call__(self, *args):
+        if len(args) != len(self.params):
+            if self.name is None:
+                raise Exception(f"Error: Lambda expected {len(self.params)} arguments but got {len(args)}.")
+            raise Exception(
+                f"Error: Function '{self.name}' expected {len(self.params)} arguments but got {len(args)}.")
+        new_env = Environment(parent=self.env)
+        for param, arg in zip(self.params, args):
+            new_env.set(param, arg)
+        return self.interpreter.evaluate(self.body, new_env)
+
+    def __repr__(self):
+        return f'<function {self.name or "lambda"}>'
 
 
-# Class representing an environment (variable/function scope)
-class Environment:
-    def __init__(self, parent=None):
-        self.variables = {}  # Dictionary to store variable/function names and their values
-        self.parent = parent  # Parent environment for nested scopes
+# Interpreter class to evaluate the AST nodes
+class Interpreter:
+    def __init__(self, mode='compiled', tail_calls=True, memo=False, memo_size=1024, optimize=False,
+                 dump_optimized=False, disassemble=False, show_python=False, cache=False, cache_dir=None,
+                 parser='recursive', fuel=None, max_depth=None, max_allocations=None, share_nodes=False,
+                 prelude=None, importer=None):
+        """
+        Initialize the Interpreter.
+
+        :param mode: 'compiled' to run ASTs as pre-bound closures, 'tree' for the reference tree-walker,
+                     'cek' for the explicit-stack machine that supports deep non-tail recursion, 'vm' for
+                     the bytecode virtual machine, 'python' to translate programs into Python code, or 'lazy'
+                     for the tree-walker passing call arguments by need.
+        :param tail_calls: Whether compiled mode runs calls in tail position in constant stack space.
+        :param memo: Whether every function created with 'def' is memoized.
+        :param memo_size: The maximum number of results kept by the memoization cache.
+        :param optimize: Whether ASTs are rewritten by the Optimizer before they run.
+        :param dump_optimized: Whether the optimized AST of each statement is printed (implies optimize).
+        :param disassemble: Whether the bytecode of each statement is printed in 'vm' mode.
+        :param show_python: Whether the generated Python source of each statement is printed in 'python' mode.
+        :param cache: Whether execute_file stores and reuses parsed programs in an on-disk cache.
+        :param cache_dir: The cache directory, or None for a directory of the user's cache directory.
+        :param parser: 'recursive' for the recursive-descent Parser or 'pratt' for the PrattParser.
+        :param fuel: The maximum number of function calls per top-level evaluation, or None.
+        :param max_depth: The maximum number of nested calls, independent of Python's recursion limit, or None.
+        :param max_allocations: The maximum number of closures and environments created per top-level
+                                evaluation, or None.
+        :param share_nodes: Whether execute_file hash-conses programs, sharing their identical subtrees.
+        :param prelude: The path of a .lambda file of definitions loaded by load_prelude, or None.
+        :param importer: The Interpreter importing this one as a module, or whose global definitions this
+                         one starts from, whose budget, memoization cache and loaded modules it shares, or None.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {', '.join(MODES)}")
+        if parser not in PARSERS:
+            raise ValueError(f"Unknown parser '{parser}', expected one of {', '.join(PARSERS)}")
+        limited = fuel is not None or max_depth is not None or max_allocations is not None
+        if limited and mode == 'python':
+            raise ValueError("Evaluation limits are not supported in 'python' mode")
+        self.mode = mode  # Evaluation backend used by run()
+        self.call_by_need = mode == 'lazy'  # Whether the tree-walker passes call arguments as Thunks
+        # Arguments needed to build an equivalent Interpreter in another process
+        self.options = dict(mode=mode, tail_calls=tail_calls, memo=memo, memo_size=memo_size, optimize=optimize,
+                            dump_optimized=dump_optimized, disassemble=disassemble, show_python=show_python,
+                            parser=parser, fuel=fuel, max_depth=max_depth, max_allocations=max_allocations,
+                            share_nodes=share_nodes, cache=cache, cache_dir=cache_dir, prelude=prelude)
+        if importer is not None:
+            self.budget = importer.budget  # Module functions run inside the importer's evaluations
+        else:
+            self.budget = Budget(fuel, max_depth, max_allocations) if limited else None  # Limits of each evaluation
+        self.global_env = Environment()  # Global environment for storing variables and functions
+        self.global_env.variables.update(make_builtins(self.budget))
+        self.call_stack = []  # Call stack for managing function calls and recursion
+        self.call_site_hits = 0  # Calls whose global function was found in the call-site cache
+        self.call_site_misses = 0  # Calls whose function was looked up in the environment
+        self.optimizer = Optimizer() if optimize or dump_optimized else None  # Constant folding pass
+        # Inlines small global functions at their call sites when statements run, with the optimizer
+        self.inliner = Inliner(self.optimizer) if self.optimizer is not None else None
+        self.dump_optimized = dump_optimized  # Whether optimized ASTs are printed before running
+        self.memo_cache = importer.memo_cache if importer else MemoCache(memo_size)  # Results of memoized functions
+        self.memo_all = memo  # Whether every defined function is memoized
+        self.memo_names = set()  # Names of functions memoized individually
+        self.resolver = Resolver(self.global_env)  # Lexical-address resolver used by the compiling backends
+        self.compiler = Compiler(self.global_env, tail_calls, self.define, self.budget)  # Closure compiler used in 'compiled' mode
+        self.machine = Machine(self.global_env, self.define, self.budget)  # Explicit-stack evaluator used in 'cek' mode
+        self.vm = VirtualMachine(self.global_env, self.define, self.budget)  # Bytecode virtual machine used in 'vm' mode
+        self.disassemble = disassemble  # Whether bytecode is printed before running in 'vm' mode
+        # Python code generator used in 'python' mode; it replaces the global dictionary, so it is only created there
+        self.transpiler = Transpiler(self.global_env, self.define) if mode == 'python' else None
+        self.show_python = show_python  # Whether generated Python source is printed in 'python' mode
+        self.program_cache = ProgramCache(__version__, cache_dir) if cache else None  # Cache of parsed programs
+        self.parser = parser  # Name of the parser used for source code
+        self.share_nodes = share_nodes  # Whether execute_file shares identical subtrees of programs
+        self.directory = None  # Directory that relative import paths start from, or None for the working directory
+        self.modules = importer.modules if importer else {}  # Maps real paths to the Interpreters of loaded modules
+        self.importing = importer.importing if importer else []  # Paths of the modules being loaded, outermost first
+        # Real path of the directory every imported module must be in, or None for any path
+        self.import_root = importer.import_root if importer else None
+        self.exports = []  # Names of the functions defined by this Interpreter's module, if it is one
+        if prelude is not None:
+            self.load_prelude(prelude)
+
+    def cache_variant(self):
+        """
+        Describe how the statements stored in the program cache are built.
 
-    def get(self, name):
+        :return: The variant string of ProgramCache entries.
         """
-        Retrieve a variable's value from the current or parent environment.
+        variant = 'optimized' if self.optimizer is not None else 'parsed'
+        if self.parser != 'recursive':
+            variant = f'{self.parser}-{variant}'  # Parsers report errors differently
+        return variant
 
-        :param name: The name of the variable to retrieve.
-        :return: The value of the variable.
-        :raises Exception: If the variable is not found.
+    def load_prelude(self, filename):
         """
-        if name in self.variables:
-            return self.variables[name]
-        elif self.parent:
-            return self.parent.get(name)
-        else:
-            raise Exception(f"Error: Variable '{name}' not found")
+        Run a prelude of definitions in the global environment.
+
+        With the program cache enabled, the prelude is restored from a snapshot of its final
+        definitions when one was written for the same source and interpreter version, so that
+        nothing is lexed or parsed; otherwise it is run line by line and the snapshot is written.
+        Only definitions and imports bind globals, so the snapshot is the last definition of
+        each name and every import, in their order in the prelude. Imports load their modules
+        again when the snapshot is restored, so changes to the modules are not missed; their
+        paths are relative to the directory of the prelude.
+
+        :param filename: The path of the prelude.
+        :return: The number of definitions loaded.
+        :raises Exception: The error of the first prelude statement that fails.
+        """
+        with open(filename, 'rb') as file:
+            source = file.read()
+        # Every closure of the prelude lives as long as the interpreter, so collections while it
+        # loads only traverse a growing heap without freeing anything
+        collecting = gc.isenabled()
+        gc.disable()
+        directory = self.directory
+        self.directory = os.path.dirname(os.path.abspath(filename))  # Imports are relative to the prelude
+        try:
+            return self.restore_prelude(filename, source)
+        finally:
+            self.directory = directory
+            if collecting:
+                gc.enable()
+
+    def restore_prelude(self, filename, source):
+        """
+        Run a prelude from its snapshot, or from its source while writing the snapshot.
+
+        :param filename: The path of the prelude.
+        :param source: The source code of the prelude, as bytes.
+        :return: The number of definitions loaded.
+        """
+        cache = self.program_cache
+        if cache is not None:
+            variant = f'{self.cache_variant()}-snapshot'
+            key = cache.key(source, variant)
+            path = cache.path(filename, variant)
+            snapshot = cache.read(path, key)
+            if snapshot is not None:
+                cache.hits += 1
+                for _, ast, _ in snapshot:
+                    self.run(ast, optimized=True)
+                return sum(isinstance(ast, FunctionDefNode) for _, ast, _ in snapshot)
+        definitions = {}  # Maps each function name, or the position of each import, to its statement
+        for position, (line, ast, error) in enumerate(self.parse_program(source.decode())):
+            if error is not None:
+                raise error
+            if ast is not None:
+                self.run(ast, optimized=True)
+                if isinstance(ast, FunctionDefNode):
+                    definitions.pop(ast.name, None)  # Keeps the snapshot in the order of the last definitions
+                    definitions[ast.name] = (line, ast, None)
+                elif isinstance(ast, ImportNode):
+                    definitions[position] = (line, ast, None)
+        if cache is not None:
+            cache.misses += 1
+            cache.write(path, key, list(definitions.values()))
+        return sum(isinstance(ast, FunctionDefNode) for _, ast, _ in definitions.values())
+
+    def import_module(self, path):
+        """
+        Run an import statement: load a module, unless it was already imported, and bind the
+        functions it defines in the global environment.
 
-    def set(self, name, value):
+        :param path: The path of the module, relative to the directory of the importing file.
+        :return: A message indicating the module was imported.
+        :raises Exception: If the module imports itself, directly or through other modules, or is
+                           outside the import root.
+        """
+        path = os.path.realpath(os.path.join(self.directory or os.getcwd(), path))
+        root = self.import_root
+        if root is not None and os.path.commonpath([root, path]) != root:
+            raise Exception(f"Error: Cannot import '{path}': modules must be in {root}")
+        module = self.modules.get(path)
+        if module is None:
+            if path in self.importing:
+                raise import_cycle(self.importing, path)
+            self.importing.append(path)
+            try:
+                module = self.load_module(path)
+            finally:
+                self.importing.pop()
+            self.modules[path] = module
+        variables = self.global_env.variables
+        for name in module.exports:
+            function = module.global_env.variables[name]
+            if name in variables:
+                self.memo_cache.clear()  # As in define()
+            self.global_env.set(name, function)
+            if isinstance(function, LazyDefinition):
+                function.environments.append(self.global_env)
+        return "Module imported!"
+
+    def load_module(self, path):
         """
-        Set a variable's value in the current environment.
+        Load a module into a new Interpreter, with a global environment of its own.
+
+        The module's imports run at once, but its definitions are not parsed: the last
+        definition of each name is bound to a LazyDefinition, which parses and compiles it
+        on its first call, so a program only pays for the functions it uses. A module's own
+        definitions take precedence over the names it imports. Its other statements are not
+        run, since only definitions and imports bind names.
 
-        :param name: The name of the variable.
-        :param value: The value to assign to the variable.
+        :param path: The real path of the module.
+        :return: The module's Interpreter.
         """
-        self.variables[name] = value
+        options = dict(self.options, optimize=self.optimizer is not None, dump_optimized=False,
+                       disassemble=False, show_python=False, cache=False, share_nodes=False, prelude=None)
+        module = Interpreter(**options, importer=self)
+        module.directory = os.path.dirname(path)
+        definitions = {}  # Maps each function name to the line of its last definition
+        for line in source_lines(path):
+            stripped = line.lstrip()
+            match = DEFINITION.match(stripped)
+            if match is not None:
+                definitions[match.group(1)] = line
+            elif IMPORT.match(stripped):
+                _, ast, error = module.parse_statement(line)
+                if error is not None:
+                    raise error
+                module.import_module(ast.path)
+        for name, line in definitions.items():
+            definition = LazyDefinition(name, line, module)
+            module.global_env.set(name, definition)
+            definition.environments.append(module.global_env)
+        module.exports = list(definitions)
+        return module
+
+    def define(self, name, function):
+        """
+        Bind a function created by 'def' in the global environment, memoizing it if requested.
 
+        :param name: The name of the function.
+        :param function: The function value.
+        """
+        if name in self.global_env.variables and not isinstance(self.global_env.variables[name], LazyDefinition):
+            # Functions are pure, but a cached result may depend on the old definition of
+            # any global it called, so a redefinition drops all cached results.
+            self.memo_cache.clear()
+        if self.memo_all or name in self.memo_names:
+            function = MemoizedFunction(function, self.memo_cache)
+        self.global_env.set(name, function)
+
+    def memoize(self, name):
+        """
+        Memoize a single function by name, including later redefinitions of it.
 
-# Interpreter class to evaluate the AST nodes
-class Interpreter:
-    def __init__(self):
-        self.global_env = Environment()  # Global environment for storing variables and functions
-        self.call_stack = []  # Call stack for managing function calls and recursion
+        :param name: The name of the function.
+        """
+        self.memo_names.add(name)
+        function = self.global_env.variables.get(name)
+        if callable(function) and not isinstance(function, MemoizedFunction):
+            self.global_env.set(name, MemoizedFunction(function, self.memo_cache))
+
+    def vectorize(self, source):
+        """
+        Compile a lambda into a function applied to whole NumPy arrays, one row per element.
+
+        Arithmetic, comparisons, logical operators and if-else expressions become array
+        operations; rows that would raise or overflow, and lambdas using other constructs,
+        are evaluated by this interpreter, so every result matches a call of the lambda.
+
+        :param source: The source code of a lambda expression, e.g. "lambda x, y: x * y > 10".
+        :return: A VectorizedFunction taking one array per parameter.
+        :raises ImportError: If NumPy is not installed.
+        """
+        node = self.parse(source)
+        if not isinstance(node, LambdaNode):
+            raise Exception("Error: vectorize expects a lambda expression")
+        return vectorize_lambda(node, self.run(node))
+
+    def run(self, node, optimized=False):
+        """
+        Run a top-level AST node with the selected evaluation backend.
+
+        :param node: The AST node to run.
+        :param optimized: Whether the node was already rewritten by the optimizer.
+        :return: The result of the evaluation.
+        :raises LimitExceeded: If the evaluation exceeds the fuel, depth or allocation limit.
+        """
+        if type(node) is ImportNode:
+            return self.import_module(node.path)
+        budget = self.budget
+        if budget is None:
+            return self.run_backend(node, optimized)
+        budget.reset()
+        if budget.max_depth is None:
+            return self.run_backend(node, optimized)
+        try:
+            return self.run_backend(node, optimized)
+        except RecursionError:
+            # The tree-walker and compiled code nest Python calls, so the Python stack may run out first
+            raise DepthLimitExceeded(f"Error: Maximum call depth of {budget.max_depth} exceeded "
+                                     f"(the Python stack ran out first)") from None
+
+    def run_backend(self, node, optimized):
+        """
+        Run a top-level AST node with the selected evaluation backend, without resetting the budget.
+
+        :param node: The AST node to run.
+        :param optimized: Whether the node was already rewritten by the optimizer.
+        :return: The result of the evaluation.
+        """
+        if self.optimizer is not None:
+            if not optimized:
+                node = self.optimizer.optimize(node)
+            node = self.inliner.inline(node, self.global_env.variables)
+            if self.dump_optimized:
+                print(node)
+            if type(node) is FunctionDefNode:
+                result = self.run_node(node)
+                function = self.global_env.variables[node.name]
+                if type(function) is not MemoizedFunction:  # Calls of memoized functions go through the cache
+                    self.inliner.record(node, function)
+                return result
+        return self.run_node(node)
+
+    def run_node(self, node):
+        """
+        Run a top-level AST node, after the optimizer, with the selected evaluation backend.
+
+        :param node: The AST node to run.
+        :return: The result of the evaluation.
+        """
+        if self.mode == 'tree' or self.mode == 'lazy':
+            return self.evaluate(node)
+        if self.mode == 'cek':
+            return self.machine.run(self.resolver.resolve(node))
+        if self.mode == 'vm':
+            code = self.vm.compiler.compile(self.resolver.resolve(node))
+            if self.disassemble:
+                print(disassemble(code))
+            return self.vm.execute(code, None)
+        if self.mode == 'python':
+            return self.transpiler.run(self.resolver.resolve(node), self.show_python)
+        return self.compiler.run(self.resolver.resolve(node))
 
     def evaluate(self, node, env=None):
         """
@@ -85,7 +441,49 @@ class Interpreter:
         :param env: The environment to use for variable lookups.
         :return: The value of the identifier.
         """
-        return env.get(node.name)
+        value = env.get(node.name)
+        if type(value) is Thunk:
+            return self.force(value)
+        return value
+
+    def delay(self, node, env):
+        """
+        Build the argument passed for an expression by a call in 'lazy' mode.
+
+        Literals are passed as values, and identifiers as the value or Thunk they are bound
+        to, so that passing a parameter on does not chain Thunks; any other expression
+        becomes a Thunk, which counts as an allocation toward the budget.
+
+        :param node: The AST node of the argument.
+        :param env: The environment of the call.
+        :return: The value or Thunk.
+        """
+        node_type = type(node)
+        if node_type is NumberNode or node_type is BooleanNode:
+            return node.value
+        if node_type is IdentifierNode:
+            scope = env
+            while scope is not None and node.name not in scope.variables:
+                scope = scope.parent
+            if scope is not None:
+                return scope.variables[node.name]
+            # An undefined name only raises if the argument is used
+        budget = self.budget
+        if budget is not None:
+            budget.allocate()
+        return Thunk(node, env)
+
+    def force(self, thunk):
+        """
+        Get the value of a Thunk, evaluating its expression on first use.
+
+        :param thunk: The Thunk.
+        :return: The value of the argument.
+        """
+        if thunk.node is not None:
+            thunk.value = self.evaluate(thunk.node, thunk.env)
+            thunk.node = thunk.env = None  # The environment of the call is no longer needed
+        return thunk.value
 
     def eval_BinaryOpNode(self, node, env):
         """
@@ -96,12 +494,21 @@ class Interpreter:
         :return: The result of the binary operation.
         """
         left = self.evaluate(node.left, env)
+        if node.op in ('&&', '||'):
+            # The right operand only runs when the left one does not decide the result
+            if not isinstance(left, bool):
+                raise logical_error(node.op, left)
+            if left is SHORT_CIRCUIT[node.op]:
+                return left
+            right = self.evaluate(node.right, env)
+            if not isinstance(right, bool):
+                raise operand_error(node.op, left, right)
+            return right
         right = self.evaluate(node.right, env)
 
         if node.op in ('+', '-', '*', '/', '%'):
             if not isinstance(left, int) or not isinstance(right, int):
-                raise TypeError(
-                    f"Unsupported operand type(s) for {node.op}: '{type(left).__name__}' and '{type(right).__name__}'")
+                return arithmetic_fallback(node.op, left, right)
             if node.op == '+':
                 return left + right
             elif node.op == '-':
@@ -115,22 +522,15 @@ class Interpreter:
             elif node.op == '%':
                 return left % right
 
-        elif node.op in ('&&', '||'):
-            if not isinstance(left, bool) or not isinstance(right, bool):
-                raise TypeError(
-                    f"Unsupported operand type(s) for {node.op}: '{type(left).__name__}' and '{type(right).__name__}'")
-            if node.op == '&&':
-                return left and right
-            elif node.op == '||':
-                return left or right
-
         elif node.op in ('==', '!=', '<', '>', '<=', '>='):
             if type(left) != type(right):
-                raise TypeError(f"Cannot compare different types: '{type(left).__name__}' and '{type(right).__name__}'")
+                return compare_fallback(node.op, left, right)
             if node.op == '==':
                 return left == right
             elif node.op == '!=':
                 return left != right
+            elif not isinstance(left, int):
+                return compare_fallback(node.op, left, right)  # Only numbers and booleans are ordered
             elif node.op == '<':
                 return left < right
             elif node.op == '>':
@@ -154,7 +554,7 @@ class Interpreter:
         operand = self.evaluate(node.operand, env)
         if node.op == '!':
             if not isinstance(operand, bool):
-                raise TypeError(f"Unsupported operand type for {node.op}: '{type(operand).__name__}'")
+                raise TypeError(f"Unsupported operand type for {node.op}: '{type_name(operand)}'")
             return not operand
         else:
             raise Exception(f"Error: Unsupported unary operator: '{node.op}'")
@@ -167,16 +567,10 @@ class Interpreter:
         :param env: The environment to use for variable lookups.
         :return: The lambda function.
         """
-
-        def lambda_func(*args):
-            if len(args) != len(node.params):
-                raise Exception(f"Error: Lambda expected {len(node.params)} arguments but got {len(args)}.")
-            new_env = Environment(parent=env)
-            for param, arg in zip(node.params, args):
-                new_env.set(param, arg)
-            return self.evaluate(node.body, new_env)
-
-        return lambda_func
+        budget = self.budget
+        if budget is not None:
+            budget.allocate()
+        return TreeFunction(None, node.params, node.body, env, self)
 
     def eval_FunctionCallNode(self, node, env):
         """
@@ -186,11 +580,64 @@ class Interpreter:
         :param env: The environment to use for variable lookups.
         :return: The result of the function call.
         """
+        if node.version == self.global_env.version:
+            func = node.target
+            self.call_site_hits += 1
+        else:
+            func = self.resolve_call(node, env)
+        if self.call_by_need:
+            args = [self.delay(arg, env) for arg in node.args]
+            if type(func) is Builtin or type(func) is MemoizedFunction:
+                # Functions implemented in Python, and memo keys, take values
+                args = [self.force(arg) if type(arg) is Thunk else arg for arg in args]
+        else:
+            args = [self.evaluate(arg, env) for arg in node.args]
+        budget = self.budget
+        if budget is None:
+            return func(*args)
+        budget.call()
+        try:
+            return func(*args)
+        finally:
+            budget.leave()
+
+    def resolve_call(self, node, env):
+        """
+        Evaluate the function of a FunctionCallNode whose call-site cache missed. A global
+        function called by name is cached in the node until the global environment changes;
+        since the language's scopes are lexical, a name that is not bound by the enclosing
+        lambdas and functions at one call is not bound by them at any later call either.
+
+        :param node: The FunctionCallNode.
+        :param env: The environment to use for variable lookups.
+        :return: The function value.
+        :raises Exception: If the value is not callable.
+        """
+        self.call_site_misses += 1
         func = self.evaluate(node.func, env)
         if not callable(func):
             raise Exception(f"Error: Attempt to call a non-function value '{func}'.")
-        args = [self.evaluate(arg, env) for arg in node.args]
-        return func(*args)
+        if isinstance(node.func, IdentifierNode):
+            scope = env
+            while scope is not self.global_env and node.func.name not in scope.variables:
+                scope = scope.parent
+            if scope is self.global_env:
+                node.target = func
+                node.version = scope.version
+        return func
+
+    def call_site_stats(self):
+        """
+        Get the counters of the call-site caches used in 'tree' and 'lazy' mode.
+
+        :return: A dictionary with the hits, misses and hit rate of the caches.
+        """
+        calls = self.call_site_hits + self.call_site_misses
+        return {
+            'hits': self.call_site_hits,
+            'misses': self.call_site_misses,
+            'hit rate': f'{self.call_site_hits / calls:.1%}' if calls else 'n/a',
+        }
 
     def eval_FunctionDefNode(self, node, env):
         """
@@ -200,18 +647,66 @@ class Interpreter:
         :param env: The environment to use for variable lookups.
         :return: A message indicating the function was created.
         """
+        budget = self.budget
+        if budget is not None:
+            budget.allocate()
+        function = TreeFunction(node.name, node.params, node.body, env, self)
+        if env is self.global_env:
+            self.define(node.name, function)
+        else:
+            env.set(node.name, function)
+        return "Function created!"
 
-        def function(*args):
-            if len(args) != len(node.params):
-                raise Exception(
-                    f"Error: Function '{node.name}' expected {len(node.params)} arguments but got {len(args)}.")
-            new_env = Environment(parent=env)
-            for param, arg in zip(node.params, args):
-                new_env.set(param, arg)
-            return self.evaluate(node.body, new_env)
+    def eval_LetNode(self, node, env):
+        """
+        Evaluate a LetNode: bind its values in a new environment and evaluate its body there.
 
-        env.set(node.name, function)
-        return "Function created!"
+        :param node: The LetNode to evaluate.
+        :param env: The environment to use for variable lookups.
+        :return: The value of the body.
+        """
+        if self.call_by_need:
+            values = [self.delay(value, env) for value in node.values]
+        else:
+            values = [self.evaluate(value, env) for value in node.values]
+        new_env = Environment(parent=env)
+        for name, value in zip(node.names, values):
+            new_env.set(name, value)
+        return self.evaluate(node.body, new_env)
+
+    def eval_InlineNode(self, node, env):
+        """
+        Evaluate an InlineNode: the inlined body if its function is still bound to its name, else the call.
+
+        :param node: The InlineNode to evaluate.
+        :param env: The environment to use for variable lookups.
+        :return: The result of the call.
+        """
+        if self.global_env.variables.get(node.name) is node.function:
+            if self.budget is not None:
+                self.budget.tail_call()  # The inlined call costs the fuel of the call it replaces
+            return self.evaluate(node.body, env)
+        return self.evaluate(node.call, env)
+
+    def eval_ListNode(self, node, env):
+        """
+        Evaluate a ListNode and return a sequence of its element values.
+
+        :param node: The ListNode to evaluate.
+        :param env: The environment to use for variable lookups.
+        :return: The Sequence.
+        """
+        return Sequence.from_values([self.evaluate(element, env) for element in node.elements])
+
+    def eval_IndexNode(self, node, env):
+        """
+        Evaluate an IndexNode and return the indexed item.
+
+        :param node: The IndexNode to evaluate.
+        :param env: The environment to use for variable lookups.
+        :return: The item of the sequence.
+        """
+        return index_value(self.evaluate(node.sequence, env), self.evaluate(node.index, env))
 
     def eval_IfElseNode(self, node, env):
         """
@@ -237,28 +732,121 @@ class Interpreter:
         try:
             if line.strip().startswith("#") or not line.strip():
                 return  # Ignore comment and empty lines
-            lexer = Lexer(line)
-            tokens = lexer.tokenize()
-            parser = Parser(tokens)
-            ast = parser.parse()
-            result = self.evaluate(ast)
+            ast = self.parse(line)
+            result = self.run(ast)
             print(result)
             return result
         except Exception as e:
             print(e)
 
-    def execute_file(self, filename):
+    def parse(self, line):
+        """
+        Lex and parse a single line of code with the selected parser.
+
+        :param line: The line of code.
+        :return: The root node of the AST.
+        """
+        lexer = Lexer(line)
+        if self.parser == 'pratt':
+            return PrattParser(lexer.tokenize_compact()).parse()  # Token positions give line and column in errors
+        return Parser(lexer.tokenize()).parse()
+
+    def parse_program(self, source_code):
+        """
+        Parse (and optimize, if enabled) every line of a program.
+
+        :param source_code: The source code of the program.
+        :return: A list of (line, AST node, error) tuples. Comment and empty lines have neither
+                 a node nor an error; lines that fail to parse keep the exception to report.
         """
-        Execute a file containing code.
+        return [self.parse_statement(line) for line in split_lines(source_code)]
 
-        :param filename: The name of the file to execute.
+    def parse_statement(self, line):
         """
-        with open(filename, 'r') as file:
-            source_code = file.read()
-        for line in source_code.splitlines():
-            if line.strip() and not line.strip().startswith("#"):
-                print(f"Executing: {line}")
-            self.execute_line(line.strip())
+        Parse (and optimize, if enabled) one line of a program.
+
+        :param line: The line, without its line break.
+        :return: A (line, AST node, error) tuple, as in the list returned by parse_program.
+        """
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            return line, None, None
+        try:
+            ast = self.parse(stripped)
+            if self.optimizer is not None:
+                ast = self.optimizer.optimize(ast)
+            return line, ast, None
+        except Exception as e:
+            return line, None, e
+
+    def execute_statement(self, ast, error=None):
+        """
+        Execute a statement parsed by parse_program.
+
+        :param ast: The AST node of the statement.
+        :param error: The exception raised while parsing the statement, if any.
+        :return: The result of the execution or None.
+        """
+        try:
+            if error is not None:
+                raise error
+            result = self.run(ast, optimized=True)
+            print(result)
+            return result
+        except Exception as e:
+            print(e)
+
+    def execute_file(self, filename, jobs=1, quiet=False):
+        """
+        Execute a file containing code, printing the "Executing: ..." transcript.
+
+        Without the program cache, node sharing and parallel jobs, which need the whole
+        program, the file is streamed through runner.run_lines one line at a time. Standard
+        input, pipes, other files that are not regular files and files larger than
+        cache.MAX_PROGRAM_SIZE are always streamed past the cache, so memory use does not grow
+        with the size of the program; the output of statements read from a stream is flushed as
+        soon as they run.
+
+        :param filename: The name of the file to execute, or '-' for standard input.
+        :param jobs: The number of processes running expression statements; with more than one,
+                     independent statements run in parallel and their output is printed in order.
+        :param quiet: Whether the transcript is not printed (not supported with more than one job).
+        :return: A pair (number of statements, number of statements that failed), or None with
+                 more than one job.
+        """
+        # Statements that print while they run are announced first, with the transcript unbuffered
+        if filename != '-':
+            self.directory = os.path.dirname(os.path.abspath(filename))  # Imports are relative to the program
+        announce = None
+        if (self.dump_optimized or self.disassemble or self.show_python) and not quiet:
+            announce = self.announce
+        regular = regular_file(filename)  # Lines of standard input and pipes may arrive over time
+        options = dict(quiet=quiet, buffer_size=DEFAULT_BUFFER_SIZE if regular and not announce else 0,
+                       echo=announce is None)
+        program_cache = self.program_cache if regular and filename != '-' else None
+        if program_cache is not None and os.path.getsize(filename) > MAX_PROGRAM_SIZE:
+            program_cache = None  # Caching would read and parse the whole program at once
+        if program_cache is None and not self.share_nodes and jobs <= 1:
+            return write_transcript(run_lines(self, filename, announce), **options)
+        if program_cache is not None:
+            statements = program_cache.load(filename, self.parse_program, self.cache_variant())
+        else:
+            statements = [self.parse_statement(line) for line in source_lines(filename)]
+        if self.share_nodes:
+            statements = share_program(statements)
+        if jobs > 1:
+            execute_parallel(self, statements, jobs)
+            return None
+        return write_transcript(run_statements(self, statements, announce), **options)
+
+    @staticmethod
+    def announce(line):
+        """
+        Print the "Executing: ..." line of a statement before it runs.
+
+        :param line: The line of the statement.
+        """
+        print(f"Executing: {line}")
 
     def repl(self):
         """
@@ -273,11 +861,84 @@ class Interpreter:
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
 
-    interpreter = Interpreter()
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-        interpreter.execute_file(filename)
-    else:
-        interpreter.repl()
+    arg_parser = argparse.ArgumentParser(description='Run a .lambda program or start the interactive REPL.')
+    arg_parser.add_argument('filename', nargs='?', help="the .lambda file to execute ('-' for standard input)")
+    arg_parser.add_argument('--mode', choices=MODES, default='compiled',
+                            help="evaluation backend ('tree' is the reference tree-walker, "
+                                 "'cek' keeps the call stack on the heap for deep recursion, "
+                                 "'vm' runs compiled bytecode, 'python' translates the program to Python, "
+                                 "'lazy' is the tree-walker evaluating call arguments only when used)")
+    arg_parser.add_argument('--disassemble', action='store_true',
+                            help="print the bytecode of each statement (with --mode vm)")
+    arg_parser.add_argument('--show-python', action='store_true',
+                            help="print the generated Python source of each statement (with --mode python)")
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='fold constants, beta-reduce immediately applied lambdas and inline small functions')
+    arg_parser.add_argument('--dump-optimized', action='store_true',
+                            help='print the optimized AST of each statement (implies --optimize)')
+    arg_parser.add_argument('--parser', choices=PARSERS, default='recursive',
+                            help="parser for source code ('pratt' is the table-driven precedence parser)")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='run independent top-level expressions in this many processes')
+    arg_parser.add_argument('-q', '--quiet', action='store_true',
+                            help='print only the number of statements and failures, to stderr')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='do not store or reuse parsed programs in the cache directory')
+    arg_parser.add_argument('--cache-dir', help='directory for cached parsed programs')
+    arg_parser.add_argument('--prelude',
+                            help='.lambda file of definitions loaded first, from a snapshot in the cache if valid')
+    arg_parser.add_argument('--share-nodes', action='store_true',
+                            help='share identical subtrees of the program to reduce its memory')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help="profile the program (in 'tree' or 'lazy' mode) and print per-function timings to stderr")
+    arg_parser.add_argument('--profile-output',
+                            help='file for the collapsed stacks of the profile, for flamegraph tools '
+                                 '(default: the program name with a .folded suffix)')
+    arg_parser.add_argument('--fuel', type=int, help='maximum number of function calls per top-level expression')
+    arg_parser.add_argument('--max-depth', type=int,
+                            help="maximum number of nested calls (not supported with --mode python)")
+    arg_parser.add_argument('--max-allocations', type=int,
+                            help='maximum number of closures and environments created per top-level expression')
+    arg_parser.add_argument('--call-site-stats', action='store_true',
+                            help="print the hit rate of the call-site caches to stderr (with --mode tree or lazy)")
+    arg_parser.add_argument('--memo', action='store_true', help='memoize the results of every defined function')
+    arg_parser.add_argument('--memo-size', type=int, default=1024, help='maximum number of memoized results')
+    args = arg_parser.parse_args()
+    if args.quiet and args.jobs > 1:
+        arg_parser.error('--quiet cannot be combined with --jobs')
+
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)  # Allow printing the large integers deep recursion can produce
+
+    interpreter_class = Interpreter
+    if args.profile:
+        from profiler import ProfilingInterpreter  # profiler.py imports this module
+        interpreter_class = ProfilingInterpreter
+    interpreter = interpreter_class(mode=args.mode, memo=args.memo, memo_size=args.memo_size, optimize=args.optimize,
+                              dump_optimized=args.dump_optimized, disassemble=args.disassemble,
+                              show_python=args.show_python, cache=not args.no_cache, cache_dir=args.cache_dir,
+                              parser=args.parser, fuel=args.fuel, max_depth=args.max_depth,
+                              max_allocations=args.max_allocations, share_nodes=args.share_nodes,
+                              prelude=args.prelude)
+    try:
+        if args.filename:
+            counts = interpreter.execute_file(args.filename, args.jobs, args.quiet)
+            if args.quiet and counts is not None:
+                print(f'{counts[0]} statements, {counts[1]} failed', file=sys.stderr)
+        else:
+            interpreter.repl()
+    finally:
+        if args.profile:
+            print(interpreter.profiler.report(), file=sys.stderr)
+            output = args.profile_output or f'{os.path.basename(args.filename or "repl")}.folded'
+            interpreter.profiler.write_collapsed(output)
+            print(f'Collapsed stacks written to {output}', file=sys.stderr)
+        if args.call_site_stats:
+            stats = interpreter.call_site_stats()
+            print('call sites: ' + ', '.join(f'{key}: {value}' for key, value in stats.items()), file=sys.stderr)
+        if args.memo:
+            stats = interpreter.memo_cache.stats()
+            print(', '.join(f'{key}: {value}' for key, value in stats.items()), file=sys.stderr)
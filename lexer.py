@@ -1,4 +1,43 @@
 import re
+from array import array
+from bisect import bisect_right
+
+# Define the specifications for each token type using regular expressions
+TOKEN_SPECIFICATION = [
+    ('NUMBER', r'\d+'),  # Integer numbers
+    ('BOOLEAN', r'\b(True|False)\b'),  # Boolean values
+    ('KEYWORD', r'\b(lambda|if|else|return|def)\b'),  # Keywords ('import' is an ID, see Parser.statement)
+    ('ID', r'[A-Za-z_]\w*'),  # Identifiers (names of variables or functions)
+    ('OP', r'[+\-*/%]'),  # Arithmetic operators
+    ('LPAREN', r'\('),  # Left parenthesis
+    ('RPAREN', r'\)'),  # Right parenthesis
+    ('LBRACKET', r'\['),  # Left bracket (sequence literals and indexing)
+    ('RBRACKET', r'\]'),  # Right bracket
+    ('COMPARE', r'==|!=|<=|>=|<|>'),  # Comparison operators
+    ('LOGICAL', r'&&|\|\|'),  # Logical operators
+    ('NOT', r'!'),  # Logical NOT operator
+    ('NEWLINE', r'\n'),  # Newline characters
+    ('SKIP', r'[ \t]+'),  # Spaces and tabs
+    ('COMMENT', r'#.*'),  # Comments
+    ('DELIM', r','),  # Comma delimiter
+    ('COLON', r':'),  # Colon delimiter
+    ('STRING', r'"[^"\n]*"'),  # String literals (module paths of import statements)
+    ('MISMATCH', r'.'),  # Any other character (for error handling)
+]
+
+# Single regular expression that combines all token specifications
+TOKEN_PATTERN = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_SPECIFICATION)
+TOKEN_REGEX = re.compile(TOKEN_PATTERN)
+# Same expression skipping leading spaces and tabs as part of each match, used by TokenBuffer
+# (trailing whitespace still matches SKIP)
+FAST_TOKEN_REGEX = re.compile(rf'[ \t]*(?:{TOKEN_PATTERN})')
+
+TOKEN_TYPES = tuple(name for name, _ in TOKEN_SPECIFICATION)  # Token type names, indexed by type code
+TOKEN_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}  # Maps token type names to type codes
+# Maps the index of the outermost group of each match to its type code (BOOLEAN and KEYWORD contain inner groups)
+GROUP_CODES = [None] * (TOKEN_REGEX.groups + 1)
+for name, index in TOKEN_REGEX.groupindex.items():
+    GROUP_CODES[index] = TOKEN_CODES[name]
 
 
 class Lexer:
@@ -18,29 +57,7 @@ class Lexer:
 
         :return: A list of tokens where each token is represented as a tuple (token_type, token_value).
         """
-        # Define the specifications for each token type using regular expressions
-        token_specification = [
-            ('NUMBER', r'\d+'),  # Integer numbers
-            ('BOOLEAN', r'\b(True|False)\b'),  # Boolean values
-            ('KEYWORD', r'\b(lambda|if|else|return|def)\b'),  # Keywords
-            ('ID', r'[A-Za-z_]\w*'),  # Identifiers (names of variables or functions)
-            ('OP', r'[+\-*/%]'),  # Arithmetic operators
-            ('LPAREN', r'\('),  # Left parenthesis
-            ('RPAREN', r'\)'),  # Right parenthesis
-            ('COMPARE', r'==|!=|<=|>=|<|>'),  # Comparison operators
-            ('LOGICAL', r'&&|\|\|'),  # Logical operators
-            ('NOT', r'!'),  # Logical NOT operator
-            ('NEWLINE', r'\n'),  # Newline characters
-            ('SKIP', r'[ \t]+'),  # Spaces and tabs
-            ('COMMENT', r'#.*'),  # Comments
-            ('DELIM', r','),  # Comma delimiter
-            ('COLON', r':'),  # Colon delimiter
-            ('MISMATCH', r'.'),  # Any other character (for error handling)
-        ]
-
-        # Create a single regular expression that combines all token specifications
-        tok_regex = '|'.join(f'(?P<{pair[0]}>{pair[1]})' for pair in token_specification)
-        get_token = re.compile(tok_regex).match  # Compile the combined regex for matching tokens
+        get_token = TOKEN_REGEX.match  # The combined regex, compiled once at import time
         line = self.source_code  # The source code to be tokenized
         pos = 0  # Current position in the source code
         mo = get_token(line)  # Match the first token
@@ -52,6 +69,8 @@ class Lexer:
                 value = int(mo.group(typ))  # Convert number token to an integer
             elif typ == 'BOOLEAN':
                 value = mo.group(typ) == 'True'  # Convert boolean token to a boolean value
+            elif typ == 'STRING':
+                value = mo.group(typ)[1:-1]  # Strip the quotes
             elif typ == 'SKIP' or typ == 'COMMENT':
                 # Skip spaces, tabs, and comments
                 pos = mo.end()  # Move the position to the end of the matched token
@@ -71,6 +90,95 @@ class Lexer:
             raise RuntimeError(f'Unexpected character {line[pos]} at position {pos}')
         return self.tokens  # Return the list of tokens
 
+    def tokenize_compact(self):
+        """
+        Tokenize the source code into a TokenBuffer.
+
+        :return: A TokenBuffer holding the tokens and their positions.
+        """
+        return TokenBuffer(self.source_code)
+
+
+# Compact token storage: parallel buffers of type codes, values and source offsets
+class TokenBuffer:
+    def __init__(self, source):
+        """
+        Initialize the TokenBuffer by tokenizing source code.
+
+        :param source: The code to tokenize.
+        :raises RuntimeError: If the code contains an unexpected character.
+        """
+        self.types = array('B')  # Type code of each token (index into TOKEN_TYPES)
+        self.values = []  # Value of each token
+        self.offsets = array('Q')  # Position of each token in the source
+        self.line_starts = None  # Positions where each line starts, computed on the first position() call
+        self.tokenize(source)
+
+    def tokenize(self, source):
+        """
+        Fill the buffers with the tokens of the source code.
+
+        :param source: The code to tokenize.
+        :raises RuntimeError: If the code contains an unexpected character.
+        """
+        group_codes = GROUP_CODES
+        add_type, add_value, add_offset = self.types.append, self.values.append, self.offsets.append
+        number, boolean, string, skip, comment, mismatch = (
+            TOKEN_CODES[name] for name in ('NUMBER', 'BOOLEAN', 'STRING', 'SKIP', 'COMMENT', 'MISMATCH'))
+        for mo in FAST_TOKEN_REGEX.finditer(source):
+            index = mo.lastindex
+            code = group_codes[index]
+            if code == skip or code == comment:
+                continue
+            value = mo.group(index)
+            if code == number:
+                value = int(value)
+            elif code == boolean:
+                value = value == 'True'
+            elif code == string:
+                value = value[1:-1]
+            elif code == mismatch:
+                line, column = self.locate(mo.start(index))
+                raise RuntimeError(f'Unexpected character {value} at line {line}, column {column}')
+            add_type(code)
+            add_value(value)
+            add_offset(mo.start(index))
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        """
+        Get a token in the (token_type, token_value) form returned by Lexer.tokenize, so a
+        TokenBuffer can be given to the Parser.
+
+        :param index: The index of the token.
+        :return: The token as a tuple (token_type, token_value).
+        """
+        return TOKEN_TYPES[self.types[index]], self.values[index]
+
+    def position(self, index):
+        """
+        Get the source position of a token.
+
+        :param index: The index of the token.
+        :return: A tuple (line, column), with lines starting at 1 and columns at 0.
+        """
+        return self.locate(self.offsets[index])
+
+    def locate(self, offset):
+        """
+        Convert a position in the source into a line and column, using the NEWLINE tokens.
+
+        :param offset: The position in the source.
+        :return: A tuple (line, column), with lines starting at 1 and columns at 0.
+        """
+        if self.line_starts is None:
+            newline = TOKEN_CODES['NEWLINE']
+            self.line_starts = [0] + [self.offsets[i] + 1 for i, code in enumerate(self.types) if code == newline]
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1]
+
 
 if __name__ == '__main__':
     lexer = Lexer("lambda x, y: (x + y) * 2 > 10 && x < y")  # Create a Lexer instance with some example code
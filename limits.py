@@ -0,0 +1,133 @@
+import sys
+
+UNLIMITED = sys.maxsize  # Counter value of a limit that is not set
+
+
+# Base class of the errors raised when an evaluation exceeds one of its Budget's limits
+class LimitExceeded(Exception):
+    pass
+
+
+# Raised when an evaluation has made more function calls than its fuel allows
+class FuelExhausted(LimitExceeded):
+    pass
+
+
+# Raised when an evaluation nests more calls than its maximum depth allows
+class DepthLimitExceeded(LimitExceeded):
+    pass
+
+
+# Raised when an evaluation creates more closures and call environments than allowed
+class AllocationLimitExceeded(LimitExceeded):
+    pass
+
+
+# Limits of a single evaluation and the counters checked against them.
+# Every call of a function consumes one unit of fuel; since the language has no loops, a
+# program can only run for long by making calls, so the fuel bounds its running time. The
+# depth is the number of calls in progress on the evaluator's stack (calls in tail position
+# do not nest in the backends that run them in constant space). Allocations are the closures
+# created by lambdas and definitions, plus one environment or frame per call and one per item
+# of a range.
+# Calls and closures only decrement 'ticks', which starts at the smaller of the fuel and
+# allocations left; when it runs out, settle() brings both counters up to date.
+class Budget:
+    __slots__ = ('fuel', 'max_depth', 'max_allocations', 'depth_limit', 'fuel_left', 'allocations_left', 'ticks',
+                 'period', 'closures', 'depth')
+
+    def __init__(self, fuel=None, max_depth=None, max_allocations=None):
+        """
+        Initialize the Budget.
+
+        :param fuel: The maximum number of function calls per evaluation, or None.
+        :param max_depth: The maximum number of nested calls, or None.
+        :param max_allocations: The maximum number of closures and environments created per evaluation, or None.
+        """
+        for name, limit in (('fuel', fuel), ('max_depth', max_depth), ('max_allocations', max_allocations)):
+            if limit is not None and limit < 0:
+                raise ValueError(f"{name} must not be negative")
+        self.fuel = fuel  # Maximum number of calls, or None
+        self.max_depth = max_depth  # Maximum number of nested calls, or None
+        self.max_allocations = max_allocations  # Maximum number of closures and environments, or None
+        self.depth_limit = UNLIMITED if max_depth is None else max_depth  # max_depth without the None case
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new evaluation with the whole budget available.
+        """
+        self.fuel_left = UNLIMITED if self.fuel is None else self.fuel  # Calls left at the last settle()
+        self.allocations_left = (UNLIMITED if self.max_allocations is None
+                                 else self.max_allocations)  # Allocations left at the last settle()
+        self.period = self.ticks = min(self.fuel_left, self.allocations_left)  # Calls and closures left until settle()
+        self.closures = 0  # Closures created since the last settle()
+        self.depth = 0  # Number of calls in progress
+
+    def settle(self):
+        """
+        Account for the calls and closures counted in 'ticks' since the last settlement.
+
+        :raises FuelExhausted: If the calls used more than the fuel.
+        :raises AllocationLimitExceeded: If the calls and closures used more than the allocation limit.
+        """
+        consumed = self.period - self.ticks
+        self.fuel_left -= consumed - self.closures
+        self.allocations_left -= consumed
+        self.closures = 0
+        self.period = self.ticks = min(self.fuel_left, self.allocations_left)
+        if self.fuel_left < 0:
+            raise FuelExhausted(f"Error: Evaluation ran out of fuel after {self.fuel} calls")
+        if self.allocations_left < 0:
+            raise AllocationLimitExceeded(
+                f"Error: Evaluation created more than {self.max_allocations} closures and environments")
+
+    def call(self):
+        """
+        Account for entering a call that nests on the evaluator's stack; leave() must follow
+        when it returns or raises.
+
+        :raises LimitExceeded: If the call exceeds the fuel, allocation or depth limit.
+        """
+        self.ticks -= 1
+        if self.ticks < 0:
+            self.settle()
+        if self.depth >= self.depth_limit:
+            raise self.depth_error()
+        self.depth += 1
+
+    def tail_call(self):
+        """
+        Account for a call that replaces the current one instead of nesting.
+
+        :raises LimitExceeded: If the call exceeds the fuel or allocation limit.
+        """
+        self.ticks -= 1
+        if self.ticks < 0:
+            self.settle()
+
+    def leave(self):
+        """
+        Account for the return of a call entered with call().
+        """
+        self.depth -= 1
+
+    def allocate(self, count=1):
+        """
+        Account for a closure, or for the items of a sequence built at once.
+
+        :param count: The number of allocations.
+        :raises AllocationLimitExceeded: If the allocations exceed the allocation limit.
+        """
+        self.ticks -= count
+        self.closures += count
+        if self.ticks < 0:
+            self.settle()
+
+    def depth_error(self):
+        """
+        Build the error raised when the maximum depth is exceeded.
+
+        :return: The DepthLimitExceeded exception.
+        """
+        return DepthLimitExceeded(f"Error: Maximum call depth of {self.max_depth} exceeded")
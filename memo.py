@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+
+# Bounded least-recently-used cache of function results shared by all memoized functions
+class MemoCache:
+    def __init__(self, maxsize=1024):
+        """
+        Initialize the MemoCache.
+
+        :param maxsize: The maximum number of results kept before the least recently used is evicted.
+        """
+        if maxsize < 1:
+            raise ValueError("Memo cache size must be at least 1")
+        self.maxsize = maxsize  # Maximum number of cached results
+        self.entries = OrderedDict()  # Maps (function, argument key) to the cached result, oldest first
+        self.hits = 0  # Number of calls answered from the cache
+        self.misses = 0  # Number of calls that had to be evaluated
+        self.evictions = 0  # Number of results dropped because the cache was full
+        self.invalidations = 0  # Number of results dropped because a definition changed
+
+    def clear(self):
+        """
+        Drop every cached result.
+        """
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        :return: A dictionary with the size, hits, misses, evictions and invalidations of the cache.
+        """
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+# Callable wrapper caching the results of a pure user function
+class MemoizedFunction:
+    __slots__ = ('function', 'cache')
+
+    def __init__(self, function, cache):
+        self.function = function  # The wrapped function value
+        self.cache = cache  # The MemoCache holding the results
+
+    def __call__(self, *args):
+        # Argument types are part of the key since True == 1 and False == 0 in Python,
+        # but the language treats them differently.
+        key = (self, args, tuple(map(type, args)))
+        cache = self.cache
+        entries = cache.entries
+        if key in entries:
+            cache.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        cache.misses += 1
+        result = self.function(*args)
+        entries[key] = result
+        if len(entries) > cache.maxsize:
+            entries.popitem(last=False)
+            cache.evictions += 1
+        return result
+
+    def __repr__(self):
+        return repr(self.function)
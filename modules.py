@@ -0,0 +1,63 @@
+import os
+import re
+
+DEFINITION = re.compile(r'def\s+([A-Za-z_]\w*)')  # Start of a 'def' statement, capturing the function name
+IMPORT = re.compile(r'import\s*"')  # Start of an import statement ('import' is a name elsewhere)
+
+
+# Function value standing for a definition of an imported module that was not parsed yet.
+# Its first call parses and compiles the definition in the module's Interpreter, then
+# rebinds the name to the compiled function in every global environment the stub is still
+# bound in, so that later calls skip the stub; call sites that already hold the stub are
+# forwarded to the compiled function.
+class LazyDefinition:
+    __slots__ = ('name', 'line', 'module', 'function', 'environments')
+
+    def __init__(self, name, line, module):
+        self.name = name  # Name of the function
+        self.line = line  # Source line of the 'def' statement
+        self.module = module  # Interpreter of the module defining the function
+        self.function = None  # The compiled function, once the stub was called
+        self.environments = []  # Global environments the stub was bound in
+
+    def __call__(self, *args):
+        function = self.function
+        if function is None:
+            function = self.materialize()
+        return function(*args)
+
+    def materialize(self):
+        """
+        Parse and compile the definition, and rebind its name to the compiled function.
+
+        :return: The compiled function.
+        :raises Exception: The error raised while parsing the definition.
+        """
+        module = self.module
+        _, ast, error = module.parse_statement(self.line)
+        if error is not None:
+            raise error
+        module.run_backend(ast, optimized=True)  # Inside the caller's evaluation, so its budget is kept
+        function = module.global_env.variables[self.name]
+        for env in self.environments:
+            if env.variables.get(self.name) is self:
+                env.set(self.name, function)
+        self.function = function
+        self.environments = None
+        return function
+
+    def __repr__(self):
+        return f'<function {self.name}>'
+
+
+def import_cycle(importing, path):
+    """
+    Build the error raised when a module imports itself, directly or through other modules.
+
+    :param importing: The paths of the modules being loaded, outermost first.
+    :param path: The path of the module imported again.
+    :return: The exception to raise.
+    """
+    cycle = importing[importing.index(path):] + [path]
+    directory = os.path.dirname(path)  # The modules are named relative to the first one
+    return Exception(f"Error: Import cycle: {' -> '.join(os.path.relpath(module, directory) for module in cycle)}")
@@ -1,14 +1,19 @@
 from lexer import Lexer
 
 
-# Base class for all Abstract Syntax Tree (AST) nodes
+# Base class for all Abstract Syntax Tree (AST) nodes. Nodes use __slots__, since large
+# programs hold hundreds of thousands of them.
 class ASTNode:
+    __slots__ = ()
+
     def __str__(self):
         return self.__repr__()
 
 
 # Node representing a number
 class NumberNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -18,6 +23,8 @@ class NumberNode(ASTNode):
 
 # Node representing a boolean value
 class BooleanNode(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -27,8 +34,13 @@ class BooleanNode(ASTNode):
 
 # Node representing an identifier (variable or function name)
 class IdentifierNode(ASTNode):
-    def __init__(self, name):
+    __slots__ = ('name', 'scope', 'depth', 'slot')
+
+    def __init__(self, name, scope=None, depth=None, slot=None):
         self.name = name
+        self.scope = scope  # 'local', 'global' or 'undefined', filled in by the resolver
+        self.depth = depth  # Number of enclosing frames to skip (local identifiers only)
+        self.slot = slot  # Index of the value within its frame (local identifiers only)
 
     def __repr__(self):
         return f'IdentifierNode({self.name})'
@@ -36,6 +48,8 @@ class IdentifierNode(ASTNode):
 
 # Node representing a binary operation (e.g., addition, subtraction)
 class BinaryOpNode(ASTNode):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -47,6 +61,8 @@ class BinaryOpNode(ASTNode):
 
 # Node representing a unary operation (e.g., logical NOT)
 class UnaryOpNode(ASTNode):
+    __slots__ = ('op', 'operand')
+
     def __init__(self, op, operand):
         self.op = op
         self.operand = operand
@@ -57,6 +73,8 @@ class UnaryOpNode(ASTNode):
 
 # Node representing a lambda expression
 class LambdaNode(ASTNode):
+    __slots__ = ('params', 'body')
+
     def __init__(self, params, body):
         self.params = params
         self.body = body
@@ -67,9 +85,13 @@ class LambdaNode(ASTNode):
 
 # Node representing a function call
 class FunctionCallNode(ASTNode):
+    __slots__ = ('func', 'args', 'target', 'version')
+
     def __init__(self, func, args):
         self.func = func
         self.args = args
+        self.target = None  # Global function the call resolved to, cached by the tree-walking evaluator
+        self.version = None  # Version of the global environment when 'target' was cached
 
     def __repr__(self):
         return f'FunctionCallNode({self.func}, {self.args})'
@@ -77,6 +99,8 @@ class FunctionCallNode(ASTNode):
 
 # Node representing a function definition
 class FunctionDefNode(ASTNode):
+    __slots__ = ('name', 'params', 'body')
+
     def __init__(self, name, params, body):
         self.name = name
         self.params = params
@@ -88,6 +112,8 @@ class FunctionDefNode(ASTNode):
 
 # Node representing an if-else expression
 class IfElseNode(ASTNode):
+    __slots__ = ('condition', 'if_body', 'else_body')
+
     def __init__(self, condition, if_body, else_body):
         self.condition = condition
         self.if_body = if_body
@@ -97,6 +123,72 @@ class IfElseNode(ASTNode):
         return f'IfElseNode(condition={self.condition}, if_body={self.if_body}, else_body={self.else_body})'
 
 
+# Node representing a sequence literal
+class ListNode(ASTNode):
+    __slots__ = ('elements',)
+
+    def __init__(self, elements):
+        self.elements = elements
+
+    def __repr__(self):
+        return f'ListNode({self.elements})'
+
+
+# Node representing the indexing of a sequence
+class IndexNode(ASTNode):
+    __slots__ = ('sequence', 'index')
+
+    def __init__(self, sequence, index):
+        self.sequence = sequence
+        self.index = index
+
+    def __repr__(self):
+        return f'IndexNode({self.sequence}, {self.index})'
+
+
+# Node representing the import of a module
+class ImportNode(ASTNode):
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path  # Path of the module's file, relative to the importing file
+
+    def __repr__(self):
+        return f'ImportNode({self.path!r})'
+
+
+# Node binding names to the values of expressions for the evaluation of its body. It has
+# no source syntax: the optimizer builds it from immediately applied lambdas, which it saves
+# the closure and the call of.
+class LetNode(ASTNode):
+    __slots__ = ('names', 'values', 'body')
+
+    def __init__(self, names, values, body):
+        self.names = names  # Names bound in the body, without duplicates
+        self.values = values  # Expressions evaluated, in order, in the enclosing scope
+        self.body = body
+
+    def __repr__(self):
+        return f'LetNode(names={self.names}, values={self.values}, body={self.body})'
+
+
+# Node running the body of a global function inlined at one of its call sites, guarded by the
+# function the name was bound to when it was inlined. Built by the Inliner while a statement
+# runs, so it is never stored in the program cache: if the name was rebound since, e.g. by a
+# redefinition in the REPL, the original call runs instead.
+class InlineNode(ASTNode):
+    __slots__ = ('name', 'function', 'body', 'call')
+
+    def __init__(self, name, function, body, call):
+        self.name = name  # Global name of the inlined function
+        self.function = function  # Function value the inlined body belongs to
+        self.body = body  # The function's body, bound to the arguments (usually a LetNode)
+        self.call = call  # The original FunctionCallNode
+
+    def __repr__(self):
+        return f'InlineNode({self.name}, body={self.body})'
+
+
 # Parser class to parse tokens into an AST
 class Parser:
     def __init__(self, tokens):
@@ -118,12 +210,17 @@ class Parser:
 
     def statement(self):
         """
-        Parse a statement, which could be a function definition or an expression.
+        Parse a statement, which could be a function definition, an import or an expression.
 
         :return: The corresponding AST node.
         """
         if self.current_token() and self.current_token()[0] == 'KEYWORD' and self.current_token()[1] == 'def':
             return self.function_definition()  # Parse a function definition
+        if self.current_token() and self.current_token()[0] == 'ID' and self.current_token()[1] == 'import' \
+                and len(self.tokens) > 1 and self.tokens[1][0] == 'STRING':
+            # 'import' is only a keyword at the start of a statement and before a path, so that
+            # programs using it as a name keep working
+            return self.import_statement()  # Parse an import
         return self.expression()  # Parse an expression
 
     def function_definition(self):
@@ -152,6 +249,17 @@ class Parser:
         body = self.expression()  # Parse the function body
         return FunctionDefNode(name=name, params=params, body=body)
 
+    def import_statement(self):
+        """
+        Parse an import statement.
+
+        :return: An ImportNode representing the import.
+        """
+        self.eat('ID')  # Consume the 'import' identifier
+        path = self.current_token()[1] if self.current_token() else None  # Get the module path
+        self.eat('STRING')  # Consume the string token
+        return ImportNode(path=path)
+
     def expression(self):
         """
         Parse an expression.
@@ -200,15 +308,17 @@ class Parser:
         elif token[0] == 'ID':
             self.eat('ID')
             if self.current_token() and self.current_token()[0] == 'LPAREN':
-                return self.function_call(IdentifierNode(name=token[1]))
-            return IdentifierNode(name=token[1])
+                return self.indexing(self.function_call(IdentifierNode(name=token[1])))
+            return self.indexing(IdentifierNode(name=token[1]))
         elif token[0] == 'LPAREN':
             self.eat('LPAREN')
             node = self.expression()
             self.eat('RPAREN')
             if self.current_token() and self.current_token()[0] == 'LPAREN':
-                return self.function_call(node)
-            return node
+                return self.indexing(self.function_call(node))
+            return self.indexing(node)
+        elif token[0] == 'LBRACKET':
+            return self.indexing(self.list_literal())
         elif token[0] == 'NOT':
             self.eat('NOT')
             return UnaryOpNode(op='!', operand=self.factor())
@@ -275,6 +385,35 @@ class Parser:
         self.eat('RPAREN')  # Consume the right parenthesis
         return FunctionCallNode(func=func, args=args)
 
+    def list_literal(self):
+        """
+        Parse a sequence literal.
+
+        :return: A ListNode representing the sequence literal.
+        """
+        self.eat('LBRACKET')  # Consume the left bracket
+        elements = []  # List to hold the elements
+        if self.current_token() and self.current_token()[0] != 'RBRACKET':
+            elements.append(self.expression())  # Add the first element
+            while self.current_token() and self.current_token()[0] == 'DELIM':
+                self.eat('DELIM')  # Consume the comma
+                elements.append(self.expression())  # Add the next element
+        self.eat('RBRACKET')  # Consume the right bracket
+        return ListNode(elements=elements)
+
+    def indexing(self, node):
+        """
+        Parse the index operations following a factor, as in xs[0] or rows[i][j].
+
+        :param node: The indexed factor.
+        :return: The factor, or an IndexNode wrapping it.
+        """
+        while self.current_token() and self.current_token()[0] == 'LBRACKET':
+            self.eat('LBRACKET')  # Consume the left bracket
+            node = IndexNode(sequence=node, index=self.expression())  # Create an IndexNode
+            self.eat('RBRACKET')  # Consume the right bracket
+        return node
+
     def current_token(self):
         """
         Get the current token.
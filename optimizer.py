@@ -0,0 +1,318 @@
+from cek import apply_binary_op
+from compiler import SHORT_CIRCUIT
+from my_parser import *
+from parallel import global_reads
+
+INLINE_SIZE = 12  # Largest body, in AST nodes, of a global function inlined at its call sites
+
+
+def is_literal(node):
+    """
+    Check whether an AST node is a number or boolean literal.
+
+    :param node: The AST node.
+    :return: True if the node is a literal.
+    """
+    return isinstance(node, (NumberNode, BooleanNode))
+
+
+def make_literal(value):
+    """
+    Build the literal node for a folded value.
+
+    :param value: An int or bool value.
+    :return: A BooleanNode or NumberNode.
+    """
+    if isinstance(value, bool):
+        return BooleanNode(value=value)
+    return NumberNode(value=value)
+
+
+# Optimizer class rewriting ASTs before they are evaluated
+class Optimizer:
+    def optimize(self, node):
+        """
+        Optimize a top-level AST node (a statement returned by Parser.parse).
+
+        Folds BinaryOpNode and UnaryOpNode trees with literal operands, prunes IfElseNodes
+        whose condition is a literal, drops the right operand of logical operators decided by a
+        literal left operand (as in False && x), and beta-reduces immediately applied lambdas:
+        the arguments that are literals are substituted into the body, and the others are bound
+        by a LetNode, so no closure is created and no call is made. Operations that would
+        raise (such as 10 / 0 or True && 1) are left in the tree, so they raise the same
+        error, at the same point, when the program runs.
+
+        :param node: The AST node to optimize.
+        :return: The optimized AST node.
+        """
+        return self.visit(node)
+
+    def visit(self, node):
+        """
+        Optimize a given AST node.
+
+        :param node: The AST node to optimize.
+        :return: The optimized AST node.
+        :raises Exception: If the node type is not supported.
+        """
+        method_name = f'visit_{type(node).__name__}'
+        method = getattr(self, method_name, None)
+        if method is None:
+            raise Exception(f"No method to optimize node type {type(node).__name__}")
+        return method(node)
+
+    def visit_NumberNode(self, node):
+        return node
+
+    def visit_BooleanNode(self, node):
+        return node
+
+    def visit_IdentifierNode(self, node):
+        return node
+
+    def visit_BinaryOpNode(self, node):
+        left = self.visit(node.left)
+        if node.op in SHORT_CIRCUIT and isinstance(left, BooleanNode) and left.value is SHORT_CIRCUIT[node.op]:
+            return left  # The right operand never runs
+        right = self.visit(node.right)
+        if is_literal(left) and is_literal(right):
+            try:
+                return make_literal(apply_binary_op(node.op, left.value, right.value))
+            except Exception:
+                pass  # Keep the operation so the error is raised at run time
+        return BinaryOpNode(left=left, op=node.op, right=right)
+
+    def visit_UnaryOpNode(self, node):
+        operand = self.visit(node.operand)
+        if node.op == '!' and isinstance(operand, BooleanNode):
+            return BooleanNode(value=not operand.value)
+        return UnaryOpNode(op=node.op, operand=operand)
+
+    def visit_LambdaNode(self, node):
+        return LambdaNode(params=node.params, body=self.visit(node.body))
+
+    def visit_FunctionDefNode(self, node):
+        return FunctionDefNode(name=node.name, params=node.params, body=self.visit(node.body))
+
+    def visit_ImportNode(self, node):
+        return node
+
+    def visit_LetNode(self, node):
+        values = [self.visit(value) for value in node.values]
+        return self.specialize(LambdaNode(params=node.names, body=self.visit(node.body)), values)
+
+    def visit_InlineNode(self, node):
+        return InlineNode(name=node.name, function=node.function, body=self.visit(node.body),
+                          call=self.visit(node.call))
+
+    def visit_IfElseNode(self, node):
+        condition = self.visit(node.condition)
+        if is_literal(condition):
+            return self.visit(node.if_body if condition.value else node.else_body)
+        return IfElseNode(condition=condition, if_body=self.visit(node.if_body),
+                          else_body=self.visit(node.else_body))
+
+    def visit_FunctionCallNode(self, node):
+        func = self.visit(node.func)
+        args = [self.visit(arg) for arg in node.args]
+        if isinstance(func, LambdaNode):
+            return self.specialize(func, args)
+        return FunctionCallNode(func=func, args=args)
+
+    def visit_ListNode(self, node):
+        return ListNode(elements=[self.visit(element) for element in node.elements])
+
+    def visit_IndexNode(self, node):
+        return IndexNode(sequence=self.visit(node.sequence), index=self.visit(node.index))
+
+    def specialize(self, func, args):
+        """
+        Beta-reduce an immediately applied lambda: substitute its literal arguments into the
+        body and bind the other ones with a LetNode.
+
+        :param func: The optimized LambdaNode being called.
+        :param args: The optimized argument nodes.
+        :return: The LetNode, or the lambda body if every argument was a literal.
+        """
+        params = func.params
+        if len(params) != len(args) or len(set(params)) != len(params):
+            return FunctionCallNode(func=func, args=args)  # Keep the arity error for run time
+        bindings = {param: arg for param, arg in zip(params, args) if is_literal(arg)}
+        body = self.visit(substitute(func.body, bindings)) if bindings else func.body
+        remaining = [(param, arg) for param, arg in zip(params, args) if param not in bindings]
+        if not remaining:
+            return body
+        return LetNode(names=[param for param, _ in remaining], values=[arg for _, arg in remaining], body=body)
+
+
+# Inliner class replacing calls of small global functions by their bodies, while statements run.
+# Unlike the Optimizer's rewrites, inlining depends on the functions the names are bound to
+# when a statement runs, so each call is wrapped in an InlineNode guarded by the function it
+# inlined; the call itself runs instead once the name was rebound.
+class Inliner:
+    def __init__(self, optimizer):
+        """
+        Initialize the Inliner.
+
+        :param optimizer: The Optimizer simplifying inlined bodies for their literal arguments.
+        """
+        self.optimizer = optimizer  # Beta-reduces the inlined bodies
+        self.definitions = {}  # Maps names to the (function, FunctionDefNode, globals read) of inlinable definitions
+        self.variables = None  # Variables of the global environment, while a statement is inlined
+        self.bound = frozenset()  # Names bound by the enclosing lambdas, functions and LetNodes
+        self.definition = None  # Name of the function whose definition is being inlined into, or None
+
+    def record(self, node, function):
+        """
+        Remember a definition that just ran, if its function can be inlined: its body is at
+        most INLINE_SIZE nodes, its parameters are distinct and it does not call itself.
+
+        :param node: The FunctionDefNode, as returned by inline().
+        :param function: The function value the definition bound its name to.
+        """
+        params = node.params
+        reads = global_reads(node.body, set(params))
+        if len(set(params)) == len(params) and node_size(node.body) <= INLINE_SIZE and node.name not in reads:
+            self.definitions[node.name] = (function, node, reads)
+        else:
+            self.definitions.pop(node.name, None)
+
+    def inline(self, node, variables):
+        """
+        Inline the calls of a top-level AST node to the recorded functions still bound to their names.
+
+        :param node: The optimized AST node.
+        :param variables: The variables of the global environment.
+        :return: The AST node with InlineNodes.
+        """
+        if not self.definitions:
+            return node
+        self.variables = variables
+        self.bound = frozenset()
+        self.definition = node.name if isinstance(node, FunctionDefNode) else None
+        return self.visit(node)
+
+    def visit(self, node):
+        """
+        Inline the calls in a given AST node.
+
+        :param node: The AST node.
+        :return: The rewritten AST node.
+        """
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        return node if method is None else method(node)
+
+    def visit_BinaryOpNode(self, node):
+        return BinaryOpNode(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOpNode(self, node):
+        return UnaryOpNode(op=node.op, operand=self.visit(node.operand))
+
+    def visit_LambdaNode(self, node):
+        return LambdaNode(params=node.params, body=self.visit_body(node.params, node.body))
+
+    def visit_FunctionDefNode(self, node):
+        return FunctionDefNode(name=node.name, params=node.params, body=self.visit_body(node.params, node.body))
+
+    def visit_LetNode(self, node):
+        return LetNode(names=node.names, values=[self.visit(value) for value in node.values],
+                       body=self.visit_body(node.names, node.body))
+
+    def visit_IfElseNode(self, node):
+        return IfElseNode(condition=self.visit(node.condition), if_body=self.visit(node.if_body),
+                          else_body=self.visit(node.else_body))
+
+    def visit_ListNode(self, node):
+        return ListNode(elements=[self.visit(element) for element in node.elements])
+
+    def visit_IndexNode(self, node):
+        return IndexNode(sequence=self.visit(node.sequence), index=self.visit(node.index))
+
+    def visit_FunctionCallNode(self, node):
+        func = self.visit(node.func)
+        args = [self.visit(arg) for arg in node.args]
+        call = FunctionCallNode(func=func, args=args)
+        if not isinstance(func, IdentifierNode) or func.name in self.bound or func.name == self.definition:
+            return call
+        function, definition, reads = self.definitions.get(func.name, (None, None, None))
+        if function is None or self.variables.get(func.name) is not function or len(args) != len(definition.params):
+            return call
+        if reads & self.bound:
+            return call  # A global the body reads is shadowed at the call site
+        body = self.optimizer.specialize(LambdaNode(params=definition.params, body=definition.body), args)
+        # The call only runs once the name was rebound, so its arguments keep their calls rather
+        # than doubling the size of nested inlined calls
+        return InlineNode(name=func.name, function=function, body=body, call=node)
+
+    def visit_body(self, names, body):
+        """
+        Inline the calls in the body of a lambda, function or LetNode.
+
+        :param names: The names the body binds.
+        :param body: The body AST node.
+        :return: The rewritten body.
+        """
+        bound = self.bound
+        self.bound = bound | frozenset(names)
+        try:
+            return self.visit(body)
+        finally:
+            self.bound = bound
+
+
+def node_size(node):
+    """
+    Count the nodes of an AST, counting an InlineNode as its inlined body.
+
+    :param node: The AST node.
+    :return: The number of nodes.
+    """
+    if isinstance(node, InlineNode):
+        return 1 + node_size(node.body)
+    size = 1
+    for field in node.__slots__:
+        value = getattr(node, field)
+        if isinstance(value, ASTNode):
+            size += node_size(value)
+        elif isinstance(value, list):
+            size += sum(node_size(item) for item in value if isinstance(item, ASTNode))
+    return size
+
+
+def substitute(node, bindings):
+    """
+    Replace free identifiers by literal nodes, respecting shadowing by inner lambdas.
+
+    :param node: The AST node to rewrite.
+    :param bindings: Maps identifier names to the literal nodes replacing them.
+    :return: The rewritten AST node.
+    """
+    if isinstance(node, IdentifierNode):
+        return bindings.get(node.name, node)
+    elif isinstance(node, BinaryOpNode):
+        return BinaryOpNode(left=substitute(node.left, bindings), op=node.op,
+                            right=substitute(node.right, bindings))
+    elif isinstance(node, UnaryOpNode):
+        return UnaryOpNode(op=node.op, operand=substitute(node.operand, bindings))
+    elif isinstance(node, LambdaNode):
+        inner = {name: value for name, value in bindings.items() if name not in node.params}
+        return LambdaNode(params=node.params, body=substitute(node.body, inner)) if inner else node
+    elif isinstance(node, FunctionCallNode):
+        return FunctionCallNode(func=substitute(node.func, bindings),
+                                args=[substitute(arg, bindings) for arg in node.args])
+    elif isinstance(node, IfElseNode):
+        return IfElseNode(condition=substitute(node.condition, bindings),
+                          if_body=substitute(node.if_body, bindings),
+                          else_body=substitute(node.else_body, bindings))
+    elif isinstance(node, ListNode):
+        return ListNode(elements=[substitute(element, bindings) for element in node.elements])
+    elif isinstance(node, IndexNode):
+        return IndexNode(sequence=substitute(node.sequence, bindings), index=substitute(node.index, bindings))
+    elif isinstance(node, LetNode):
+        inner = {name: value for name, value in bindings.items() if name not in node.names}
+        return LetNode(names=node.names, values=[substitute(value, bindings) for value in node.values],
+                       body=substitute(node.body, inner) if inner else node.body)
+    elif isinstance(node, InlineNode):
+        return InlineNode(name=node.name, function=node.function, body=substitute(node.body, bindings),
+                          call=substitute(node.call, bindings))
+    return node
@@ -0,0 +1,184 @@
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from environment import VERSIONS
+from my_parser import *
+from sequences import Builtin
+
+
+def global_reads(node, bound=frozenset()):
+    """
+    Collect the global names an AST node may read when it runs.
+
+    :param node: The AST node.
+    :param bound: The names bound by enclosing lambdas and functions.
+    :return: A set of names.
+    """
+    if isinstance(node, IdentifierNode):
+        return set() if node.name in bound else {node.name}
+    elif isinstance(node, BinaryOpNode):
+        return global_reads(node.left, bound) | global_reads(node.right, bound)
+    elif isinstance(node, UnaryOpNode):
+        return global_reads(node.operand, bound)
+    elif isinstance(node, (LambdaNode, FunctionDefNode)):
+        return global_reads(node.body, bound | set(node.params))
+    elif isinstance(node, FunctionCallNode):
+        names = global_reads(node.func, bound)
+        for arg in node.args:
+            names |= global_reads(arg, bound)
+        return names
+    elif isinstance(node, IfElseNode):
+        return (global_reads(node.condition, bound) | global_reads(node.if_body, bound)
+                | global_reads(node.else_body, bound))
+    elif isinstance(node, ListNode):
+        names = set()
+        for element in node.elements:
+            names |= global_reads(element, bound)
+        return names
+    elif isinstance(node, IndexNode):
+        return global_reads(node.sequence, bound) | global_reads(node.index, bound)
+    elif isinstance(node, LetNode):
+        names = global_reads(node.body, bound | set(node.names))
+        for value in node.values:
+            names |= global_reads(value, bound)
+        return names
+    elif isinstance(node, InlineNode):
+        return global_reads(node.body, bound) | global_reads(node.call, bound)
+    return set()
+
+
+def dependencies(statements, opaque=frozenset()):
+    """
+    Build the dependency DAG of a program's statements.
+
+    Expression statements only read globals, and only 'def' and import statements bind them,
+    so an expression depends on the definitions it can reach, in the versions current at its
+    line: the ones it reads, plus the ones their bodies read, and so on. The names an import
+    binds are only known once the module is loaded, so an expression depends on every import
+    before it. Likewise, an expression reaching a function bound before the program, whose
+    body is not known, depends on every definition before it.
+
+    :param statements: A list of (line, AST node, error) tuples from Interpreter.parse_program.
+    :param opaque: The names of the functions bound before the program, e.g. by a prelude.
+    :return: A dictionary mapping the index of each expression statement to the sorted indices
+             of the definitions and imports it depends on.
+    """
+    definitions = {}  # Maps each name to the index of its latest definition so far
+    imports = []  # Indices of the import statements so far
+    reads = {}  # Maps the index of each statement to the global names it reads
+    graph = {}
+    for index, (_, ast, _) in enumerate(statements):
+        if ast is None:
+            continue
+        if isinstance(ast, ImportNode):
+            imports.append(index)
+            continue
+        reads[index] = global_reads(ast)
+        if isinstance(ast, FunctionDefNode):
+            definitions[ast.name] = index
+            continue
+        needed = set(imports)
+        pending = [definitions[name] for name in reads[index] if name in definitions]
+        # Names the program redefined are known again
+        everything = any(name in opaque and name not in definitions for name in reads[index])
+        while pending and not everything:
+            definition = pending.pop()
+            if definition not in needed:
+                needed.add(definition)
+                pending.extend(definitions[name] for name in reads[definition] if name in definitions)
+                everything = any(name in opaque and name not in definitions for name in reads[definition])
+        if everything:
+            needed.update(definitions.values())
+        graph[index] = sorted(needed)
+    return graph
+
+
+worker_interpreter = None  # Interpreter of this worker process, with the prelude loaded
+worker_globals = None  # Its global bindings after the prelude, restored before each statement
+worker_inlined = None  # The definitions its Inliner recorded by then, or None without the optimizer
+
+
+def initialize_worker(options, memo_names):
+    """
+    Configure a worker process like the command-line interpreter, and build the Interpreter
+    running its statements, loading the prelude once.
+
+    :param options: The keyword arguments of the Interpreter.
+    :param memo_names: The names of individually memoized functions.
+    """
+    global worker_interpreter, worker_globals, worker_inlined
+    from interpreter import Interpreter  # Imported here since interpreter.py imports this module
+
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    worker_interpreter = Interpreter(**options)
+    for name in memo_names:
+        worker_interpreter.memoize(name)
+    worker_globals = dict(worker_interpreter.global_env.variables)
+    if worker_interpreter.inliner is not None:
+        worker_inlined = dict(worker_interpreter.inliner.definitions)
+
+
+def run_statement(definitions, ast, directory=None):
+    """
+    Run one expression statement in the worker's Interpreter (in a worker process), with its
+    global environment restored to the bindings of the prelude.
+
+    :param definitions: The ASTs of the 'def' and import statements the expression depends on, in source order.
+    :param ast: The AST of the expression statement.
+    :param directory: The directory that relative import paths start from, or None for the working directory.
+    :return: The text the statement printed.
+    """
+    interpreter = worker_interpreter
+    global_env = interpreter.global_env
+    # The same dictionary is kept, since compiled code holds it; prelude functions then call the
+    # statement's definitions of the names they read, as in a single process
+    global_env.variables.clear()
+    global_env.variables.update(worker_globals)
+    global_env.version = next(VERSIONS)  # Invalidates the call sites that cached the previous statement's globals
+    interpreter.memo_cache.clear()
+    if worker_inlined is not None:
+        interpreter.inliner.definitions = dict(worker_inlined)
+    interpreter.directory = directory
+    with redirect_stdout(io.StringIO()):
+        for definition in definitions:
+            interpreter.run(definition, optimized=True)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter.execute_statement(ast)
+    return output.getvalue()
+
+
+def execute_parallel(interpreter, statements, jobs):
+    """
+    Execute a program's statements with the expression statements spread over a process pool.
+
+    'def' and import statements run in this process, in order. Each expression statement runs in a
+    worker together with the definitions it depends on, and the output of every statement
+    is printed in source order, so the transcript is the same as Interpreter.execute_file's.
+
+    :param interpreter: The Interpreter whose options the workers use.
+    :param statements: A list of (line, AST node, error) tuples from Interpreter.parse_program.
+    :param jobs: The number of worker processes.
+    """
+    prelude = {name for name, value in interpreter.global_env.variables.items() if type(value) is not Builtin}
+    graph = dependencies(statements, frozenset(prelude))
+    initargs = (interpreter.options, sorted(interpreter.memo_names))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initialize_worker, initargs=initargs) as executor:
+        futures = {}
+        for index, definitions in graph.items():
+            futures[index] = executor.submit(run_statement, [statements[definition][1] for definition in definitions],
+                                             statements[index][1], interpreter.directory)
+        for index, (line, ast, error) in enumerate(statements):
+            if ast is None and error is None:
+                continue  # Ignore comment and empty lines
+            print(f"Executing: {line}")
+            if index not in futures:
+                interpreter.execute_statement(ast, error)  # Definitions and parse errors
+                continue
+            try:
+                sys.stdout.write(futures.pop(index).result())
+            except Exception as e:
+                print(e)  # The worker failed, e.g. the result could not be sent back
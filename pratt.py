@@ -0,0 +1,213 @@
+from lexer import TOKEN_TYPES, TokenBuffer
+from my_parser import *
+
+# Binding power of each binary operator. The levels match Parser: '*', '/' and '%' bind
+# tighter than every other binary operator, and all operators are left-associative.
+BINARY_PRECEDENCE = {
+    '+': 1, '-': 1,
+    '==': 1, '!=': 1, '<=': 1, '>=': 1, '<': 1, '>': 1,
+    '&&': 1, '||': 1,
+    '*': 2, '/': 2, '%': 2,
+}
+BINARY_TOKEN_TYPES = ('OP', 'COMPARE', 'LOGICAL')  # Token types that can hold a binary operator
+END = 'END'  # Type of the sentinel token appended after the last token
+
+
+# Precedence-table (Pratt) parser producing the same AST as Parser
+class PrattParser:
+    def __init__(self, tokens):
+        """
+        Initialize the PrattParser with a list of tokens or a TokenBuffer.
+
+        :param tokens: List of (token_type, token_value) tuples generated by the lexer, or a TokenBuffer.
+        """
+        if isinstance(tokens, TokenBuffer):
+            self.types = [TOKEN_TYPES[code] for code in tokens.types]  # Type of each token
+            self.values = list(tokens.values)  # Value of each token
+            self.buffer = tokens  # The TokenBuffer, used to report line and column
+        else:
+            self.types = [token[0] for token in tokens]
+            self.values = [token[1] for token in tokens]
+            self.buffer = None
+        self.types.append(END)  # The sentinel removes the bounds check on every lookahead
+        self.values.append(None)
+        self.index = 0  # Index of the current token
+
+    def parse(self):
+        """
+        Parse the tokens and return the corresponding AST. Like Parser.parse, tokens after
+        the first complete statement are ignored.
+
+        :return: The root node of the AST.
+        """
+        if self.types[0] == 'KEYWORD' and self.values[0] == 'def':
+            return self.function_definition()
+        if self.types[0] == 'ID' and self.values[0] == 'import' and self.types[1] == 'STRING':
+            return ImportNode(path=self.values[1])  # 'import' is only a keyword before a path, as in Parser
+        return self.expression(0)
+
+    def expression(self, min_precedence):
+        """
+        Parse an expression whose binary operators bind at least as tightly as min_precedence.
+
+        :param min_precedence: The lowest binding power of the operators this call consumes.
+        :return: The corresponding AST node.
+        """
+        types, values = self.types, self.values
+        node = self.prefix()
+        while True:
+            index = self.index
+            if types[index] not in BINARY_TOKEN_TYPES:
+                return node
+            op = values[index]
+            precedence = BINARY_PRECEDENCE[op]
+            if precedence < min_precedence:
+                return node
+            self.index = index + 1
+            node = BinaryOpNode(left=node, op=op, right=self.expression(precedence + 1))
+
+    def prefix(self):
+        """
+        Parse the operand of a binary operator (a factor in bnf.txt).
+
+        :return: The corresponding AST node.
+        """
+        index = self.index
+        kind = self.types[index]
+        value = self.values[index]
+        self.index = index + 1
+        if kind == 'NUMBER':
+            return NumberNode(value=value)
+        elif kind == 'ID':
+            node = IdentifierNode(name=value)
+            return self.indexing(self.function_call(node) if self.types[self.index] == 'LPAREN' else node)
+        elif kind == 'BOOLEAN':
+            return BooleanNode(value=value)
+        elif kind == 'LPAREN':
+            node = self.expression(0)
+            self.expect('RPAREN')
+            return self.indexing(self.function_call(node) if self.types[self.index] == 'LPAREN' else node)
+        elif kind == 'LBRACKET':
+            elements = []
+            if self.types[self.index] not in ('RBRACKET', END):
+                elements.append(self.expression(0))
+                while self.types[self.index] == 'DELIM':
+                    self.index += 1
+                    elements.append(self.expression(0))
+            self.expect('RBRACKET')
+            return self.indexing(ListNode(elements=elements))
+        elif kind == 'OP' and value == '-':
+            if self.types[self.index] != 'NUMBER':
+                raise self.error(self.index, 'expected a number after "-"')
+            self.index += 1
+            return NumberNode(value=-self.values[self.index - 1])
+        elif kind == 'NOT':
+            return UnaryOpNode(op='!', operand=self.prefix())
+        elif kind == 'KEYWORD' and value == 'lambda':
+            params = self.parameter_list()
+            self.expect('COLON')
+            return LambdaNode(params=params, body=self.expression(0))
+        elif kind == 'KEYWORD' and value == 'if':
+            condition = self.expression(0)
+            self.expect('COLON')
+            if_body = self.expression(0)
+            if self.types[self.index] != 'KEYWORD' or self.values[self.index] != 'else':
+                raise self.error(self.index, 'expected else')
+            self.index += 1
+            self.expect('COLON')
+            return IfElseNode(condition=condition, if_body=if_body, else_body=self.expression(0))
+        raise self.error(index)
+
+    def function_definition(self):
+        """
+        Parse a function definition.
+
+        :return: A FunctionDefNode representing the function definition.
+        """
+        self.index = 1  # Skip the 'def' keyword
+        name = self.values[self.index]
+        self.expect('ID')
+        self.expect('LPAREN')
+        params = self.parameter_list()
+        self.expect('RPAREN')
+        self.expect('COLON')
+        return FunctionDefNode(name=name, params=params, body=self.expression(0))
+
+    def parameter_list(self):
+        """
+        Parse a possibly empty, comma-separated list of parameter names.
+
+        :return: The list of parameter names.
+        """
+        params = []
+        if self.types[self.index] == 'ID':
+            params.append(self.values[self.index])
+            self.index += 1
+            while self.types[self.index] == 'DELIM':
+                self.index += 1
+                params.append(self.values[self.index])
+                self.expect('ID')
+        return params
+
+    def function_call(self, func):
+        """
+        Parse the argument list of a function call.
+
+        :param func: The function being called.
+        :return: A FunctionCallNode representing the function call.
+        """
+        self.index += 1  # Skip the left parenthesis
+        args = []
+        if self.types[self.index] not in ('RPAREN', END):
+            args.append(self.expression(0))
+            while self.types[self.index] == 'DELIM':
+                self.index += 1
+                args.append(self.expression(0))
+        self.expect('RPAREN')
+        return FunctionCallNode(func=func, args=args)
+
+    def indexing(self, node):
+        """
+        Parse the index operations following an operand, as in xs[0] or rows[i][j].
+
+        :param node: The indexed operand.
+        :return: The operand, or an IndexNode wrapping it.
+        """
+        while self.types[self.index] == 'LBRACKET':
+            self.index += 1
+            node = IndexNode(sequence=node, index=self.expression(0))
+            self.expect('RBRACKET')
+        return node
+
+    def expect(self, token_type):
+        """
+        Consume the current token if it has the expected type.
+
+        :param token_type: The expected type of the current token.
+        :raises Exception: If the current token does not have the expected type.
+        """
+        if self.types[self.index] != token_type:
+            raise self.error(self.index, f'expected: {token_type}')
+        self.index += 1
+
+    def error(self, index, expected=None):
+        """
+        Build the error for an unexpected token.
+
+        :param index: The index of the unexpected token.
+        :param expected: A description of what was expected, if any.
+        :return: The exception to raise.
+        """
+        if self.types[index] == END:
+            found = 'end of input'
+        else:
+            found = f'token: {(self.types[index], self.values[index])}'
+        if self.buffer is not None and index < len(self.buffer):
+            line, column = self.buffer.position(index)
+            where = f'at line {line}, column {column}'
+        elif self.buffer is not None and index > 0:
+            line, column = self.buffer.position(index - 1)  # The input ends after the last token
+            where = f'at line {line}, column {column + len(str(self.values[index - 1]))}'
+        else:
+            where = f'at position {index}'
+        return Exception(f'Unexpected {found}{", " + expected if expected else ""} {where}')
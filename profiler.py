@@ -0,0 +1,244 @@
+import functools
+import time
+from collections import Counter
+
+from interpreter import Interpreter
+from lexer import TOKEN_CODES, Lexer
+from my_parser import *
+
+TOPLEVEL = '<toplevel>'  # Label of the code of a statement outside any function
+
+
+def children(node):
+    """
+    Get the child nodes of an AST node, in source order.
+
+    :param node: The AST node.
+    :return: A list of AST nodes.
+    """
+    if isinstance(node, BinaryOpNode):
+        return [node.left, node.right]
+    elif isinstance(node, UnaryOpNode):
+        return [node.operand]
+    elif isinstance(node, (LambdaNode, FunctionDefNode)):
+        return [node.body]
+    elif isinstance(node, FunctionCallNode):
+        return [node.func] + node.args
+    elif isinstance(node, IfElseNode):
+        return [node.condition, node.if_body, node.else_body]
+    elif isinstance(node, ListNode):
+        return list(node.elements)
+    elif isinstance(node, IndexNode):
+        return [node.sequence, node.index]
+    return []
+
+
+# Timing and call counts of one profiled function
+class FunctionStats:
+    __slots__ = ('calls', 'inclusive', 'exclusive', 'active', 'max_depth')
+
+    def __init__(self):
+        self.calls = 0  # Number of calls
+        self.inclusive = 0.0  # Seconds spent in the outermost activations, including callees
+        self.exclusive = 0.0  # Seconds spent in the function's own code
+        self.active = 0  # Number of activations currently on the call stack
+        self.max_depth = 0  # Largest number of simultaneous activations (recursion depth)
+
+
+# Frame of the profiler's call stack
+class ProfileFrame:
+    __slots__ = ('label', 'path', 'start', 'children')
+
+    def __init__(self, label, path, start):
+        self.label = label  # Label of the function
+        self.path = path  # Labels of every frame from the bottom of the stack, joined by ';'
+        self.start = start  # perf_counter() when the frame was entered
+        self.children = 0.0  # Seconds spent in callees
+
+
+# Collector of the measurements of a ProfilingInterpreter
+class Profiler:
+    def __init__(self, call_stack):
+        """
+        Initialize the Profiler.
+
+        :param call_stack: The list used as the stack of ProfileFrames.
+        """
+        self.call_stack = call_stack  # Frames of the functions being executed
+        self.functions = {}  # Maps function labels to their FunctionStats
+        self.node_counts = Counter()  # Number of evaluations per AST node type
+        self.lookup_depths = Counter()  # Number of variable lookups per environment chain depth
+        self.stacks = Counter()  # Maps collapsed stacks to their exclusive time in microseconds
+
+    def enter(self, label):
+        """
+        Record the start of a call.
+
+        :param label: The label of the function.
+        """
+        stats = self.functions.get(label)
+        if stats is None:
+            stats = self.functions[label] = FunctionStats()
+        stats.calls += 1
+        stats.active += 1
+        if stats.active > stats.max_depth:
+            stats.max_depth = stats.active
+        path = f'{self.call_stack[-1].path};{label}' if self.call_stack else label
+        self.call_stack.append(ProfileFrame(label, path, time.perf_counter()))
+
+    def exit(self):
+        """
+        Record the end of the call on top of the stack.
+        """
+        frame = self.call_stack.pop()
+        elapsed = time.perf_counter() - frame.start
+        exclusive = elapsed - frame.children
+        stats = self.functions[frame.label]
+        stats.active -= 1
+        stats.exclusive += exclusive
+        if stats.active == 0:
+            stats.inclusive += elapsed  # Recursive activations are already included
+        if self.call_stack:
+            self.call_stack[-1].children += elapsed
+        self.stacks[frame.path] += round(exclusive * 1_000_000)
+
+    def report(self):
+        """
+        Format the measurements as tables sorted by cost.
+
+        :return: The report text.
+        """
+        lines = [f"{'function':<32}{'calls':>10}{'inclusive s':>13}{'exclusive s':>13}{'max depth':>11}"]
+        for label, stats in sorted(self.functions.items(), key=lambda item: -item[1].exclusive):
+            lines.append(f"{label:<32}{stats.calls:>10}{stats.inclusive:>13.6f}{stats.exclusive:>13.6f}"
+                         f"{stats.max_depth:>11}")
+        lines.append('')
+        lines.append(f"{'node type':<32}{'evaluations':>12}")
+        for node_type, count in self.node_counts.most_common():
+            lines.append(f"{node_type:<32}{count:>12}")
+        lookups = sum(self.lookup_depths.values())
+        if lookups:
+            total = sum(depth * count for depth, count in self.lookup_depths.items())
+            lines.append('')
+            lines.append(f"variable lookups: {lookups}, mean environment chain depth: {total / lookups:.2f}, "
+                         f"max: {max(self.lookup_depths)}")
+            lines.append(f"{'chain depth':<32}{'lookups':>12}")
+            for depth in sorted(self.lookup_depths):
+                lines.append(f"{depth:<32}{self.lookup_depths[depth]:>12}")
+        return '\n'.join(lines)
+
+    def write_collapsed(self, filename):
+        """
+        Write the collapsed stacks ("caller;callee microseconds" lines), the input format of
+        flamegraph.pl, inferno and speedscope.
+
+        :param filename: The path of the file to write.
+        """
+        with open(filename, 'w') as file:
+            for path, microseconds in sorted(self.stacks.items()):
+                if microseconds > 0:
+                    file.write(f'{path} {microseconds}\n')
+
+
+# Tree-walking Interpreter that records a profile of the program it runs
+class ProfilingInterpreter(Interpreter):
+    def __init__(self, **options):
+        """
+        Initialize the ProfilingInterpreter. The program always runs in 'tree' mode (or in 'lazy'
+        mode, if requested), without the optimizer, the program cache and node sharing, so that the
+        profile describes the code as written and each lambda keeps its source position.
+
+        :param options: Other keyword arguments of Interpreter.
+        """
+        mode = 'lazy' if options.get('mode') == 'lazy' else 'tree'
+        options.update(mode=mode, optimize=False, dump_optimized=False, cache=False, share_nodes=False)
+        prelude = options.pop('prelude', None)  # Loaded once the profiler exists, since its calls are profiled
+        super().__init__(**options)
+        self.profiler = Profiler(self.call_stack)  # Measurements, using call_stack as its stack
+        self.lambda_labels = {}  # Maps id() of each parsed LambdaNode to the node and its label
+        self.lines_read = 0  # Number of program lines parse_statement has read
+        self.position = None  # Line number and indentation of the statement parse_statement is parsing
+        self.statements_parsed = 0  # Number of statements parsed so far
+        if prelude is not None:
+            self.options['prelude'] = prelude
+            self.load_prelude(prelude)
+            self.lines_read = 0  # Line numbers restart with the program
+
+    def parse_statement(self, line):
+        self.lines_read += 1
+        self.position = (self.lines_read, len(line) - len(line.lstrip()))
+        try:
+            return super().parse_statement(line)
+        finally:
+            self.position = None
+
+    def parse(self, line):
+        """
+        Parse a line and label its lambdas with their source position.
+
+        :param line: The line of code.
+        :return: The root node of the AST.
+        """
+        self.statements_parsed += 1
+        number, indent = self.position or (self.statements_parsed, 0)
+        ast = super().parse(line)
+        # Pre-order traversal meets lambdas in the order of their keywords in the source
+        tokens = Lexer(line).tokenize_compact()
+        keyword = TOKEN_CODES['KEYWORD']
+        columns = iter([indent + tokens.offsets[index] + 1 for index in range(len(tokens))
+                        if tokens.types[index] == keyword and tokens.values[index] == 'lambda'])
+        pending = [ast]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, LambdaNode):
+                # The node is kept so that its id() is not reused by another node
+                self.lambda_labels[id(node)] = (node, f'lambda@{number}:{next(columns, "?")}')
+            pending.extend(reversed(children(node)))
+        return ast
+
+    def run(self, node, optimized=False):
+        self.profiler.enter(TOPLEVEL)
+        try:
+            return super().run(node, optimized)
+        finally:
+            self.profiler.exit()
+
+    def evaluate(self, node, env=None):
+        self.profiler.node_counts[type(node).__name__] += 1
+        return super().evaluate(node, env)
+
+    def eval_IdentifierNode(self, node, env):
+        depth = 0
+        scope = env
+        while scope.parent is not None and node.name not in scope.variables:
+            scope = scope.parent
+            depth += 1
+        self.profiler.lookup_depths[depth] += 1
+        return super().eval_IdentifierNode(node, env)
+
+    def eval_LambdaNode(self, node, env):
+        label = self.lambda_labels.get(id(node), (node, 'lambda'))[1]
+        return self.profiled(label, super().eval_LambdaNode(node, env))
+
+    def define(self, name, function):
+        super().define(name, self.profiled(name, function))
+
+    def profiled(self, label, function):
+        """
+        Wrap a function value so that its calls are recorded.
+
+        :param label: The label of the function in the profile.
+        :param function: The function value.
+        :return: The wrapped function.
+        """
+        profiler = self.profiler
+
+        @functools.wraps(function)
+        def profiled_function(*args):
+            profiler.enter(label)
+            try:
+                return function(*args)
+            finally:
+                profiler.exit()
+
+        return profiled_function
@@ -0,0 +1,125 @@
+from my_parser import *
+
+
+# Resolver class annotating identifiers with their lexical address
+class Resolver:
+    def __init__(self, global_env):
+        """
+        Initialize the Resolver.
+
+        :param global_env: The global environment, used to detect names that can never be defined.
+        """
+        self.global_env = global_env  # Global environment for storing variables and functions
+        self.scopes = []  # Parameter lists of the enclosing lambdas/functions, innermost last
+        self.in_definition = False  # Whether a function definition body is being resolved
+
+    def resolve(self, node):
+        """
+        Resolve a top-level AST node (a statement returned by Parser.parse).
+
+        Returns a copy of the tree in which every IdentifierNode carries its address:
+        ('local', depth, slot) for parameters of an enclosing lambda/function, 'global' for
+        names looked up in the global environment at run time, and 'undefined' for names in
+        an expression statement that are not defined globally. Since expressions cannot
+        define names, such a lookup is known to fail while resolving; the error itself is
+        still raised when evaluation reaches the identifier, so error ordering matches the
+        reference evaluator.
+
+        :param node: The AST node to resolve.
+        :return: The resolved AST node.
+        """
+        self.scopes = []
+        self.in_definition = isinstance(node, FunctionDefNode)
+        return self.visit(node)
+
+    def visit(self, node):
+        """
+        Resolve a given AST node.
+
+        :param node: The AST node to resolve.
+        :return: The resolved AST node.
+        :raises Exception: If the node type is not supported.
+        """
+        method_name = f'visit_{type(node).__name__}'
+        method = getattr(self, method_name, None)
+        if method is None:
+            raise Exception(f"No method to resolve node type {type(node).__name__}")
+        return method(node)
+
+    def visit_NumberNode(self, node):
+        return node
+
+    def visit_BooleanNode(self, node):
+        return node
+
+    def visit_IdentifierNode(self, node):
+        name = node.name
+        for depth, params in enumerate(reversed(self.scopes)):
+            if name in params:
+                slot = len(params) - 1 - params[::-1].index(name)  # The last duplicate parameter wins
+                return IdentifierNode(name, scope='local', depth=depth, slot=slot)
+        if self.in_definition or self.is_global(name):
+            return IdentifierNode(name, scope='global')
+        return IdentifierNode(name, scope='undefined')
+
+    def visit_BinaryOpNode(self, node):
+        return BinaryOpNode(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOpNode(self, node):
+        return UnaryOpNode(op=node.op, operand=self.visit(node.operand))
+
+    def visit_LambdaNode(self, node):
+        return LambdaNode(params=node.params, body=self.visit_body(node.params, node.body))
+
+    def visit_FunctionCallNode(self, node):
+        return FunctionCallNode(func=self.visit(node.func), args=[self.visit(arg) for arg in node.args])
+
+    def visit_FunctionDefNode(self, node):
+        return FunctionDefNode(name=node.name, params=node.params, body=self.visit_body(node.params, node.body))
+
+    def visit_IfElseNode(self, node):
+        return IfElseNode(condition=self.visit(node.condition), if_body=self.visit(node.if_body),
+                          else_body=self.visit(node.else_body))
+
+    def visit_ListNode(self, node):
+        return ListNode(elements=[self.visit(element) for element in node.elements])
+
+    def visit_IndexNode(self, node):
+        return IndexNode(sequence=self.visit(node.sequence), index=self.visit(node.index))
+
+    def visit_LetNode(self, node):
+        # The bound values form a new frame, whose parent is the frame of the enclosing scope
+        return LetNode(names=node.names, values=[self.visit(value) for value in node.values],
+                       body=self.visit_body(node.names, node.body))
+
+    def visit_InlineNode(self, node):
+        return InlineNode(name=node.name, function=node.function, body=self.visit(node.body),
+                          call=self.visit(node.call))
+
+    def visit_body(self, params, body):
+        """
+        Resolve the body of a lambda, function or LetNode inside a new scope.
+
+        :param params: The parameter names of the new scope.
+        :param body: The body AST node.
+        :return: The resolved body.
+        """
+        self.scopes.append(params)
+        try:
+            return self.visit(body)
+        finally:
+            self.scopes.pop()
+
+    def is_global(self, name):
+        """
+        Check whether a name is currently defined in the global environment.
+
+        :param name: The name to look up.
+        :return: True if the name is defined.
+        """
+        env = self.global_env
+        while env:
+            if name in env.variables:
+                return True
+            env = env.parent
+        return False
@@ -0,0 +1,147 @@
+import io
+import os
+import stat
+import sys
+
+DEFAULT_BUFFER_SIZE = 1 << 16  # Characters of output collected before each write
+
+
+# Outcome of one statement of a program: its value, or the exception it raised
+class Record:
+    __slots__ = ('line_number', 'line', 'value', 'error')
+
+    def __init__(self, line_number, line, value=None, error=None):
+        self.line_number = line_number  # 1-based number of the statement's line in its source
+        self.line = line  # Text of the line, without its line break
+        self.value = value  # Value of the statement, if it succeeded
+        self.error = error  # Exception raised while parsing or running the statement, or None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f'value={self.value!r}' if self.error is None else f'error={self.error!r}'
+        return f'Record({self.line_number}, {outcome})'
+
+
+def source_lines(source):
+    """
+    Iterate over the lines of a program without reading it into memory.
+
+    :param source: A file path, '-' for standard input, an open text file, or any iterable of lines.
+    :return: A generator of lines, without their line breaks.
+    """
+    if source == '-':
+        source = sys.stdin
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'r') as file:
+            yield from (line.rstrip('\r\n') for line in file)
+    else:
+        yield from (line.rstrip('\r\n') for line in source)
+
+
+def split_lines(source_code):
+    """
+    Split the source code of a program into lines the way source_lines splits a file, so
+    that a program read at once and a program streamed from a file have the same lines.
+
+    :param source_code: The source code, as a string.
+    :return: A generator of lines, without their line breaks.
+    """
+    return source_lines(io.StringIO(source_code, newline=None))
+
+
+def regular_file(source):
+    """
+    Tell whether a program is read from a regular file, rather than from a pipe, a terminal
+    or another stream whose lines may arrive over time.
+
+    :param source: A file path, or '-' for standard input.
+    :return: True if the source is a regular file.
+    """
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode if source == '-' else os.stat(source).st_mode
+    except (OSError, ValueError, AttributeError):
+        return False  # Missing files, and standard input replaced by an object without a descriptor
+    return stat.S_ISREG(mode)
+
+
+def run_statements(interpreter, statements, announce=None):
+    """
+    Run parsed statements one at a time, yielding the outcome of each.
+
+    :param interpreter: The Interpreter running the statements.
+    :param statements: An iterable of (line, AST node, error) tuples, one per line of the program,
+                       as returned by Interpreter.parse_program or Interpreter.parse_statement.
+    :param announce: A function called with each statement's line before it runs, or None.
+    :return: A generator of Records; comment and empty lines have none.
+    """
+    for line_number, (line, ast, error) in enumerate(statements, 1):
+        if ast is None and error is None:
+            continue  # Ignore comment and empty lines
+        if announce is not None:
+            announce(line)
+        if error is None:
+            try:
+                yield Record(line_number, line, interpreter.run(ast, optimized=True))
+                continue
+            except Exception as e:
+                error = e
+        yield Record(line_number, line, error=error)
+
+
+def run_lines(interpreter, source, announce=None):
+    """
+    Stream a program through an Interpreter: each line is parsed and run before the next one
+    is read, so memory use does not grow with the size of the program.
+
+    :param interpreter: The Interpreter running the program.
+    :param source: A file path, '-' for standard input, an open text file, or any iterable of lines.
+    :param announce: A function called with each statement's line before it runs, or None.
+    :return: A generator of Records, one per statement.
+    """
+    return run_statements(interpreter, map(interpreter.parse_statement, source_lines(source)), announce)
+
+
+def write_transcript(records, output=None, quiet=False, buffer_size=DEFAULT_BUFFER_SIZE, echo=True):
+    """
+    Write the "Executing: ..." transcript of a run, collecting the text of several statements
+    into each write.
+
+    :param records: The Records of the run.
+    :param output: The text stream written to (defaults to sys.stdout).
+    :param quiet: Whether nothing is written, so that only the returned counts remain.
+    :param buffer_size: The number of characters collected before a write; with 0, the text of
+                        each statement is written and flushed as soon as it runs.
+    :param echo: Whether the "Executing: ..." line of each statement is written; without it, only
+                 the results are, for runs that announce each statement before it runs.
+    :return: A pair (number of statements, number of statements that failed).
+    """
+    output = sys.stdout if output is None else output
+    count = errors = 0
+    pending = []  # Text not written yet
+    size = 0  # Number of characters in pending
+    try:
+        for record in records:
+            count += 1
+            if record.error is not None:
+                errors += 1
+            if quiet:
+                continue
+            text = f"{record.value if record.error is None else record.error}\n"
+            if echo:
+                text = f"Executing: {record.line}\n{text}"
+            pending.append(text)
+            size += len(text)
+            if size >= buffer_size:
+                output.write(''.join(pending))
+                pending.clear()
+                size = 0
+                if not buffer_size:
+                    output.flush()
+    finally:
+        if pending:
+            output.write(''.join(pending))
+        output.flush()
+    return count, errors
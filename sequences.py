@@ -0,0 +1,285 @@
+import sys
+from array import array
+from itertools import islice
+
+INT64_MIN = -2 ** 63  # Smallest value of the int64 arrays backing integer sequences
+INT64_MAX = 2 ** 63 - 1  # Largest value of the int64 arrays backing integer sequences
+MAX_RANGE_LENGTH = 10 ** 7  # Longest range built without an allocation limit to bound it
+
+
+def type_name(value):
+    """
+    Name the type of a value in error messages. Every function value is a 'function',
+    whichever backend implements it (closures, compiled functions, bytecode functions,
+    memoized functions and builtins), so that errors read the same in every mode.
+
+    :param value: The value.
+    :return: The type name.
+    """
+    if callable(value):
+        return 'function'
+    return type(value).__name__
+
+
+def storage(values):
+    """
+    Choose the compact backing store for a list of values.
+
+    :param values: A list of values.
+    :return: An array('q') if every value is an int (not a bool) that fits in 64 bits, else the list itself.
+    """
+    if values and set(map(type, values)) != {int}:
+        return values
+    try:
+        return array('q', values)
+    except OverflowError:
+        return values
+
+
+# Immutable sequence value of the language. Its items live in a backing store, an int64
+# array when every item is a plain int and a list otherwise, which may be longer than the
+# sequence and shared with other sequences: append and concatenation extend the store in
+# place when the sequence ends at the end of the store, so building a sequence one item
+# at a time is amortized O(1) per item, and copy it otherwise, so no sequence ever changes.
+class Sequence:
+    __slots__ = ('items', 'length')
+
+    def __init__(self, items, length=None):
+        self.items = items  # Backing array('q') or list, possibly shared and longer than the sequence
+        self.length = len(items) if length is None else length  # Number of items of this sequence
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Build a sequence holding a list of values.
+
+        :param values: A list of values, owned by the sequence from now on.
+        :return: The Sequence.
+        """
+        return cls(storage(values))
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        # Bounded by the length, since appending to the sequence while iterating extends its store
+        return islice(self.items, self.length)
+
+    def values(self):
+        """
+        Get the items of the sequence in a store of their own.
+
+        :return: A copy of the items, as an array('q') or a list.
+        """
+        return self.items[:self.length]
+
+    def __getitem__(self, index):
+        """
+        Get an item, with the checks and negative indexes of the language's indexing operator.
+
+        :param index: The index, counted from the end if negative.
+        :return: The item.
+        :raises TypeError: If the index is not an int.
+        :raises IndexError: If the index is out of range.
+        """
+        if type(index) is not int:
+            raise TypeError(f"Sequence indexes must be integers, not '{type_name(index)}'")
+        position = index + self.length if index < 0 else index
+        if not 0 <= position < self.length:
+            raise IndexError(f"Index {index} out of range for a sequence of length {self.length}")
+        return self.items[position]
+
+    def append(self, value):
+        """
+        Build the sequence with one more item at the end.
+
+        :param value: The new item.
+        :return: The new Sequence.
+        """
+        items = self.items
+        if self.length != len(items):
+            items = items[:self.length]  # Another sequence already extended the shared store
+        if type(items) is array and (type(value) is not int or not INT64_MIN <= value <= INT64_MAX):
+            items = items.tolist()
+        items.append(value)
+        return Sequence(items, self.length + 1)
+
+    def concat(self, other):
+        """
+        Build the concatenation of this sequence and another one.
+
+        :param other: The Sequence whose items come last.
+        :return: The new Sequence.
+        """
+        if not other.length:
+            return self
+        if not self.length:
+            return other
+        items = self.items
+        if self.length != len(items):
+            items = items[:self.length]  # Another sequence already extended the shared store
+        if type(items) is array and type(other.items) is not array:
+            items = items.tolist()
+        items.extend(other.items if other.length == len(other.items) else other.values())
+        return Sequence(items, self.length + other.length)
+
+    def __eq__(self, other):
+        if type(other) is not Sequence or self.length != other.length:
+            return False
+        if type(self.items) is array and type(other.items) is array:
+            return self.values() == other.values()
+        # Items of different types differ, as with the == operator on plain values
+        return all(type(left) is type(right) and left == right for left, right in zip(self, other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"[{', '.join(map(repr, self))}]"
+
+
+def index_value(sequence, index):
+    """
+    Apply the indexing operator of the language.
+
+    :param sequence: The indexed value.
+    :param index: The index.
+    :return: The item.
+    :raises TypeError: If the value is not a sequence or the index not an int.
+    :raises IndexError: If the index is out of range.
+    """
+    if type(sequence) is not Sequence:
+        raise TypeError(f"Cannot index a value of type '{type_name(sequence)}'")
+    return sequence[index]
+
+
+# Function value implemented in Python and bound in the global environment of each Interpreter
+class Builtin:
+    __slots__ = ('name', 'function', 'arities')
+
+    def __init__(self, name, function, arities):
+        self.name = name  # Name of the builtin
+        self.function = function  # Python function implementing it
+        self.arities = arities  # Accepted numbers of arguments
+
+    def __call__(self, *args):
+        if len(args) not in self.arities:
+            expected = ' or '.join(map(str, self.arities))
+            raise Exception(f"Error: Function '{self.name}' expected {expected} arguments but got {len(args)}.")
+        return self.function(*args)
+
+    def __repr__(self):
+        return f'<builtin {self.name}>'
+
+
+def check_sequence(name, value):
+    """
+    Check that a builtin was given a sequence.
+
+    :param name: The name of the builtin.
+    :param value: The argument.
+    :raises TypeError: If the argument is not a Sequence.
+    """
+    if type(value) is not Sequence:
+        raise TypeError(f"{name} expects a sequence, not '{type_name(value)}'")
+
+
+def check_function(value):
+    """
+    Check that a builtin was given a function.
+
+    :param value: The argument.
+    :raises Exception: If the argument cannot be called.
+    """
+    if not callable(value):
+        raise Exception(f"Error: Attempt to call a non-function value '{value}'.")
+
+
+def make_builtins(budget=None):
+    """
+    Build the builtin functions of the language. map, filter and reduce loop in Python
+    and call their function argument for each item.
+
+    :param budget: The Budget that each call of a function argument accounts to, or None.
+    :return: A dictionary mapping names to Builtins.
+    """
+    def caller(function):
+        # Calls of function arguments are calls of the program, so they use its budget
+        if budget is None:
+            return function
+
+        def call(*args):
+            budget.call()
+            try:
+                return function(*args)
+            finally:
+                budget.leave()
+
+        return call
+
+    def range_builtin(*args):
+        for arg in args:
+            if not isinstance(arg, int):
+                raise TypeError(f"range expects integers, not '{type_name(arg)}'")
+        if len(args) == 3 and args[2] == 0:
+            raise ValueError("range step must not be zero")
+        numbers = range(*args)
+        try:
+            length = len(numbers)
+        except OverflowError:
+            raise ValueError(f"range is too long: more than {sys.maxsize} items") from None
+        if budget is not None and budget.max_allocations is not None:
+            budget.allocate(length)  # Each item counts as an allocation, charged before the array is built
+        elif length > MAX_RANGE_LENGTH:
+            raise ValueError(f"range is too long: more than {MAX_RANGE_LENGTH} items")
+        if not numbers or (INT64_MIN <= min(numbers[0], numbers[-1]) and max(numbers[0], numbers[-1]) <= INT64_MAX):
+            return Sequence(array('q', numbers))
+        return Sequence(list(numbers))
+
+    def len_builtin(sequence):
+        check_sequence('len', sequence)
+        return sequence.length
+
+    def map_builtin(function, sequence):
+        check_function(function)
+        check_sequence('map', sequence)
+        call = caller(function)
+        return Sequence.from_values([call(item) for item in sequence])
+
+    def filter_builtin(function, sequence):
+        check_function(function)
+        check_sequence('filter', sequence)
+        call = caller(function)
+        kept = [item for item in sequence if call(item)]
+        return Sequence(array('q', kept) if type(sequence.items) is array else kept)
+
+    def reduce_builtin(function, sequence, *initial):
+        check_function(function)
+        check_sequence('reduce', sequence)
+        call = caller(function)
+        items = iter(sequence)
+        if initial:
+            accumulator = initial[0]
+        elif sequence.length:
+            accumulator = next(items)
+        else:
+            raise TypeError("reduce of an empty sequence with no initial value")
+        for item in items:
+            accumulator = call(accumulator, item)
+        return accumulator
+
+    def append_builtin(sequence, value):
+        check_sequence('append', sequence)
+        return sequence.append(value)
+
+    return {
+        'range': Builtin('range', range_builtin, (1, 2, 3)),
+        'len': Builtin('len', len_builtin, (1,)),
+        'map': Builtin('map', map_builtin, (2,)),
+        'filter': Builtin('filter', filter_builtin, (2,)),
+        'reduce': Builtin('reduce', reduce_builtin, (2, 3)),
+        'append': Builtin('append', append_builtin, (2,)),
+    }
@@ -0,0 +1,360 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import zlib
+
+from my_parser import ImportNode
+from sequences import Sequence
+
+# Protocol: one JSON object per line in each direction.
+#   Request:  {"id": 1, "source": "fact(5)", "session": "alice", "timeout": 2.0}
+#             {"id": 2, "op": "reset", "session": "alice"}
+#   Response: {"id": 1, "ok": true, "result": 120}
+#             {"id": 1, "ok": false, "error": {"type": "TypeError", "message": "..."}}
+# Statements in "source" are separated by newlines; the result is the value of the last one.
+# Requests with the same "session" share global definitions and run in order; requests
+# without one run in a fresh global environment. Each worker runs the prelude once, and every
+# new global environment starts as a copy of its definitions, so prelude functions call the
+# prelude's definitions, as functions of an imported module do. A "timeout" that is not a
+# positive number of seconds fails with the error type "ValueError". With --fuel, --max-depth or --max-allocations,
+# a statement over a limit fails with the error type "FuelExhausted", "DepthLimitExceeded" or
+# "AllocationLimitExceeded" without restarting its worker. Client programs may only import
+# modules when the server has an import root: paths are then relative to the root and must
+# stay inside it. A worker that dies fails its request with the error type "WorkerError".
+
+DEFAULT_TIMEOUT = 5.0  # Seconds a request may run before its worker is restarted
+
+
+def encode_value(value):
+    """
+    Convert a value of the language into a JSON-compatible value.
+
+    :param value: An int, a bool, a sequence, a function value, or the message returned by a definition.
+    :return: The number, boolean, string or list, or {"function": repr} for functions.
+    """
+    if isinstance(value, (bool, int, str)) or value is None:
+        return value
+    if isinstance(value, Sequence):
+        return [encode_value(item) for item in value]
+    return {'function': repr(value)}
+
+
+def encode_error(error):
+    """
+    Convert an exception into a structured error.
+
+    :param error: The exception.
+    :return: A dictionary with the exception type and message.
+    """
+    return {'type': type(error).__name__, 'message': str(error)}
+
+
+# State of a worker process: an Interpreter holding the prelude and one Interpreter per session
+class WorkerState:
+    def __init__(self, options, prelude, import_root=None):
+        """
+        Initialize the WorkerState, running the prelude once.
+
+        :param options: Keyword arguments of the Interpreter.
+        :param prelude: Source code whose definitions every new global environment starts with, or None.
+        :param import_root: The directory client programs import modules from, or None to reject imports.
+        """
+        from interpreter import Interpreter
+
+        self.interpreter_class = Interpreter  # Imported here, in the worker process
+        self.options = options  # Keyword arguments of the Interpreter
+        # Real path of the directory client programs import modules from, or None
+        self.import_root = os.path.realpath(import_root) if import_root is not None else None
+        self.base = Interpreter(**options)  # Warm interpreter holding the prelude, copied for each environment
+        self.prelude_error = None  # The error raised by the prelude, reported by every request
+        try:
+            for _, ast, error in self.base.parse_program(prelude or ''):
+                if error is not None:
+                    raise error
+                if ast is not None:
+                    self.base.run(ast, optimized=True)
+        except Exception as e:
+            self.prelude_error = e
+        self.sessions = {}  # Maps session names to their Interpreter
+
+    def session(self, name):
+        """
+        Get the Interpreter of a session, creating it from a copy of the prelude's global
+        environment if needed.
+
+        :param name: The session name, or None for a fresh one.
+        :return: The Interpreter.
+        """
+        if self.prelude_error is not None:
+            raise self.prelude_error
+        interpreter = self.sessions.get(name) if name is not None else None
+        if interpreter is None:
+            # The prelude's functions account to the budget of the interpreter that compiled them
+            interpreter = self.interpreter_class(**self.options, importer=self.base)
+            interpreter.global_env.variables.update(self.base.global_env.variables)
+            interpreter.directory = interpreter.import_root = self.import_root
+            if name is not None:
+                self.sessions[name] = interpreter
+        return interpreter
+
+    def handle(self, request):
+        """
+        Handle one request.
+
+        :param request: The decoded request.
+        :return: The response, without its id.
+        """
+        if request.get('op', 'eval') == 'reset':
+            self.sessions.pop(request.get('session'), None)
+            return {'ok': True, 'result': None}
+        try:
+            interpreter = self.session(request.get('session'))
+            result = None
+            for line in str(request.get('source', '')).splitlines():
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    ast = interpreter.parse(line)
+                    if type(ast) is ImportNode and self.import_root is None:
+                        raise Exception("Error: import is not allowed without the server's --import-root")
+                    result = interpreter.run(ast)
+            return {'ok': True, 'result': encode_value(result)}
+        except Exception as e:
+            return {'ok': False, 'error': encode_error(e)}
+
+
+def worker_main(connection, options, prelude, import_root=None):
+    """
+    Serve requests sent through a pipe (the main function of a worker process).
+
+    :param connection: The worker's end of the pipe.
+    :param options: Keyword arguments of the Interpreter.
+    :param prelude: Source code run in every new session, or None.
+    :param import_root: The directory client programs import modules from, or None to reject imports.
+    """
+    import sys
+
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    state = WorkerState(options, prelude, import_root)
+    connection.send('ready')
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        connection.send(state.handle(request))
+
+
+# Handle on a worker process, running one request at a time
+class Worker:
+    def __init__(self, context, options, prelude, import_root=None):
+        """
+        Initialize the Worker.
+
+        :param context: The multiprocessing context used to start processes.
+        :param options: Keyword arguments of the Interpreter.
+        :param prelude: Source code run in every new session, or None.
+        :param import_root: The directory client programs import modules from, or None to reject imports.
+        """
+        self.context = context  # Multiprocessing context
+        self.options = options  # Keyword arguments of the Interpreter
+        self.prelude = prelude  # Source code run in every new session
+        self.import_root = import_root  # Directory client programs import modules from, or None
+        self.lock = asyncio.Lock()  # Held while a request is running
+        self.pending = 0  # Number of requests queued or running on this worker
+        self.process = None  # The worker process
+        self.connection = None  # The server's end of the pipe
+
+    async def start(self):
+        """
+        Start the worker process and wait until it has loaded the prelude.
+        """
+        self.connection, child = self.context.Pipe()
+        self.process = self.context.Process(target=worker_main, args=(child, self.options, self.prelude,
+                                                                        self.import_root), daemon=True)
+        self.process.start()
+        child.close()
+        await asyncio.to_thread(self.connection.recv)
+
+    def stop(self):
+        """
+        Kill the worker process.
+        """
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+
+    async def request(self, request, timeout):
+        """
+        Run a request on the worker, restarting the worker if it times out or dies.
+
+        :param request: The decoded request.
+        :param timeout: The number of seconds the request may run.
+        :return: The response, without its id.
+        """
+        self.pending += 1
+        try:
+            async with self.lock:
+                try:
+                    self.connection.send(request)
+                    ready = await asyncio.to_thread(self.connection.poll, timeout)
+                    if ready:
+                        return self.connection.recv()
+                    message = f'request exceeded {timeout} seconds; the sessions of its worker were reset'
+                except (EOFError, OSError):
+                    # The process died, while running the request or before it was sent
+                    ready = True
+                    message = 'worker process exited; its sessions were reset'
+                self.stop()
+                await self.start()
+                return {'ok': False, 'error': {'type': 'Timeout' if not ready else 'WorkerError',
+                                               'message': message}}
+        finally:
+            self.pending -= 1
+
+
+# JSON-lines evaluation server backed by a pool of warm worker processes
+class Server:
+    def __init__(self, workers=4, prelude=None, timeout=DEFAULT_TIMEOUT, import_root=None, **options):
+        """
+        Initialize the Server.
+
+        :param workers: The number of worker processes.
+        :param prelude: Source code (e.g. shared definitions) loaded in every session.
+        :param timeout: The default number of seconds a request may run.
+        :param import_root: The directory client programs import modules from, or None to reject imports.
+        :param options: Keyword arguments of the Interpreter used by the workers.
+        """
+        context = multiprocessing.get_context('spawn')  # Forking a process with running threads is unsafe
+        self.workers = [Worker(context, options, prelude, import_root) for _ in range(workers)]  # Worker pool
+        self.timeout = timeout  # Default request timeout in seconds
+
+    async def start(self):
+        """
+        Start every worker process.
+        """
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+
+    def stop(self):
+        """
+        Stop every worker process.
+        """
+        for worker in self.workers:
+            worker.stop()
+
+    def route(self, session):
+        """
+        Pick the worker for a request. Every request of a session goes to the same worker,
+        which holds its global environment; other requests go to the least busy worker.
+
+        :param session: The session name, or None.
+        :return: The Worker.
+        """
+        if session is not None:
+            return self.workers[zlib.crc32(str(session).encode()) % len(self.workers)]
+        return min(self.workers, key=lambda worker: worker.pending)
+
+    async def handle(self, line):
+        """
+        Handle one request line.
+
+        :param line: The JSON-encoded request.
+        :return: The response.
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a JSON object')
+            request_id = request.get('id')
+            timeout = request.get('timeout', self.timeout)
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not 0 < timeout < math.inf:
+                raise ValueError('"timeout" must be a positive number of seconds')
+        except ValueError as e:
+            return {'id': request_id, 'ok': False, 'error': encode_error(e)}
+        response = await self.route(request.get('session')).request(request, timeout)
+        return {'id': request.get('id'), **response}
+
+    async def client(self, reader, writer):
+        """
+        Serve a connection. Requests are handled concurrently, so responses may arrive in a
+        different order than the requests; the "id" field matches them.
+
+        :param reader: The stream reader of the connection.
+        :param writer: The stream writer of the connection.
+        """
+        tasks = set()
+
+        async def respond(line):
+            response = await self.handle(line)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=7878, path=None):
+        """
+        Start the workers and serve connections forever.
+
+        :param host: The TCP host to listen on.
+        :param port: The TCP port to listen on.
+        :param path: A Unix socket path to listen on instead of TCP.
+        """
+        await self.start()
+        try:
+            if path is not None:
+                server = await asyncio.start_unix_server(self.client, path=path)
+            else:
+                server = await asyncio.start_server(self.client, host, port)
+            async with server:
+                print(f"Serving on {path or f'{host}:{port}'} with {len(self.workers)} workers", flush=True)
+                await server.serve_forever()
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from interpreter import MODES
+
+    arg_parser = argparse.ArgumentParser(description='Serve lambda evaluation requests as JSON lines.')
+    arg_parser.add_argument('--host', default='127.0.0.1', help='TCP host to listen on')
+    arg_parser.add_argument('--port', type=int, default=7878, help='TCP port to listen on')
+    arg_parser.add_argument('--unix', help='Unix socket path to listen on instead of TCP')
+    arg_parser.add_argument('--workers', type=int, default=4, help='number of worker processes')
+    arg_parser.add_argument('--prelude', help='.lambda file of definitions loaded in every session')
+    arg_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                            help='default seconds a request may run')
+    arg_parser.add_argument('--import-root',
+                            help='directory client programs may import modules from (default: imports are rejected)')
+    arg_parser.add_argument('--mode', choices=MODES, default='compiled', help='interpreter mode of the workers')
+    arg_parser.add_argument('--fuel', type=int, help='maximum number of function calls per statement')
+    arg_parser.add_argument('--max-depth', type=int, help='maximum number of nested calls')
+    arg_parser.add_argument('--max-allocations', type=int,
+                            help='maximum number of closures and environments created per statement')
+    args = arg_parser.parse_args()
+
+    prelude_source = None
+    if args.prelude:
+        with open(args.prelude, 'r') as prelude_file:
+            prelude_source = prelude_file.read()
+    evaluation_server = Server(args.workers, prelude_source, args.timeout, args.import_root, mode=args.mode,
+                               fuel=args.fuel, max_depth=args.max_depth, max_allocations=args.max_allocations)
+    try:
+        asyncio.run(evaluation_server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,41 @@
-from interpreter import Interpreter
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+from interpreter import MODES, Interpreter
+
+failures = []  # Names of the checks whose result was not the expected one
+
+def check(test_name, actual, expected):
+    print(f"Checking: {test_name}")
+    if actual == expected:
+        print(f"Passed: {actual!r}")
+    else:
+        print(f"Failed: expected {expected!r} but got {actual!r}")
+        failures.append(test_name)
+    print()
+
+def outcome(code, **options):
+    # The value of the last line of the program, or the error of the first line that fails
+    interpreter = Interpreter(**options)
+    try:
+        for line in code.split('\n'):
+            result = interpreter.run(interpreter.parse(line))
+        return result
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def outcome_of(function):
+    # The result of a Python call, or its error
+    try:
+        return function()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
 
 def run_test(test_name, code):
     print(f"Running test: {test_name}")
@@ -13,6 +50,27 @@ def run_test(test_name, code):
         print(f"Error: {e}")
     print()
 
+def run_cross_mode_test(test_name, code, **options):
+    print(f"Running test in every mode: {test_name}")
+    print(f"Code: {code}")
+    outputs = {}
+    for mode in MODES:
+        if options and mode == 'python':
+            continue  # Evaluation limits are not supported in 'python' mode
+        try:
+            interpreter = Interpreter(mode=mode, **options)
+            for line in code.split('\n'):
+                result = interpreter.run(interpreter.parse(line))
+            outputs[mode] = f"Output: {result}"
+        except Exception as e:
+            outputs[mode] = f"Error: {e}"
+    if len(set(outputs.values())) == 1:
+        print(outputs[MODES[0]])  # Every mode gave the same result or error
+    else:
+        for mode, output in outputs.items():
+            print(f"{mode}: {output}")
+    print()
+
 def run_lambda_file(file_path):
     print(f"Running test: {file_path}")
     try:
@@ -22,6 +80,681 @@ def run_lambda_file(file_path):
         print(f"Error: {e}")
     print()
 
+def check_cek_machine():
+    # Non-tail recursion deeper than Python's stack runs on the heap-allocated continuation stack
+    total = "def total(n): if n == 0: 0 else: n + total(n - 1)"
+    check("CEK Deep Recursion", outcome(f"{total}\ntotal(100000)", mode='cek'), 5000050000)
+    check("CEK Ackermann", outcome("def ack(m, n): if m == 0: n + 1 else: if n == 0: ack(m - 1, 1) "
+                                   "else: ack(m - 1, ack(m, n - 1))\nack(2, 3)", mode='cek'), 9)
+    check("CEK Closures Called From Builtins",
+          repr(outcome(f"{total}\nmap(lambda x: total(x), [3, 4])", mode='cek')), "[6, 10]")
+    check("CEK Tail Loop", outcome("def count(n): if n == 0: 0 else: count(n - 1)\ncount(1000000)", mode='cek'), 0)
+
+def run_file(file_path, jobs=1, **options):
+    # The transcript printed by execute_file, and the Interpreter that ran the file
+    interpreter = Interpreter(**options)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter.execute_file(file_path, jobs)
+    return output.getvalue(), interpreter
+
+def check_program_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, 'program.lambda')
+        cache_dir = os.path.join(directory, 'cache')
+        with open(program, 'w') as file:
+            file.write("def f(x): x + 1\nf(1)\n")
+        first, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Cache Miss On First Run", (interpreter.program_cache.hits, interpreter.program_cache.misses), (0, 1))
+        second, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Cache Hit On Second Run", (interpreter.program_cache.hits, interpreter.program_cache.misses), (1, 0))
+        check("Cache Hit Prints The Same Transcript", second, first)
+        with open(program, 'w') as file:
+            file.write("def f(x): x + 100\nf(1)\n")
+        edited, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Cache Invalidated By An Edit", (interpreter.program_cache.misses, edited.splitlines()[-1]), (1, '101'))
+        _, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Cache Hit After An Edit", (interpreter.program_cache.hits, interpreter.program_cache.misses), (1, 0))
+        for name in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, name), 'wb') as file:
+                file.write(b'not a cache entry')
+        corrupt, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Corrupt Cache Entry Rebuilt", (interpreter.program_cache.misses, corrupt), (1, edited))
+        interpreter = Interpreter(cache=True, cache_dir=cache_dir)
+        interpreter.program_cache.version = '0.0.0'
+        with redirect_stdout(io.StringIO()):
+            interpreter.execute_file(program)
+        check("Cache Entry Of Another Version Rebuilt", interpreter.program_cache.misses, 1)
+
+def check_vectorize():
+    try:
+        import numpy as np
+    except ImportError:
+        check("Vectorize Without NumPy", outcome_of(lambda: Interpreter().vectorize("lambda x: x")),
+              "ImportError: Interpreter.vectorize requires NumPy")
+        return
+    interpreter = Interpreter()
+    source = "lambda x, y: if y == 0: x * 4611686018427387904 else: (x + y) / y"
+    vectorized = interpreter.vectorize(source)
+    scalar = interpreter.run(interpreter.parse(source))
+    xs, ys = np.arange(-20, 20), np.arange(40) % 7
+    check("Vectorized Rows Match Scalar Calls", vectorized(xs, ys).tolist(),
+          [scalar(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+    check("Vectorized Rows That Overflow Run In The Interpreter", vectorized.scalar_rows > 0, True)
+    above = interpreter.vectorize("lambda x, y: ((x + y) * 2 > 10) && (x < y)")
+    check("Vectorized Booleans", above(np.arange(10), 7).tolist(),
+          [((x + 7) * 2 > 10) and x < 7 for x in range(10)])
+    divide = interpreter.vectorize("lambda x: 10 / x")
+    check("Vectorized First Failing Row Raises", outcome_of(lambda: divide(np.array([5, 0, 2]))),
+          "ZeroDivisionError: division by zero")
+
+def check_parallel():
+    # Parallel runs print the same transcript as sequential ones
+    sequential, _ = run_file("test.lambda")
+    check("Parallel test.lambda", run_file("test.lambda", jobs=2)[0], sequential)
+    with tempfile.TemporaryDirectory() as directory:
+        prelude = os.path.join(directory, 'prelude.lambda')
+        program = os.path.join(directory, 'program.lambda')
+        with open(prelude, 'w') as file:
+            file.write("def helper(x): x + 1\ndef twice(x): helper(x) * 2\n")
+        with open(program, 'w') as file:
+            file.write("twice(1)\ndef helper(x): x + 100\ntwice(1)\nhelper(1) / 0\nmissing(1)\ntwice(2)\n")
+        for options in ({}, {'mode': 'tree'}, {'optimize': True}):
+            sequential, _ = run_file(program, prelude=prelude, **options)
+            check(f"Parallel Prelude Redefinition {options}", run_file(program, jobs=3, prelude=prelude, **options)[0],
+                  sequential)
+        check("Parallel Prelude Redefinition Result", sequential.splitlines()[5], '202')
+
+def check_benchmark_harness():
+    from benchmarks.harness import compare, run_workload
+
+    result = run_workload("def f(x): x * 2\nf(21)\nmissing(1)", 'compiled', 0, 1)
+    check("Benchmark Workload Counts", (result['statements'], result['errors']), (3, 1))
+    check("Benchmark Workload Phases", sorted(result['phases']), ['evaluate', 'lex', 'parse'])
+
+    def report(evaluate):
+        phases = {phase: {'median': 0.5} for phase in ('lex', 'parse')}
+        phases['evaluate'] = {'median': evaluate}
+        return {'results': {'fib/compiled': {'phases': phases}}}
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for name, evaluate in (('old', 1.0), ('same', 1.05), ('slower', 1.5)):
+            paths[name] = os.path.join(directory, f'{name}.json')
+            with open(paths[name], 'w') as file:
+                json.dump(report(evaluate), file)
+        for new, expected in (('same', 0), ('slower', 1)):
+            args = argparse.Namespace(old=paths['old'], new=paths[new], threshold=0.1, min_time=0.001)
+            with redirect_stdout(io.StringIO()):
+                status = compare(args)
+            check(f"Benchmark Comparison With {new.title()} Results", status, expected)
+
+def check_profiler():
+    from profiler import ProfilingInterpreter
+
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, 'program.lambda')
+        with open(program, 'w') as file:
+            file.write("def fact(n): if n <= 1: 1 else: n * fact(n - 1)\nfact(5)\n  (lambda x: fact(x))(3)\n")
+        interpreter = ProfilingInterpreter()
+        with redirect_stdout(io.StringIO()):
+            interpreter.execute_file(program)
+        functions = interpreter.profiler.functions
+        check("Profile Calls And Recursion Depth", (functions['fact'].calls, functions['fact'].max_depth), (8, 5))
+        check("Profile Lambda Label", functions['lambda@3:4'].calls, 1)
+        check("Profile Collapsed Stacks", '<toplevel>;lambda@3:4;fact;fact' in interpreter.profiler.stacks, True)
+        collapsed = os.path.join(directory, 'program.folded')
+        interpreter.profiler.write_collapsed(collapsed)
+        with open(collapsed) as file:
+            paths = {line.rsplit(' ', 1)[0] for line in file}
+        check("Profile Collapsed Stacks Written", paths <= set(interpreter.profiler.stacks) and bool(paths), True)
+
+def check_server():
+    from server import Server
+
+    async def session(server, requests):
+        # The response of each request, sent one after another
+        responses = []
+        for request in requests:
+            if request == 'kill':
+                server.workers[0].process.kill()
+                server.workers[0].process.join()
+                continue
+            response = await server.handle(json.dumps(request))
+            responses.append(response['result'] if response['ok'] else response['error']['type'])
+        return responses
+
+    async def serve(requests, prelude="def double(x): x * 2", **options):
+        server = Server(1, prelude, **options)
+        await server.start()
+        try:
+            return await session(server, requests)
+        finally:
+            server.stop()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'lib.lambda'), 'w') as file:
+            file.write("def triple(x): x * 3\n")
+        responses = asyncio.run(serve([
+            {'id': 1, 'session': 'a', 'source': "def f(x): double(x) + 1"},
+            {'id': 2, 'session': 'a', 'source': "f(20)"},
+            {'id': 3, 'source': "f(20)"},
+            {'id': 4, 'source': "def spin(n): spin(n + 1)\nspin(0)", 'timeout': 0.5},
+            {'id': 5, 'session': 'a', 'source': "double(4)"},
+            {'id': 6, 'source': "1 +", 'timeout': 0},
+            'kill',
+            {'id': 7, 'source': "double(5)"},
+            {'id': 8, 'source': "double(6)"},
+            {'id': 9, 'source': 'import "lib.lambda"\ntriple(2)'},
+        ], timeout=5))
+        check("Server Sessions, Timeouts And Crashes", responses,
+              ['Function created!', 41, 'Exception', 'Timeout', 8, 'ValueError', 'WorkerError', 12, 'Exception'])
+        responses = asyncio.run(serve([
+            {'id': 1, 'source': 'import "lib.lambda"\ntriple(2)'},
+            {'id': 2, 'source': f'import "{os.path.abspath("test.lambda")}"'},
+        ], import_root=directory))
+        check("Server Imports Confined To The Import Root", responses, [6, 'Exception'])
+
+    # A prelude that does not parse is reported by every request
+    async def prelude_errors(prelude, sources):
+        server = Server(1, prelude)
+        await server.start()
+        try:
+            responses = [await server.handle(json.dumps({'id': id, 'source': source}))
+                         for id, source in enumerate(sources)]
+            return [response['error']['message'] for response in responses]
+        finally:
+            server.stop()
+
+    messages = asyncio.run(prelude_errors("def double(x): x * 2\ndef broken(x) x + 1", ["1 + 1", "broken(1)"]))
+    check("Server Prelude Syntax Error", messages,
+          ["Unexpected token: ('ID', 'x'), expected: COLON at position 5"] * 2)
+
+def check_limits():
+    limited_modes = [mode for mode in MODES if mode != 'python']
+    count = "def count(n): if n == 0: 0 else: count(n - 1)"
+    total = "def total(n): if n == 0: 0 else: n + total(n - 1)"
+    adders = "def adders(n): if n == 0: 0 else: (lambda x: x + n)(adders(n - 1))"
+    cases = [
+        ("Fuel", f"{count}\ncount(4)", {'fuel': 5}, 0),
+        ("Fuel Exhausted", f"{count}\ncount(10)", {'fuel': 5},
+         "FuelExhausted: Error: Evaluation ran out of fuel after 5 calls"),
+        ("Depth", f"{total}\ntotal(9)", {'max_depth': 10}, 45),
+        ("Depth Exceeded", f"{total}\ntotal(20)", {'max_depth': 10},
+         "DepthLimitExceeded: Error: Maximum call depth of 10 exceeded"),
+        ("Allocations", f"{adders}\nadders(10)", {'max_allocations': 100}, 55),  # Thunks count as allocations in lazy mode
+        ("Allocations Exceeded", f"{adders}\nadders(100)", {'max_allocations': 50},
+         "AllocationLimitExceeded: Error: Evaluation created more than 50 closures and environments"),
+    ]
+    for name, code, options, expected in cases:
+        results = {mode: outcome(code, mode=mode, **options) for mode in limited_modes}
+        check(f"Limit: {name}", results, dict.fromkeys(limited_modes, expected))
+
+    # A failed evaluation leaves no call in progress, and the next one gets the whole budget again
+    for mode in limited_modes:
+        interpreter = Interpreter(mode=mode, max_depth=10)
+        interpreter.run(interpreter.parse(total))
+        error = outcome_of(lambda: interpreter.run(interpreter.parse("total(20)")))
+        check(f"Limit Reset After An Error ({mode})",
+              (error.split(':')[0], interpreter.budget.depth, interpreter.run(interpreter.parse("total(5)"))),
+              ('DepthLimitExceeded', 0, 15))
+    check("Limits Rejected In Python Mode", outcome_of(lambda: Interpreter(mode='python', fuel=5)).split(':')[0],
+          'ValueError')
+
+def check_runner():
+    from runner import run_lines, write_transcript
+
+    def summary(records):
+        return [(record.line_number, record.value if record.ok else type(record.error).__name__)
+                for record in records]
+
+    program = "# Squares\ndef square(x): x * x\n\nsquare(7)\nsquare(\nsquare(1 / 0)\nsquare(8)\n"
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(program)
+    try:
+        records = summary(run_lines(Interpreter(), '-'))
+    finally:
+        sys.stdin = stdin
+    check("Runner Records From Standard Input", records,
+          [(2, 'Function created!'), (4, 49), (5, 'Exception'), (6, 'ZeroDivisionError'), (7, 64)])
+
+    # Lines are read only when the next record is requested
+    read = []
+    def lines():
+        for line in program.split('\n'):
+            read.append(line)
+            yield line
+    records = run_lines(Interpreter(), lines())
+    first = next(records)
+    check("Runner Reads Lazily", (first.line_number, first.value, len(read)), (2, 'Function created!', 2))
+    output = io.StringIO()
+    counts = write_transcript(records, output, buffer_size=0)
+    check("Runner Transcript Of The Remaining Statements",
+          (counts, output.getvalue().splitlines()[:2], len(read)),
+          ((4, 2), ['Executing: square(7)', '49'], len(program.split('\n'))))
+
+    from cache import MAX_PROGRAM_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'cache')
+        program = os.path.join(directory, 'program.lambda')
+        with open(program, 'w', newline='') as file:
+            file.write("def f(x): x + 1\rf(1)\r\nf(2)\n# A comment\x85f(9)\nf(3)\x0c\n")
+        streamed, _ = run_file(program)
+        cached, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Cached And Streamed Programs Split Lines Alike",
+              (interpreter.program_cache.misses, cached), (1, streamed))
+        check("Streamed Lines", streamed.count('Executing:'), 4)
+
+        # Programs too large to cache are streamed, without writing a cache entry
+        with open(program, 'a') as file:
+            file.write(f"# {'-' * MAX_PROGRAM_SIZE}\nf(4)\n")
+        cache_dir = os.path.join(directory, 'large')
+        large, interpreter = run_file(program, cache=True, cache_dir=cache_dir)
+        check("Large Program Streamed Past The Cache",
+              (interpreter.program_cache.hits, interpreter.program_cache.misses, os.path.exists(cache_dir),
+               large.splitlines()[-1]), (0, 0, False, '5'))
+
+def check_prelude():
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'cache')
+        prelude = os.path.join(directory, 'prelude.lambda')
+        os.mkdir(os.path.join(directory, 'lib'))
+        with open(os.path.join(directory, 'lib', 'square.lambda'), 'w') as file:
+            file.write("def square(x): x * x\n")
+        with open(prelude, 'w') as file:
+            file.write('import "lib/square.lambda"\ndef offset(x): x\ndef offset(x): x + 1\n'
+                       'def shifted(x): offset(square(x))\n')
+
+        def load(mode='compiled'):
+            # The cache counters of a new interpreter loading the prelude, and a call of its definitions
+            interpreter = Interpreter(mode=mode, prelude=prelude, cache=True, cache_dir=cache_dir)
+            cache = interpreter.program_cache
+            return cache.hits, cache.misses, interpreter.run(interpreter.parse("shifted(3)"))
+
+        check("Prelude Loaded From Source", load(), (0, 1, 10))
+        check("Prelude Restored From Its Snapshot", {mode: load(mode) for mode in ('compiled', 'tree', 'vm')},
+              dict.fromkeys(('compiled', 'tree', 'vm'), (1, 0, 10)))
+        with open(prelude, 'a') as file:
+            file.write("def offset(x): x + 2\n")
+        check("Edited Prelude Reloaded From Source", load(), (0, 1, 11))
+        check("Edited Prelude Restored From Its Snapshot", load(), (1, 0, 11))
+
+def check_imports():
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, 'lib'))
+        modules = {
+            'lib/shapes.lambda': 'import "numbers.lambda"\ndef area(w, h): times(w, h)\n',
+            'lib/numbers.lambda': 'def times(a, b): a * b\n',
+            'a.lambda': 'import "b.lambda"\ndef f(x): x\n',
+            'b.lambda': 'import "a.lambda"\ndef g(x): x\n',
+        }
+        for name, source in modules.items():
+            with open(os.path.join(directory, name), 'w') as file:
+                file.write(source)
+
+        def imported(code, mode):
+            interpreter = Interpreter(mode=mode)
+            interpreter.directory = directory
+            return outcome_of(lambda: [interpreter.run(interpreter.parse(line)) for line in code.split('\n')][-1])
+
+        # Imports inside a module are relative to the module's own directory
+        check("Import Relative To The Module", {mode: imported('import "lib/shapes.lambda"\narea(6, 7)', mode)
+                                                for mode in MODES}, dict.fromkeys(MODES, 42))
+        check("Import Cycle", imported('import "a.lambda"', 'compiled'),
+              "Exception: Error: Import cycle: a.lambda -> b.lambda -> a.lambda")
+        check("Import Of A Missing Module", imported('import "lib/missing.lambda"', 'compiled').split(':')[0],
+              'FileNotFoundError')
+
+    # 'import' is only a keyword before a string
+    check("Import As An Identifier", {mode: outcome("def import(x): x + 1\nimport(2)", mode=mode) for mode in MODES},
+          dict.fromkeys(MODES, 3))
+    check("Import As An Identifier (Pratt Parser)", outcome("def import(x): x + 1\nimport(2)", parser='pratt'), 3)
+
+def check_memoization():
+    def memo_run(code, **options):
+        # The value of the last line and the cache counters
+        interpreter = Interpreter(**options)
+        for line in code.split('\n'):
+            result = interpreter.run(interpreter.parse(line))
+        stats = interpreter.memo_cache.stats()
+        return result, stats['hits'], stats['misses'], stats['evictions'], stats['invalidations']
+
+    fib = "def fib(n): if n < 2: n else: fib(n - 1) + fib(n - 2)"
+    # fib(20) misses once per argument; the second call and every fib(n - 2) after the first hit
+    check("Memo Hits And Misses", {mode: memo_run(f"{fib}\nfib(20)\nfib(20)", mode=mode, memo=True) for mode in MODES},
+          dict.fromkeys(MODES, (6765, 19, 21, 0, 0)))
+    check("Memo Least Recently Used Eviction",
+          {mode: memo_run("def sq(x): x * x\nsq(1)\nsq(2)\nsq(1)\nsq(3)\nsq(1)\nsq(2)", mode=mode, memo=True,
+                          memo_size=2) for mode in MODES},
+          dict.fromkeys(MODES, (4, 2, 4, 2, 0)))  # sq(3) evicts sq(2), then sq(2) evicts sq(3)
+    interpreter = Interpreter(memo=True, memo_size=2)
+    for line in ("def sq(x): x * x", "sq(1)", "sq(2)", "sq(1)", "sq(3)"):
+        interpreter.run(interpreter.parse(line))
+    check("Memo Keeps The Most Recently Used", [key[1] for key in interpreter.memo_cache.entries], [(1,), (3,)])
+    check("Memo Dropped On Redefinition",
+          {mode: memo_run("def f(x): x + 1\nf(1)\nf(1)\ndef f(x): x + 2\nf(1)", mode=mode, memo=True) for mode in MODES},
+          dict.fromkeys(MODES, (3, 1, 2, 0, 1)))
+    check("Memo Keys Tell Booleans From Numbers",
+          memo_run("def same(x): x\nsame(1)\nsame(True)", memo=True), (True, 0, 2, 0, 0))
+
+    for mode in MODES:
+        interpreter = Interpreter(mode=mode)
+        interpreter.run(interpreter.parse(fib))
+        interpreter.run(interpreter.parse("def double(x): x * 2"))
+        interpreter.memoize('fib')
+        results = [interpreter.run(interpreter.parse(line)) for line in ("fib(30)", "double(4)", "double(4)")]
+        stats = interpreter.memo_cache.stats()
+        check(f"Memoize One Function ({mode})", (results, stats['hits'], stats['misses']), ([832040, 8, 8], 28, 31))
+
+def check_inliner():
+    inlining_modes = ('compiled', 'vm', 'cek', 'python')
+    helpers = "def inc(x): x + 1\ndef twice(a): inc(a) * 2"
+    for mode in inlining_modes:
+        interpreter = Interpreter(mode=mode, optimize=True)
+        for line in helpers.split('\n'):
+            interpreter.run(interpreter.parse(line))
+        inlined = interpreter.inliner.inline(interpreter.parse_statement("inc(1) * 2")[1],
+                                             interpreter.global_env.variables)
+        check(f"Helper Inlined ({mode})", repr(inlined),
+              "BinaryOpNode(InlineNode(inc, body=NumberNode(2)), *, NumberNode(2))")
+    # twice inlined inc when it was defined; the guard runs the new inc once the name is rebound
+    check("Inlined Helper", {mode: outcome(f"{helpers}\ntwice(5)", mode=mode, optimize=True)
+                             for mode in inlining_modes}, dict.fromkeys(inlining_modes, 12))
+    check("Inlined Helper Redefined", {mode: outcome(f"{helpers}\ndef inc(x): x + 100\ntwice(5)", mode=mode, optimize=True)
+                                       for mode in inlining_modes}, dict.fromkeys(inlining_modes, 210))
+
+    # An inlined call costs the fuel and allocation of the call it replaces, but no depth
+    loop = "def inc(x): x + 1\ndef loop(n, acc): if n == 0: acc else: loop(n - 1, inc(acc))\nloop(10, 0)"
+    for mode in ('compiled', 'vm', 'cek'):
+        for limit in ('fuel', 'max_allocations'):
+            plain = [outcome(loop, mode=mode, **{limit: value}) for value in range(15, 45)]
+            optimized = [outcome(loop, mode=mode, optimize=True, **{limit: value}) for value in range(15, 45)]
+            check(f"Inlined Calls Charge {limit} ({mode})", (optimized == plain, plain[-1]), (True, 10))
+        check(f"Inlined Calls Do Not Nest ({mode})",
+              (outcome(f"{helpers}\ntwice(5)", mode=mode, optimize=True, max_depth=1),
+               outcome(f"{helpers}\ntwice(5)", mode=mode, max_depth=1)),
+              (12, "DepthLimitExceeded: Error: Maximum call depth of 1 exceeded"))
+
+def check_optimizer():
+    from optimizer import Optimizer
+
+    def optimized(code):
+        return repr(Optimizer().optimize(Interpreter().parse(code)))
+
+    cases = [
+        ("Constant Folding", "3 * 4 + 1", "NumberNode(13)"),
+        ("Unary Folding", "!(1 < 2)", "BooleanNode(False)"),
+        ("Branch Pruning", "if 1 < 2: a else: b", "IdentifierNode(a)"),
+        ("Short-Circuit And", "False && undefined", "BooleanNode(False)"),
+        ("Short-Circuit Or", "True || undefined", "BooleanNode(True)"),
+        ("No Pruning On The Right", "x && False", "BinaryOpNode(IdentifierNode(x), &&, BooleanNode(False))"),
+        ("Folding In A Definition", "def f(x): x * (2 + 3)",
+         "FunctionDefNode(name=f, params=['x'], body=BinaryOpNode(IdentifierNode(x), *, NumberNode(5)))"),
+        ("Lambda Specialization", "(lambda x, y: x * y)(3, w)",
+         "LetNode(names=['y'], values=[IdentifierNode(w)], body=BinaryOpNode(NumberNode(3), *, IdentifierNode(y)))"),
+        ("Division By Zero Kept", "(1 + 1) / (2 - 2)", "BinaryOpNode(NumberNode(2), /, NumberNode(0))"),
+        ("Type Error Kept", "True && 1", "BinaryOpNode(BooleanNode(True), &&, NumberNode(1))"),
+        ("Arity Error Kept", "(lambda x: x)(1, 2)",
+         "FunctionCallNode(LambdaNode(params=['x'], body=IdentifierNode(x)), [NumberNode(1), NumberNode(2)])"),
+    ]
+    for name, code, expected in cases:
+        check(f"Optimizer: {name}", optimized(code), expected)
+
+    # Every expression gives the same value or error with and without the optimizer, in every mode.
+    # Arithmetic treats booleans as numbers, as eval_BinaryOpNode does, so True + False is 1.
+    for code in ("10 / 0", "10 % 0", "True && 1", "1 < True", "!5", "[1, 2][5]", "(lambda x: x)(1, 2)",
+                 "True + False", "False && undefined", "(lambda x: x + 1)(2) * 3"):
+        plain = {mode: outcome(code, mode=mode) for mode in MODES}
+        check(f"Optimizer Preserves: {code}", {mode: outcome(code, mode=mode, optimize=True) for mode in MODES}, plain)
+
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, 'program.lambda')
+        with open(program, 'w') as file:
+            file.write("def f(x): x * (2 + 3)\nf(2)\n1 / 0\n")
+        transcript, _ = run_file(program, dump_optimized=True)
+        check("Dump Optimized", transcript.splitlines(), [
+            "Executing: def f(x): x * (2 + 3)",
+            "FunctionDefNode(name=f, params=['x'], body=BinaryOpNode(IdentifierNode(x), *, NumberNode(5)))",
+            "Function created!",
+            "Executing: f(2)",
+            "InlineNode(f, body=NumberNode(10))",
+            "10",
+            "Executing: 1 / 0",
+            "BinaryOpNode(NumberNode(1), /, NumberNode(0))",
+            "division by zero",
+        ])
+
+def check_tail_calls():
+    count = "def f(n, acc): if n == 0: acc else: f(n - 1, acc + 1)"
+    increment = "def increment(x): if x < 100000: increment(x + 1) else: x"
+    total = "def total(n): if n == 0: 0 else: n + total(n - 1)"
+    check("Deep Self Tail Call", outcome(f"{count}\nf(100000, 0)"), 100000)
+    check("Deep Tail Call Through A Branch", outcome(f"{increment}\nincrement(0)"), 100000)
+    check("Deep Tail Call Without Tail Calls", outcome(f"{count}\nf(100000, 0)", tail_calls=False),
+          "RecursionError: maximum recursion depth exceeded")
+    # Tail calls replace the current call, so they never count toward the depth limit
+    check("Deep Tail Call Within The Depth Limit", outcome(f"{count}\nf(100000, 0)", max_depth=100), 100000)
+    check("Non-Tail Call Within The Depth Limit", outcome(f"{total}\ntotal(99)", max_depth=100), 4950)
+    check("Non-Tail Call Over The Depth Limit", outcome(f"{total}\ntotal(1000)", max_depth=100),
+          "DepthLimitExceeded: Error: Maximum call depth of 100 exceeded")
+
+def check_pratt_parser():
+    import re
+    from lexer import Lexer
+    from my_parser import Parser
+    from pratt import PrattParser
+
+    def parsed(parse):
+        try:
+            return repr(parse())
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    for code in ("1 - 2 - 3", "8 / 4 / 2", "a || b && c", "a && b || c", "1 + 2 * 3 - 4 % 5", "a < b == c",
+                 "!a && b", "!(a < b) || !c", "-3 * x", "[1, 2][0][1]", "f(1)[0]", "g(x, y)[1] + h()",
+                 "(lambda x: x * 2)(3) - 1", "def f(x): if x: 1 else: f(x - 1)"):
+        expected = parsed(lambda: Parser(Lexer(code).tokenize()).parse())
+        check(f"Pratt Tree: {code}", (parsed(lambda: PrattParser(Lexer(code).tokenize()).parse()),
+                                      parsed(lambda: PrattParser(Lexer(code).tokenize_compact()).parse())),
+              (expected, expected))
+
+    # Both parsers report the index of the offending token; with a TokenBuffer, the Pratt parser
+    # reports the line and column of the same token
+    for code in ("def f(x) x", "lambda x x", "def 1(x): x", "[1 2]", "f(1 2)", "if x 1 else: 2", "(1 + 2", "x[1"):
+        position = re.search(r'at position (\d+)$', parsed(lambda: Parser(Lexer(code).tokenize()).parse()))
+        pratt = re.search(r'at position (\d+)$', parsed(lambda: PrattParser(Lexer(code).tokenize()).parse()))
+        located = re.search(r'at line (\d+), column (\d+)$',
+                            parsed(lambda: PrattParser(Lexer(code).tokenize_compact()).parse()))
+        buffer = Lexer(code).tokenize_compact()
+        index = int(position.group(1))
+        if index < len(buffer):
+            expected = buffer.position(index)
+        else:  # The input ended: the error is reported just after the last token
+            line, column = buffer.position(index - 1)
+            expected = (line, column + len(str(buffer.values[index - 1])))
+        check(f"Pratt Error Position: {code}",
+              (int(pratt.group(1)), (int(located.group(1)), int(located.group(2)))), (index, expected))
+    check("Pratt Error Message", parsed(lambda: PrattParser(Lexer("def f(x) x").tokenize_compact()).parse()),
+          "Exception: Unexpected token: ('ID', 'x'), expected: COLON at line 1, column 9")
+
+def check_call_sites():
+    for mode in ('tree', 'lazy'):
+        interpreter = Interpreter(mode=mode)
+
+        def run(code):
+            result = interpreter.run(interpreter.parse(code))
+            stats = interpreter.call_site_stats()
+            return result, stats['hits'], stats['misses']
+
+        run("def inc(x): x + 1")
+        run("def count(n): if n == 0: 0 else: inc(count(n - 1))")
+        # 21 calls through 3 call sites: the first call through each one misses
+        check(f"Call Sites: First Run ({mode})", run("count(10)"), (10, 18, 3))
+        # Only the new top-level call misses
+        check(f"Call Sites: Second Run ({mode})", run("count(10)"), (10, 38, 4))
+        # Rebinding a global invalidates every call site, and the new inc is called
+        run("def inc(x): x + 2")
+        check(f"Call Sites: After Rebinding ({mode})", run("count(10)"), (20, 56, 7))
+        # Calls of lambdas and parameters are never cached
+        check(f"Call Sites: Local Calls ({mode})", run("(lambda f: f(1))(inc)"), (3, 56, 9))
+        check(f"Call Sites: Hit Rate ({mode})", interpreter.call_site_stats()['hit rate'], '86.2%')
+
+def check_node_sharing():
+    from hashcons import share_program
+
+    interpreter = Interpreter()
+    program = ["def f(x): (x * 2 + 1) + (x * 2 + 1)", "f(3) + (x * 2 + 1)", "h(1) + h(1)", "[1, True, 1]",
+               "(h(1) + 2) * (h(1) + 2)"]
+    shared = [ast for _, ast, _ in share_program([interpreter.parse_statement(line) for line in program])]
+    body, expression, calls, elements = shared[0].body, shared[1], shared[2], shared[3].elements
+    check("Identical Subtrees Shared", body.left is body.right, True)
+    check("Identical Subtrees Shared Across Statements", expression.right is body.left, True)
+    check("Call Sites Not Shared", (calls.left is calls.right, calls.left.args[0] is calls.right.args[0]), (False, True))
+    check("Subtrees Holding Calls Not Shared", (shared[4].left is shared[4].right,
+                                                shared[4].left.right is shared[4].right.right), (False, True))
+    check("Numbers And Booleans Kept Apart", (elements[0] is elements[2], elements[0] is elements[1]), (True, False))
+
+    for mode in MODES:
+        plain, _ = run_file("test.lambda", mode=mode)
+        check(f"Shared Nodes Give The Same Transcript ({mode})", run_file("test.lambda", mode=mode, share_nodes=True)[0],
+              plain)
+
+def check_lazy_mode():
+    def calls(code, mode):
+        # The value of the last line and the number of calls made to compute it
+        interpreter = Interpreter(mode=mode, fuel=10 ** 9)
+        for line in code.split('\n'):
+            result = interpreter.run(interpreter.parse(line))
+        interpreter.budget.settle()
+        return result, interpreter.budget.fuel - interpreter.budget.fuel_left
+
+    const = "def const(a, b): a\ndef spin(n): spin(n + 1)"
+    check("Lazy: Unused Erroring Argument", (outcome(f"{const}\nconst(1, 1 / 0)", mode='lazy'),
+                                             outcome(f"{const}\nconst(1, 1 / 0)", mode='tree')),
+          (1, "ZeroDivisionError: division by zero"))
+    check("Lazy: Unused Non-Terminating Argument", (outcome(f"{const}\nconst(1, spin(0))", mode='lazy', fuel=100),
+                                                    outcome(f"{const}\nconst(1, spin(0))", mode='tree', fuel=100)),
+          (1, "FuelExhausted: Error: Evaluation ran out of fuel after 100 calls"))
+    check("Lazy: Branch Not Taken", outcome("def pick(c, a, b): if c: a else: b\npick(False, 1 / 0, 2)", mode='lazy'), 2)
+    count = "def count(n): if n == 0: 0 else: count(n - 1)"
+    # count(10) makes 11 calls: the argument is evaluated once although x is used three times
+    check("Lazy: Used Argument Evaluated Once", calls(f"{count}\ndef sq(x): x * x + x\nsq(count(10) + 3)", 'lazy'),
+          (12, 12))
+    check("Lazy: Unused Argument Never Evaluated", (calls(f"{count}\n{const}\nconst(1, count(10))", 'lazy'),
+                                                    calls(f"{count}\n{const}\nconst(1, count(10))", 'tree')),
+          ((1, 1), (1, 12)))
+
+def check_virtual_machine():
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, 'program.lambda')
+        with open(program, 'w') as file:
+            file.write("def f(x): if x < 2: x else: f(x - 1) * 2\nf(3)\n")
+        transcript, _ = run_file(program, mode='vm', disassemble=True)
+    check("Disassembly", transcript.splitlines(), [
+        "Executing: def f(x): if x < 2: x else: f(x - 1) * 2",
+        "Code <statement>(): 2 instructions, 16 bytes",
+        "     0 DEFINE               <code f>",
+        "     2 RETURN",
+        "    Code f(x): 15 instructions, 120 bytes",
+        "         0 LOAD_FAST            0",
+        "         2 LOAD_CONST           2",
+        "         4 COMPARE              <",
+        "         6 JUMP_IF_FALSE        to 12",
+        "         8 LOAD_FAST            0",
+        "        10 RETURN",
+        "        12 LOAD_GLOBAL          f",
+        "        14 CHECK_CALLABLE",
+        "        16 LOAD_FAST            0",
+        "        18 LOAD_CONST           1",
+        "        20 ARITHMETIC           -",
+        "        22 CALL                 1",
+        "        24 LOAD_CONST           2",
+        "        26 ARITHMETIC           *",
+        "        28 RETURN",
+        "Function created!",
+        "Executing: f(3)",
+        "Code <statement>(): 5 instructions, 40 bytes",
+        "     0 LOAD_GLOBAL          f",
+        "     2 CHECK_CALLABLE",
+        "     4 LOAD_CONST           3",
+        "     6 CALL                 1",
+        "     8 RETURN",
+        "4",
+    ])
+
+    # The VM keeps calls on a stack of its own, so only the depth limit bounds recursion
+    total = "def total(n): if n == 0: 0 else: n + total(n - 1)"
+    count = "def f(n, acc): if n == 0: acc else: f(n - 1, acc + 1)"
+    check("VM Deep Recursion", outcome(f"{total}\ntotal(100000)", mode='vm'), 5000050000)
+    check("VM Depth Limit", (outcome(f"{total}\ntotal(49999)", mode='vm', max_depth=50000),
+                             outcome(f"{total}\ntotal(50000)", mode='vm', max_depth=50000)),
+          (1249975000, "DepthLimitExceeded: Error: Maximum call depth of 50000 exceeded"))
+    check("VM Tail Calls Within The Depth Limit", outcome(f"{count}\nf(100000, 0)", mode='vm', max_depth=10), 100000)
+    # f(100000, 0) makes 100001 calls
+    check("VM Fuel", (outcome(f"{count}\nf(100000, 0)", mode='vm', fuel=100001),
+                      outcome(f"{count}\nf(100000, 0)", mode='vm', fuel=100000)),
+          (100000, "FuelExhausted: Error: Evaluation ran out of fuel after 100000 calls"))
+
+def check_transpiler():
+    with tempfile.TemporaryDirectory() as directory:
+        program = os.path.join(directory, 'program.lambda')
+        with open(program, 'w') as file:
+            file.write("def inc(x): x + 1\ninc(2)\ninc(1, 2)\n")
+        transcript, interpreter = run_file(program, mode='python', show_python=True)
+    check("Show Python", transcript.splitlines(), [
+        "Executing: def inc(x): x + 1",
+        "def _statement():",
+        "    def _def1_inc(v_x=_M, *_extra):",
+        "        if v_x is _M or _extra:",
+        "            _arity_error('inc', 1, (v_x, ), _extra)",
+        "        return (v_x + (1) if isinstance(v_x, int) else _arithmetic_fallback('+', v_x, (1)))",
+        "    _define('inc', _def1_inc)",
+        "Function created!",
+        "Executing: inc(2)",
+        "def _statement():",
+        "    return (_t2 if callable(_t2 := _G['inc']) else _call_error(_t2))((2))",
+        "3",
+        "Executing: inc(1, 2)",
+        "def _statement():",
+        "    return (_t3 if callable(_t3 := _G['inc']) else _call_error(_t3))((1), (2))",
+        "Error: Function 'inc' expected 1 arguments but got 2.",
+    ])
+    check("Python Temporaries Do Not Leak",
+          [name for name in interpreter.transpiler.namespace if name.startswith(('_t', '_inlined'))], [])
+
+    # Arity errors name the function and the counts as in every other mode
+    add = "def add(a, b): a + b"
+    for code in (f"{add}\nadd(1)", f"{add}\nadd(1, 2, 3)", "(lambda: 1)(2)", "(lambda x: x)()",
+                 "(lambda x, y: x)(1)", f"{add}\n(lambda f: f(1))(add)"):
+        expected = {mode: outcome(code, mode=mode) for mode in MODES}
+        check(f"Python Arity Error: {code!r}", outcome(code, mode='python'), expected['compiled'])
+        check(f"Arity Error In Every Mode: {code!r}", len(set(expected.values())), 1)
+
+def check_token_buffer():
+    from lexer import Lexer, TokenBuffer
+
+    source = "def f(x):\n  x + 10\nf(2)"
+    buffer = TokenBuffer(source)
+    check("Token Buffer Positions", [(buffer[index][1], buffer.position(index)) for index in range(len(buffer))
+                                     if buffer[index][0] != 'NEWLINE'],
+          [('def', (1, 0)), ('f', (1, 4)), ('(', (1, 5)), ('x', (1, 6)), (')', (1, 7)), (':', (1, 8)),
+           ('x', (2, 2)), ('+', (2, 4)), (10, (2, 6)), ('f', (3, 0)), ('(', (3, 1)), (2, (3, 2)), (')', (3, 3))])
+    check("Token Buffer Unexpected Character", outcome_of(lambda: TokenBuffer("def f(x):\n  x + $")),
+          "RuntimeError: Unexpected character $ at line 2, column 6")
+    # The compact tokens are the tokens of Lexer.tokenize
+    with open("test.lambda") as file:
+        lines = [line for line in file.read().splitlines() if line.strip()]
+    check("Token Buffer Matches The Lexer",
+          [list(Lexer(line).tokenize_compact()) for line in lines], [Lexer(line).tokenize() for line in lines])
+
+    interpreter = Interpreter(parser='pratt')
+    for code, expected in (
+            ("(1 + 2", "Exception: Unexpected end of input, expected: RPAREN at line 1, column 6"),
+            ("f(1 2)", "Exception: Unexpected token: ('NUMBER', 2), expected: RPAREN at line 1, column 4"),
+            ("if x: 1 els 2", "Exception: Unexpected token: ('ID', 'els'), expected else at line 1, column 8"),
+            ("a $ b", "RuntimeError: Unexpected character $ at line 1, column 2")):
+        check(f"Parse Error Position: {code}", outcome_of(lambda: interpreter.parse(code)), expected)
+
 def main():
     tests = [
         # Simple Tests
@@ -35,6 +768,8 @@ def main():
         ("Boolean AND", "True && False"),  # Should print False
         ("Boolean OR", "True || False"),  # Should print True
         ("Boolean NOT", "!False"),  # Should print True
+        ("Short-Circuit AND", "False && (1 / 0 == 1)"),  # Should print False
+        ("Short-Circuit OR", "def f(n): n == 0 || f(n - 1)\nf(10)"),  # Should print True
         ("Comparison Equal", "3 == 3"),  # Should print True
         ("Comparison Not Equal", "3 != 4"),  # Should print True
         ("Comparison Less Than", "3 < 4"),  # Should print True
@@ -57,18 +792,70 @@ def main():
         # Recursion to Simulate While Loop
         ("Simulate While Loop", "def increment(x): if x < 10: increment(x * x) else: x\nincrement(3)"),  # Should print 10
 
+        # Sequence Tests
+        ("List Indexing", "[10, 20, 30][-1]"),  # Should print 30
+        ("Map and Filter", "map(lambda x: x * x, filter(lambda n: n % 2 == 0, range(1, 7)))"),  # Should print [4, 16, 36]
+        ("Reduce", "reduce(lambda a, x: a + x, range(1, 11), 0)"),  # Should print 55
+        ("Concatenation", "def fibs(acc, n): if n == 0: acc else: fibs(acc + [acc[-1] + acc[-2]], n - 1)\nfibs([0, 1], 8)"),  # Should print [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]
+
         # Error Tests
         ("Division by Zero", "10 / 0"),  # Should raise ZeroDivisionError
         ("Lambda Argument Error", "(lambda x, y: x + y)(2)"),  # Should raise Exception
         ("Undefined Function", "unknown_function()"),  # Should raise Exception
         ("Syntax Error", "if True 1 else 0"),  # Should raise SyntaxError
+        ("Range Too Long", "range(10000000000)"),  # Should raise ValueError
     ]
 
     for test_name, code in tests:
         run_test(test_name, code)
 
+    # Errors must read the same whichever backend runs the program
+    cross_mode_tests = [
+        ("Function Operand Error", "3 * (lambda x: x)"),  # Should raise TypeError naming 'function'
+        ("Function Comparison Error", "def f(x): x\nf == 1"),  # Should raise TypeError naming 'function'
+        ("Function Index Error", "(lambda x: x)[0]"),  # Should raise TypeError naming 'function'
+        ("Sequence Ordering Error", "[1, 2] < [1, 3]"),  # Should raise TypeError for unordered values
+        ("Closure In Tail Loop", "def mk(n, acc): if n == 0: acc else: mk(n - 1, lambda x: n)\n(mk(3, 0))(99)"),  # Should print 1
+    ]
+
+    for test_name, code in cross_mode_tests:
+        run_cross_mode_test(test_name, code)
+
+    # Limits must trip at the same point whichever backend runs the program
+    run_cross_mode_test("Depth Of Pending Operations",
+                        "def f(n): if n == 0: 0 else: 1 + (1 + (1 + f(n - 1)))\nf(60)", max_depth=100)  # Should print 180
+    run_cross_mode_test("Range Over Allocation Limit", "len(range(10000000000))",
+                        max_allocations=1000)  # Should raise AllocationLimitExceeded before building the range
+
     # Run test.lambda file
     run_lambda_file("test.lambda")
 
+    check_cek_machine()
+    check_program_cache()
+    check_vectorize()
+    check_parallel()
+    check_benchmark_harness()
+    check_profiler()
+    check_server()
+    check_limits()
+    check_runner()
+    check_prelude()
+    check_imports()
+    check_memoization()
+    check_inliner()
+    check_optimizer()
+    check_tail_calls()
+    check_pratt_parser()
+    check_call_sites()
+    check_node_sharing()
+    check_lazy_mode()
+    check_virtual_machine()
+    check_transpiler()
+    check_token_buffer()
+
+    print(f"{len(failures)} check(s) failed: {', '.join(failures)}" if failures else "All checks passed")
+    if failures:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
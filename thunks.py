@@ -0,0 +1,13 @@
+# Argument of a call in 'lazy' mode: the argument's expression and the environment of the
+# call, evaluated the first time the parameter bound to it is used. The value is kept, so
+# the expression runs at most once however often the parameter is used (call-by-need).
+class Thunk:
+    __slots__ = ('node', 'env', 'value')
+
+    def __init__(self, node, env):
+        self.node = node  # AST node of the argument, or None once evaluated
+        self.env = env  # Environment of the call, or None once evaluated
+        self.value = None  # Value of the argument, once evaluated
+
+    def __repr__(self):
+        return f'Thunk({self.node})' if self.node is not None else f'Thunk(value={self.value!r})'
@@ -0,0 +1,425 @@
+from compiler import (SHORT_CIRCUIT, Compiler, arithmetic_fallback, compare_error, compare_fallback, call_error,
+                      logical_error, operand_error, type_name)
+from my_parser import *
+from sequences import Sequence, index_value
+
+# Python operators for the language's binary operators
+PYTHON_OPERATORS = {
+    '+': '+', '-': '-', '*': '*', '/': '//', '%': '%',
+    '==': '==', '!=': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>=',
+    '&&': 'and', '||': 'or',
+}
+MISSING = object()  # Default value of generated parameters, used to detect missing arguments
+
+
+# Dictionary of global variables that raises the language's error for unknown names
+class GlobalVariables(dict):
+    def __init__(self, env, variables):
+        super().__init__(variables)
+        self.env = env  # The environment owning this dictionary, for parent lookups
+
+    def __missing__(self, name):
+        if self.env.parent:
+            return self.env.parent.get(name)
+        raise Exception(f"Error: Variable '{name}' not found")
+
+
+def arithmetic_error(op, left, right):
+    """
+    Raise the error of a failed arithmetic operation.
+
+    :param op: The arithmetic operator.
+    :param left: The left operand.
+    :param right: The right operand.
+    :raises TypeError: If an operand is not an int.
+    :raises ZeroDivisionError: If the right operand of a division is zero.
+    """
+    if not isinstance(left, int) or not isinstance(right, int):
+        raise operand_error(op, left, right)
+    raise ZeroDivisionError("division by zero")
+
+
+def raise_operand_error(op, left, right):
+    raise operand_error(op, left, right)
+
+
+def raise_logical_error(op, left):
+    raise logical_error(op, left)
+
+
+def raise_compare_error(left, right):
+    raise compare_error(left, right)
+
+
+def raise_call_error(func):
+    raise call_error(func)
+
+
+def raise_not_error(operand):
+    raise TypeError(f"Unsupported operand type for !: '{type_name(operand)}'")
+
+
+def raise_undefined(name):
+    raise Exception(f"Error: Variable '{name}' not found")
+
+
+def raise_arity_error(name, expected, params, extra):
+    """
+    Raise the error of a generated function called with the wrong number of arguments.
+
+    :param name: The function name, or None for lambdas.
+    :param expected: The number of parameters.
+    :param params: The values bound to the parameters (MISSING for absent arguments).
+    :param extra: The surplus arguments.
+    """
+    count = sum(1 for param in params if param is not MISSING) + len(extra)
+    if name is None:
+        raise Exception(f"Error: Lambda expected {expected} arguments but got {count}.")
+    raise Exception(f"Error: Function '{name}' expected {expected} arguments but got {count}.")
+
+
+# Transpiler class translating resolved ASTs into Python source and compiling it with compile().
+# Functions become Python functions and lambdas, if/else becomes conditional expressions, and
+# every operation is emitted with inline checks reproducing the language's semantics: integer
+# division raising ZeroDivisionError, the operand type checks of each operator, and comparisons
+# requiring both sides to have the same type. Tail calls of a function to itself become loops.
+class Transpiler:
+    def __init__(self, global_env, define=None):
+        """
+        Initialize the Transpiler.
+
+        :param global_env: The global environment for storing variables and functions.
+        :param define: Function binding a name to a function created by 'def' (defaults to global_env.set).
+        """
+        if not isinstance(global_env.variables, GlobalVariables):
+            global_env.variables = GlobalVariables(global_env, global_env.variables)
+        self.global_env = global_env  # Global environment for storing variables and functions
+        self.define = define or global_env.set  # Binds functions created by 'def'
+        self.fallback = Compiler(global_env, define=self.define)  # Used when Python cannot compile the source
+        self.namespace = {
+            '_G': global_env.variables,
+            '_M': MISSING,
+            '_arithmetic_error': arithmetic_error,
+            '_arithmetic_fallback': arithmetic_fallback,
+            '_sequence': Sequence.from_values,
+            '_index': index_value,
+            '_operand_error': raise_operand_error,
+            '_logical_error': raise_logical_error,
+            '_compare_error': raise_compare_error,
+            '_compare_fallback': compare_fallback,
+            '_ordered': frozenset((int, bool)),
+            '_call_error': raise_call_error,
+            '_not_error': raise_not_error,
+            '_undefined': raise_undefined,
+            '_arity_error': raise_arity_error,
+            '_define': self.define,
+        }  # Globals of the generated code
+        self.counter = 0  # Counter for unique temporary and function names
+        self.loop_params = ()  # Python names of the parameters reassigned by the loop being generated, if any
+        self.constants = {}  # Parameters of the statement being generated, mapped to their values
+
+    def run(self, node, show_source=False):
+        """
+        Transpile, compile and execute a resolved top-level AST node.
+
+        :param node: The AST node to run, as returned by Resolver.resolve.
+        :param show_source: Whether the generated Python source is printed.
+        :return: The result of the execution.
+        """
+        source = self.transpile(node)
+        if show_source:
+            print(source)
+        try:
+            code = compile(source, '<lambda program>', 'exec')
+        except (SyntaxError, RecursionError, MemoryError):
+            # Very deeply nested expressions exceed the limits of the Python compiler
+            return self.fallback.run(node)
+        scope = {}
+        exec(code, self.namespace, scope)
+        result = scope['_statement'](*self.constants.values())
+        if isinstance(node, FunctionDefNode):
+            return "Function created!"
+        return result
+
+    def transpile(self, node):
+        """
+        Translate a resolved top-level AST node into Python source.
+
+        The statement becomes the body of a function, '_statement', so that its temporaries
+        are locals freed when it returns rather than globals of the generated code. The
+        objects the code refers to, such as the functions guarding inlined calls, are the
+        parameters of '_statement', whose names and values run() takes from self.constants.
+
+        :param node: The AST node to translate.
+        :return: A Python module defining '_statement'.
+        """
+        self.constants = {}
+        if isinstance(node, FunctionDefNode):
+            body = self.function_definition(node)
+        else:
+            body = f'return {self.expression(node)}'
+        lines = [f"def _statement({', '.join(self.constants)}):"]
+        lines.extend(f'    {line}' for line in body.split('\n'))
+        return '\n'.join(lines)
+
+    def temporary(self):
+        """
+        Create a unique name for a temporary variable.
+
+        :return: The name.
+        """
+        self.counter += 1
+        return f'_t{self.counter}'
+
+    def expression(self, node):
+        """
+        Translate an AST node into a Python expression.
+
+        :param node: The AST node to translate.
+        :return: The Python source of the expression.
+        :raises Exception: If the node type is not supported.
+        """
+        method_name = f'expression_{type(node).__name__}'
+        method = getattr(self, method_name, None)
+        if method is None:
+            raise Exception(f"No method to transpile node type {type(node).__name__}")
+        return method(node)
+
+    def expression_NumberNode(self, node):
+        return f'({node.value})'
+
+    def expression_BooleanNode(self, node):
+        return repr(node.value)
+
+    def expression_IdentifierNode(self, node):
+        if node.scope == 'local':
+            return f'v_{node.name}'
+        if node.scope == 'global':
+            return f'_G[{node.name!r}]'
+        return f'_undefined({node.name!r})'
+
+    def operand(self, node):
+        """
+        Translate an operand that is referenced more than once in the generated code.
+
+        :param node: The operand AST node.
+        :return: A pair (source evaluating the operand, source referring to its value). Literals and
+                 local identifiers are referenced directly; other operands are bound to a temporary.
+        """
+        source = self.expression(node)
+        if isinstance(node, (NumberNode, BooleanNode)) or (isinstance(node, IdentifierNode) and node.scope == 'local'):
+            return source, source
+        name = self.temporary()
+        return f'({name} := {source})', name
+
+    def expression_BinaryOpNode(self, node):
+        op = node.op
+        python_op = PYTHON_OPERATORS.get(op)
+        if python_op is None:
+            raise Exception(f"Error: Unsupported binary operator: '{op}'")
+        if op in SHORT_CIRCUIT:
+            return self.logical(node)
+        left_source, left = self.operand(node.left)
+        right_source, right = self.operand(node.right)
+        result = f'{left} {python_op} {right}'
+        guard = ''
+        if op in ('+', '-', '*', '/', '%'):
+            failure = f'_arithmetic_fallback({op!r}, {left}, {right})'
+            checks = [f'isinstance({left_source}, int)', f'isinstance({right_source}, int)']
+            if isinstance(node.right, NumberNode):
+                checks = checks[:1]
+            if op == '/':
+                failure = f'_arithmetic_error({op!r}, {left}, {right})'
+                guard = f' and {right} != 0'
+        elif isinstance(node.right, NumberNode):
+            failure = f'_compare_error({left}, {right})'
+            checks = [f'type({left_source}) is int']
+        else:
+            failure = f'_compare_fallback({op!r}, {left}, {right})'
+            ordered = '' if op in ('==', '!=') else ' in _ordered'  # Only numbers and booleans are ordered
+            checks = [f'type({left_source}) is type({right_source}){ordered}']
+        # The bitwise & makes both operands evaluate, in order, before either check fails
+        condition = ' & '.join(checks) + guard
+        return f'({result} if {condition} else {failure})'
+
+    def logical(self, node):
+        """
+        Translate a logical operation into nested conditional expressions, so that the right
+        operand only runs when the left one does not decide the result.
+
+        :param node: The BinaryOpNode of '&&' or '||'.
+        :return: The Python source of the expression.
+        """
+        op = node.op
+        left_source, left = self.operand(node.left)
+        right_source, right = self.operand(node.right)
+        right_checked = f'({right} if isinstance({right_source}, bool) else _operand_error({op!r}, {left}, {right}))'
+        return (f'(({left} if {left} == {SHORT_CIRCUIT[op]} else {right_checked}) '
+                f'if isinstance({left_source}, bool) else _logical_error({op!r}, {left}))')
+
+    def expression_ListNode(self, node):
+        return f"_sequence([{', '.join(self.expression(element) for element in node.elements)}])"
+
+    def expression_IndexNode(self, node):
+        return f'_index({self.expression(node.sequence)}, {self.expression(node.index)})'
+
+    def expression_UnaryOpNode(self, node):
+        if node.op != '!':
+            raise Exception(f"Error: Unsupported unary operator: '{node.op}'")
+        operand = self.temporary()
+        return f'(not {operand} if isinstance({operand} := {self.expression(node.operand)}, bool) ' \
+               f'else _not_error({operand}))'
+
+    def expression_IfElseNode(self, node):
+        return (f'({self.expression(node.if_body)} if {self.expression(node.condition)} '
+                f'else {self.expression(node.else_body)})')
+
+    def expression_LambdaNode(self, node):
+        params = self.parameters(node.params)
+        check = self.arity_check(None, node.params, params)
+        # Python closures read variables when they run, so a lambda created inside a tail-call loop
+        # keeps the values of the iteration that created it in keyword-only parameters
+        frozen = ''.join(f', {param}={param}' for param in self.loop_params if param not in params)
+        return f'(lambda {self.signature(params)}{frozen}: ({check} if {self.arity_condition(params)} ' \
+               f'else {self.expression(node.body)}))'
+
+    def expression_LetNode(self, node):
+        # A Python lambda keeps the bound names out of the enclosing scope; calling it skips the arity checks
+        params = ', '.join(f'v_{name}' for name in node.names)
+        values = ', '.join(self.expression(value) for value in node.values)
+        return f'(lambda {params}: {self.expression(node.body)})({values})'
+
+    def expression_InlineNode(self, node):
+        self.counter += 1
+        function = f'_inlined{self.counter}'
+        self.constants[function] = node.function  # The function the guard compares the global with
+        return (f'({self.expression(node.body)} if _G.get({node.name!r}) is {function} '
+                f'else {self.expression(node.call)})')
+
+    def expression_FunctionCallNode(self, node):
+        func = self.temporary()
+        args = ', '.join(self.expression(arg) for arg in node.args)
+        return f'({func} if callable({func} := {self.expression(node.func)}) else _call_error({func}))({args})'
+
+    def parameters(self, params):
+        """
+        Choose the Python names of a lambda's or function's parameters.
+
+        :param params: The parameter names.
+        :return: The Python names; for duplicate parameters, only the last one keeps its name.
+        """
+        return [f'v_{param}' if param not in params[index + 1:] else f'_unused{index}'
+                for index, param in enumerate(params)]
+
+    def signature(self, params):
+        """
+        Build a Python parameter list that accepts any number of arguments.
+
+        :param params: The Python names of the parameters.
+        :return: The Python source of the parameter list.
+        """
+        return ', '.join([f'{param}=_M' for param in params] + ['*_extra'])
+
+    def arity_condition(self, params):
+        """
+        Build the condition under which a generated function was called with the wrong number of arguments.
+
+        :param params: The Python names of the parameters.
+        :return: The Python source of the condition.
+        """
+        if not params:
+            return '_extra'
+        return f'{params[-1]} is _M or _extra'
+
+    def arity_check(self, name, params, python_params):
+        """
+        Build the call raising the arity error of a generated function.
+
+        :param name: The function name, or None for lambdas.
+        :param params: The parameter names.
+        :param python_params: The Python names of the parameters.
+        :return: The Python source of the call.
+        """
+        values = ''.join(f'{param}, ' for param in python_params)
+        return f'_arity_error({name!r}, {len(params)}, ({values}), _extra)'
+
+    def function_definition(self, node):
+        """
+        Translate a FunctionDefNode into a Python function definition followed by its binding.
+
+        :param node: The FunctionDefNode to translate.
+        :return: The Python source.
+        """
+        self.counter += 1
+        python_name = f'_def{self.counter}_{node.name}'
+        params = self.parameters(node.params)
+        lines = [
+            f'def {python_name}({self.signature(params)}):',
+            f'    if {self.arity_condition(params)}:',
+            f'        {self.arity_check(node.name, node.params, params)}',
+        ]
+        if self.has_self_tail_call(node.body, node):
+            lines.append('    while True:')
+            self.loop_params = [param for param in params if param.startswith('v_')]
+            try:
+                lines.extend(self.tail_statements(node.body, node, python_name, params, '        '))
+            finally:
+                self.loop_params = ()
+        else:
+            lines.append(f'    return {self.expression(node.body)}')
+        lines.append(f'_define({node.name!r}, {python_name})')
+        return '\n'.join(lines)
+
+    def is_self_call(self, node, definition):
+        """
+        Check whether a node is a call of the function being defined, with the right number of arguments.
+
+        :param node: The AST node.
+        :param definition: The FunctionDefNode.
+        :return: True if the node calls the global name of the definition.
+        """
+        return (isinstance(node, FunctionCallNode) and isinstance(node.func, IdentifierNode)
+                and node.func.scope == 'global' and node.func.name == definition.name
+                and len(node.args) == len(definition.params))
+
+    def has_self_tail_call(self, node, definition):
+        """
+        Check whether a function body calls the function itself in tail position.
+
+        :param node: The body AST node.
+        :param definition: The FunctionDefNode.
+        :return: True if a self tail call exists.
+        """
+        if isinstance(node, IfElseNode):
+            return self.has_self_tail_call(node.if_body, definition) or \
+                self.has_self_tail_call(node.else_body, definition)
+        return self.is_self_call(node, definition)
+
+    def tail_statements(self, node, definition, python_name, params, indent):
+        """
+        Translate a function body into statements of a loop, turning self tail calls into iterations.
+
+        :param node: The body AST node in tail position.
+        :param definition: The FunctionDefNode.
+        :param python_name: The Python name of the generated function.
+        :param params: The Python names of the parameters.
+        :param indent: The indentation of the statements.
+        :return: The lines of Python source.
+        """
+        if isinstance(node, IfElseNode):
+            lines = [f'{indent}if {self.expression(node.condition)}:']
+            lines.extend(self.tail_statements(node.if_body, definition, python_name, params, indent + '    '))
+            lines.append(f'{indent}else:')
+            lines.extend(self.tail_statements(node.else_body, definition, python_name, params, indent + '    '))
+            return lines
+        if not self.is_self_call(node, definition):
+            return [f'{indent}return {self.expression(node)}']
+        # The global name may have been rebound (or memoized) since this definition was made
+        func = self.temporary()
+        args = [self.expression(arg) for arg in node.args]
+        lines = [f'{indent}{func} = _G[{definition.name!r}]', f'{indent}if {func} is not {python_name}:',
+                 f'{indent}    return ({func} if callable({func}) else _call_error({func}))({", ".join(args)})']
+        if params:
+            lines.append(f'{indent}{", ".join(params)}, = {", ".join(args)},')
+        lines.append(f'{indent}continue')
+        return lines
@@ -0,0 +1,261 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only Interpreter.vectorize needs it
+    np = None
+
+from my_parser import *
+
+INT64_MIN = -2 ** 63  # Smallest value of the int64 arrays used for numbers
+PRODUCT_LIMIT = 2.0 ** 62  # Products whose estimated magnitude reaches this are recomputed exactly
+
+
+# Raised while compiling an expression that has no array form; the whole call is then evaluated per element
+class Unsupported(Exception):
+    pass
+
+
+# Array value of a sub-expression: the values of every row, their kind ('int' or 'bool'),
+# and a mask of the rows whose value must be recomputed by the scalar interpreter
+class Column:
+    __slots__ = ('values', 'kind', 'fallback')
+
+    def __init__(self, values, kind, fallback):
+        self.values = values  # NumPy array of int64 or bool values
+        self.kind = kind  # 'int' or 'bool'
+        self.fallback = fallback  # Boolean NumPy array, or False when no row needs the scalar interpreter
+
+
+def either(left, right):
+    """
+    Combine two fallback masks.
+
+    :param left: A boolean array or False.
+    :param right: A boolean array or False.
+    :return: The rows set in either mask, or False if neither has any.
+    """
+    if left is False:
+        return right
+    if right is False:
+        return left
+    return left | right
+
+
+# Callable evaluating a numeric lambda over whole NumPy arrays at once
+class VectorizedFunction:
+    def __init__(self, node, function):
+        """
+        Initialize the VectorizedFunction.
+
+        :param node: The LambdaNode of the function.
+        :param function: The same lambda, evaluated by the interpreter, used for rows that
+                         cannot be computed with array operations.
+        """
+        self.params = node.params  # Parameter names
+        self.body = node.body  # AST of the lambda body
+        self.function = function  # Scalar function value
+        self.vectorized_rows = 0  # Number of rows computed with array operations
+        self.scalar_rows = 0  # Number of rows computed by the scalar function
+
+    def __call__(self, *columns):
+        """
+        Apply the function to every row of its argument arrays.
+
+        Each argument is an array (or sequence, or scalar) holding one argument per row, and
+        the arguments are broadcast together. Rows are evaluated with NumPy operations when
+        possible; rows that would raise or overflow int64, and whole calls whose expression has
+        no array form, are evaluated by the scalar interpreter. The first row (in order) that
+        raises in the scalar interpreter raises the same exception here.
+
+        :param columns: One array of values per parameter.
+        :return: A NumPy array with the result of every row (of dtype object if some result
+                 does not fit in an int64 or bool array).
+        """
+        if len(columns) != len(self.params):
+            return self.function(*columns)  # Raises the interpreter's arity error
+        columns = np.broadcast_arrays(*[np.asarray(column) for column in columns])
+        shape = columns[0].shape if columns else ()
+        columns = [column.ravel() for column in columns]
+        self.size = columns[0].size if columns else 1  # Number of rows
+        try:
+            result = self.vector(columns)
+        except Unsupported:
+            return self.per_element(columns, np.ones(self.size, dtype=bool), None).reshape(shape)
+        return self.per_element(columns, result.fallback, result.values).reshape(shape)
+
+    def vector(self, columns):
+        """
+        Evaluate the body with array operations.
+
+        :param columns: The flattened argument arrays.
+        :return: The Column of the body.
+        :raises Unsupported: If the body has no array form.
+        """
+        self.columns = {}  # Column of each parameter
+        for name, values in zip(self.params, columns):
+            if values.dtype == np.bool_:
+                self.columns[name] = Column(values, 'bool', False)
+            elif values.dtype.kind in 'iu' and values.dtype != np.uint64:
+                self.columns[name] = Column(values.astype(np.int64), 'int', False)
+            else:
+                raise Unsupported()  # Python objects, floats, or uint64 values beyond int64
+        with np.errstate(all='ignore'):
+            return self.visit(self.body)
+
+    def per_element(self, columns, fallback, values):
+        """
+        Evaluate the rows selected by a mask with the scalar function.
+
+        :param columns: The flattened argument arrays.
+        :param fallback: Boolean array of the rows to evaluate, or False.
+        :param values: The array results of the other rows, or None if no row has one.
+        :return: The flattened results.
+        """
+        rows = np.flatnonzero(fallback).tolist() if fallback is not False else []
+        self.scalar_rows += len(rows)
+        if values is None:
+            values = np.empty(self.size, dtype=object)
+        else:
+            self.vectorized_rows += self.size - len(rows)
+        if not rows:
+            return values
+        arguments = [column.tolist() for column in columns]
+        results = [self.function(*[argument[row] for argument in arguments]) for row in rows]
+        if values.dtype != object and not fits(results, values.dtype):
+            values = np.array(values.tolist() + [None], dtype=object)[:-1]  # Keep Python ints and bools
+        values[rows] = results
+        if values.dtype == object and len(rows) == self.size:
+            for dtype in (np.bool_, np.int64):
+                if fits(results, dtype):
+                    return values.astype(dtype)
+        return values
+
+    def visit(self, node):
+        """
+        Evaluate an AST node over every row.
+
+        :param node: The AST node.
+        :return: The Column of the node.
+        :raises Unsupported: If the node has no array form.
+        """
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        if method is None:
+            raise Unsupported()
+        return method(node)
+
+    def visit_NumberNode(self, node):
+        if not INT64_MIN <= node.value < -INT64_MIN:
+            raise Unsupported()
+        return Column(np.full(self.size, node.value, dtype=np.int64), 'int', False)
+
+    def visit_BooleanNode(self, node):
+        return Column(np.full(self.size, node.value, dtype=bool), 'bool', False)
+
+    def visit_IdentifierNode(self, node):
+        if node.name not in self.columns:
+            raise Unsupported()  # Globals are looked up by the scalar interpreter
+        return self.columns[node.name]
+
+    def visit_UnaryOpNode(self, node):
+        operand = self.visit(node.operand)
+        if node.op != '!':
+            raise Unsupported()
+        if operand.kind != 'bool':
+            return self.error('bool')
+        return Column(~operand.values, 'bool', operand.fallback)
+
+    def visit_BinaryOpNode(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        fallback = either(left.fallback, right.fallback)
+        op = node.op
+        if op in ('+', '-', '*', '/', '%'):
+            # Booleans are accepted as numbers, as in the scalar interpreter
+            a, b = left.values.astype(np.int64), right.values.astype(np.int64)
+            if op == '+':
+                values = a + b
+                overflow = ((a ^ values) & (b ^ values)) < 0
+            elif op == '-':
+                values = a - b
+                overflow = ((a ^ b) & (a ^ values)) < 0
+            elif op == '*':
+                values = a * b
+                overflow = np.abs(a.astype(np.float64) * b.astype(np.float64)) >= PRODUCT_LIMIT
+            else:
+                # Rows dividing by zero raise in the scalar interpreter; INT64_MIN // -1 overflows
+                zero = b == 0
+                divisor = np.where(zero, 1, b)
+                values = np.floor_divide(a, divisor) if op == '/' else np.remainder(a, divisor)
+                overflow = zero | ((a == INT64_MIN) & (b == -1))
+            return Column(values, 'int', either(fallback, overflow if overflow.any() else False))
+        elif op in ('&&', '||'):
+            if left.kind != 'bool':
+                return self.error('bool')
+            # The right operand only runs, and can only fail, in the rows the left one does not decide
+            evaluated = left.values if op == '&&' else ~left.values
+            if right.kind != 'bool':
+                right_fallback = evaluated
+            else:
+                right_fallback = False if right.fallback is False else evaluated & right.fallback
+            function = np.logical_and if op == '&&' else np.logical_or
+            return Column(function(left.values, right.values), 'bool', either(left.fallback, right_fallback))
+        elif op in ('==', '!=', '<', '>', '<=', '>='):
+            if left.kind != right.kind:
+                return self.error('bool')
+            function = {'==': np.equal, '!=': np.not_equal, '<': np.less, '>': np.greater,
+                        '<=': np.less_equal, '>=': np.greater_equal}[op]
+            return Column(function(left.values, right.values), 'bool', fallback)
+        raise Unsupported()
+
+    def visit_IfElseNode(self, node):
+        condition = self.visit(node.condition)
+        if_body = self.visit(node.if_body)
+        else_body = self.visit(node.else_body)
+        if if_body.kind != else_body.kind:
+            raise Unsupported()  # The type of the result would differ between rows
+        taken = condition.values if condition.kind == 'bool' else condition.values != 0
+        values = np.where(taken, if_body.values, else_body.values)
+        # Only errors in the branch a row takes matter for that row
+        fallback = condition.fallback
+        if if_body.fallback is not False:
+            fallback = either(fallback, taken & if_body.fallback)
+        if else_body.fallback is not False:
+            fallback = either(fallback, ~taken & else_body.fallback)
+        return Column(values, if_body.kind, fallback)
+
+    def error(self, kind):
+        """
+        Build the Column of an operation that raises a TypeError for every row; the scalar
+        interpreter raises it for the first row that evaluates the operation.
+
+        :param kind: The kind of the operation's result.
+        :return: A Column whose rows all fall back to the scalar interpreter.
+        """
+        dtype = bool if kind == 'bool' else np.int64
+        return Column(np.zeros(self.size, dtype=dtype), kind, np.ones(self.size, dtype=bool))
+
+
+def fits(results, dtype):
+    """
+    Check whether scalar results can be stored in an array of a given dtype without changing them.
+
+    :param results: The results of the scalar interpreter.
+    :param dtype: np.bool_ or np.int64.
+    :return: True if every result fits.
+    """
+    if dtype == np.bool_:
+        return all(type(result) is bool for result in results)
+    return all(type(result) is int and INT64_MIN <= result < -INT64_MIN for result in results)
+
+
+def vectorize_lambda(node, function):
+    """
+    Build a VectorizedFunction from a lambda.
+
+    :param node: The LambdaNode.
+    :param function: The lambda evaluated by the interpreter.
+    :return: The VectorizedFunction.
+    :raises ImportError: If NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("Interpreter.vectorize requires NumPy")
+    return VectorizedFunction(node, function)